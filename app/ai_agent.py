@@ -7,13 +7,34 @@ Free tier: uses free models — no credit card needed!
 
 import os
 import json
-import urllib.request
-import urllib.error
-from typing import Optional
+import asyncio
+import itertools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from app import llm_cache, metrics
+from app.llm_scheduler import BACKGROUND, INTERACTIVE, OpenRouterError, get_scheduler
+from app.task_context import build_context, estimate_tokens
+from app.task_model import as_task
+from app.http_pool import ConnectionPool, AsyncConnectionPool
 
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_URL = os.environ.get("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 OPENROUTER_MODEL = "meta-llama/llama-3.1-8b-instruct:free"
+# Keep-alive connections per process (blocking) and per event loop (asyncio).
+OPENROUTER_POOL_SIZE = int(os.environ.get("OPENROUTER_POOL_SIZE", 4))
+OPENROUTER_ASYNC_POOL_SIZE = int(os.environ.get("OPENROUTER_ASYNC_POOL_SIZE", 32))
+OPENROUTER_TIMEOUT = float(os.environ.get("OPENROUTER_TIMEOUT", 30))
+OPENROUTER_CONNECT_TIMEOUT = float(os.environ.get("OPENROUTER_CONNECT_TIMEOUT", 10))
+# Stream chat replies token by token (set to 0 to always wait for the whole reply).
+OPENROUTER_STREAM = os.environ.get("OPENROUTER_STREAM", "1") != "0"
+# Rough prompt-token budget for one suggest_priorities() request.
+PRIORITY_BATCH_TOKENS = int(os.environ.get("PRIORITY_BATCH_TOKENS", 1200))
+VALID_PRIORITIES = ("low", "medium", "high")
 
 SYSTEM_PROMPT = """You are StudyBot, an encouraging and intelligent AI assistant built into a student task manager.
 You help students stay organised, manage their workload, and succeed academically.
@@ -31,91 +52,503 @@ Personality: warm, encouraging, practical. Use light emojis occasionally. Keep r
 Never be preachy. Students are busy — get to the point."""
 
 
-def _openrouter_request(messages: list, max_tokens: int = 1024) -> str:
-    """Make a request to OpenRouter API using only stdlib."""
+_pool: Optional[ConnectionPool] = None
+_pool_key: Optional[tuple] = None
+_pool_lock = threading.Lock()
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+def _pool_config(size: int) -> tuple:
+    origin = urlsplit(OPENROUTER_URL)
+    return (origin.scheme, origin.netloc, size, OPENROUTER_TIMEOUT, OPENROUTER_CONNECT_TIMEOUT)
+
+
+def _observe_phase(phase: str, seconds: float) -> None:
+    metrics.OPENROUTER_SECONDS.observe(seconds, phase)
+
+
+def _record_attempt(start: float, status: str) -> None:
+    metrics.OPENROUTER_SECONDS.observe(time.perf_counter() - start, "total")
+    metrics.OPENROUTER_RESPONSES.inc(status)
+
+
+def get_pool() -> ConnectionPool:
+    """Return the shared keep-alive pool, rebuilt whenever its settings change."""
+    global _pool, _pool_key
+    key = _pool_config(OPENROUTER_POOL_SIZE)
+    with _pool_lock:
+        if key != _pool_key:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(OPENROUTER_URL, size=OPENROUTER_POOL_SIZE, timeout=OPENROUTER_TIMEOUT,
+                                   connect_timeout=OPENROUTER_CONNECT_TIMEOUT, observe=_observe_phase)
+            _pool_key = key
+        return _pool
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    """Return the running event loop's keep-alive pool."""
+    loop = asyncio.get_running_loop()
+    key = _pool_config(OPENROUTER_ASYNC_POOL_SIZE)
+    entry = _async_pools.get(loop)
+    if entry is None or entry[0] != key:
+        pool = AsyncConnectionPool(OPENROUTER_URL, size=OPENROUTER_ASYNC_POOL_SIZE, timeout=OPENROUTER_TIMEOUT,
+                                   connect_timeout=OPENROUTER_CONNECT_TIMEOUT, observe=_observe_phase)
+        entry = _async_pools[loop] = (key, pool)
+    return entry[1]
+
+
+def _request_parts(messages: list, max_tokens: int, stream: bool = False):
     if not OPENROUTER_API_KEY:
         raise ValueError("OPENROUTER_API_KEY environment variable is not set.")
 
-    payload = json.dumps({
+    body = {
         "model": OPENROUTER_MODEL,
         "messages": messages,
         "max_tokens": max_tokens,
         "temperature": 0.7
-    }).encode("utf-8")
-
-    req = urllib.request.Request(
-        OPENROUTER_URL,
-        data=payload,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": "https://smart-student-task-agent.onrender.com",
-            "X-Title": "StudyBot Smart Task Agent"
-        },
-        method="POST"
-    )
+    }
+    if stream:
+        body["stream"] = True
+    payload = json.dumps(body).encode("utf-8")
+    headers = {
+        "Accept": "text/event-stream" if stream else "application/json",
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "HTTP-Referer": "https://smart-student-task-agent.onrender.com",
+        "X-Title": "StudyBot Smart Task Agent"
+    }
+    return urlsplit(OPENROUTER_URL).path or "/", payload, headers
 
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-            return data["choices"][0]["message"]["content"]
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8")
-        raise RuntimeError(f"OpenRouter API error {e.code}: {body}")
+
+def _reply_text(status: int, body: bytes) -> str:
+    if status >= 400:
+        raise OpenRouterError(status, body.decode("utf-8", "replace"))
+    data = json.loads(body.decode("utf-8"))
+    return data["choices"][0]["message"]["content"]
+
+
+def _openrouter_request(messages: list, max_tokens: int = 1024, priority: int = INTERACTIVE) -> str:
+    """Make a request to OpenRouter over a pooled keep-alive connection.
+
+    It goes through the scheduler (rate limit, priority queue, retries,
+    circuit breaker); identical requests in flight at once share one call.
+    """
+    path, payload, headers = _request_parts(messages, max_tokens)
+    key = llm_cache.cache_key(OPENROUTER_MODEL, messages, max_tokens)
+
+    def send() -> str:
+        start, status = time.perf_counter(), "error"
+        try:
+            status, body = get_pool().request("POST", path, payload, headers)
+        finally:
+            _record_attempt(start, str(status))
+        return _reply_text(status, body)
+    return get_scheduler().call(send, key, priority)
+
+
+async def _openrouter_request_async(messages: list, max_tokens: int = 1024,
+                                    priority: int = INTERACTIVE) -> str:
+    """asyncio version of _openrouter_request; no thread is held while waiting."""
+    path, payload, headers = _request_parts(messages, max_tokens)
+    key = llm_cache.cache_key(OPENROUTER_MODEL, messages, max_tokens)
+
+    async def send() -> str:
+        start, status = time.perf_counter(), "error"
+        try:
+            status, body = await get_async_pool().request("POST", path, payload, headers)
+        finally:
+            _record_attempt(start, str(status))
+        return _reply_text(status, body)
+    return await get_scheduler().call_async(send, key, priority)
+
+
+def iter_sse_data(lines: Iterable[bytes]) -> Iterator[str]:
+    """Yield the data of each server-sent event, stopping at "[DONE]".
+
+    Comment lines (": keep-alive") and fields other than data are skipped;
+    multi-line data is joined with newlines, as the SSE spec says.
+    """
+    data: List[str] = []
+    for raw in lines:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                payload = "\n".join(data)
+                data = []
+                if payload == "[DONE]":
+                    return
+                yield payload
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data and "\n".join(data) != "[DONE]":
+        yield "\n".join(data)
 
 
-def ask_ai(user_message: str, tasks: list, conversation_history: Optional[list] = None) -> str:
-    """Send a message to OpenRouter with the current task list as context."""
+def _stream_deltas(events: Iterable[str]) -> Iterator[str]:
+    for event in events:
+        chunk = json.loads(event)
+        if "error" in chunk:
+            raise RuntimeError(f"OpenRouter API error: {chunk['error']}")
+        for choice in chunk.get("choices", []):
+            text = (choice.get("delta") or {}).get("content")
+            if text:
+                yield text
+
+
+def _openrouter_stream(messages: list, max_tokens: int = 1024,
+                       timings: Optional[dict] = None) -> Iterator[str]:
+    """Yield reply text as it is generated, using OpenRouter's stream mode.
+
+    If the response comes back as plain JSON (streaming unsupported or
+    disabled upstream) the whole reply is yielded at once. timings, if given,
+    receives "ttft" (seconds to the first text) and "total".
+    """
+    path, payload, headers = _request_parts(messages, max_tokens, stream=True)
+    scheduler = get_scheduler()
+    start = time.perf_counter()
+    yielded = False
+    for attempt in itertools.count():
+        with scheduler.admit(INTERACTIVE):
+            attempt_start, status = time.perf_counter(), "error"
+            try:
+                with get_pool().stream("POST", path, payload, headers) as resp:
+                    status = resp.status
+                    if resp.status >= 400 or "text/event-stream" not in (resp.getheader("Content-Type") or ""):
+                        chunks: Iterable[str] = [_reply_text(resp.status, resp.read())]
+                    else:
+                        chunks = _stream_deltas(iter_sse_data(iter(resp.readline, b"")))
+                    for text in chunks:
+                        if timings is not None and "ttft" not in timings:
+                            timings["ttft"] = time.perf_counter() - start
+                        yielded = True
+                        yield text
+                    resp.read()  # the rest after [DONE], so the connection can be reused
+            except Exception as e:
+                _record_attempt(attempt_start, str(status))
+                # Only retry while nothing has been passed on to the caller.
+                if not scheduler.attempt_done(e) or yielded or attempt >= scheduler.max_retries:
+                    raise
+            else:
+                _record_attempt(attempt_start, str(status))
+                scheduler.attempt_done(None)
+                break
+        scheduler.wait_before_retry(attempt)
+    if timings is not None:
+        timings["total"] = time.perf_counter() - start
+        timings.setdefault("ttft", timings["total"])
+
+
+def _cached_request(messages: list, max_tokens: int, tag: Optional[str], parse,
+                    priority: int = INTERACTIVE):
+    """_openrouter_request through the response cache, returning parse(reply).
+
+    tag is the task id, for invalidation. A reply is only cached once parse
+    accepts it, so a malformed answer is retried next time.
+    """
+    cache = llm_cache.get_cache()
+    key = llm_cache.cache_key(OPENROUTER_MODEL, messages, max_tokens)
+    reply = cache.get(key) if cache is not None else None
+    if reply is not None:
+        return parse(reply)
+    reply = _openrouter_request(messages, max_tokens, priority)
+    result = parse(reply)
+    if cache is not None:
+        cache.put(key, reply, tag)
+    return result
+
+
+async def _cached_request_async(messages: list, max_tokens: int, tag: Optional[str], parse,
+                                priority: int = INTERACTIVE):
+    cache = llm_cache.get_cache()
+    key = llm_cache.cache_key(OPENROUTER_MODEL, messages, max_tokens)
+    reply = cache.get(key) if cache is not None else None
+    if reply is not None:
+        return parse(reply)
+    reply = await _openrouter_request_async(messages, max_tokens, priority)
+    result = parse(reply)
+    if cache is not None:
+        cache.put(key, reply, tag)
+    return result
+
+
+def _chat_messages(user_message: str, tasks: list, conversation_history: Optional[list],
+                   task_context: Optional[str] = None) -> list:
     if conversation_history is None:
         conversation_history = []
+    if task_context is None:
+        task_context = build_context([as_task(t) for t in tasks])
 
-    task_context = f"\n\n--- STUDENT'S CURRENT TASKS ---\n{json.dumps(tasks, indent=2)}\n---"
+    task_context = f"\n\n--- STUDENT'S CURRENT TASKS ---\n{task_context}\n---"
 
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     for msg in conversation_history[-10:]:
         messages.append({"role": msg["role"], "content": msg["content"]})
     messages.append({"role": "user", "content": user_message + task_context})
-
-    return _openrouter_request(messages, max_tokens=1024)
+    return messages
 
 
-def suggest_priority(task: dict) -> str:
-    """Ask OpenRouter to suggest a priority level for a single task."""
+def _priority_messages(task: dict) -> list:
     prompt = (
         f"For this student task: title='{task['title']}', subject='{task.get('subject','')}', "
         f"due='{task.get('due_date', 'no deadline')}', description='{task.get('description', '')}'. "
         f"Reply with ONLY one word: low, medium, or high."
     )
-    messages = [
+    return [
         {"role": "system", "content": "You are a task prioritisation assistant. Reply with only one word: low, medium, or high."},
         {"role": "user", "content": prompt}
     ]
-    try:
-        word = _openrouter_request(messages, max_tokens=10).strip().lower()
-        return word if word in ("low", "medium", "high") else "medium"
-    except Exception:
-        return "medium"
 
 
-def generate_subtasks(task: dict) -> list:
-    """Ask OpenRouter to break a task into 3-5 subtasks."""
+def _parse_priority(text: str) -> str:
+    word = text.strip().lower()
+    return word if word in VALID_PRIORITIES else "medium"
+
+
+def _subtask_messages(task: dict) -> list:
     prompt = (
         f"Break this student task into 3-5 concrete subtasks.\n"
         f"Task: {task['title']}\nSubject: {task.get('subject','')}\n"
         f"Notes: {task.get('description', '')}\n"
         f"Reply ONLY with a JSON array of short strings, no explanation, no markdown."
     )
-    messages = [
+    return [
         {"role": "system", "content": "You are a study planning assistant. Reply only with a JSON array of strings."},
         {"role": "user", "content": prompt}
     ]
+
+
+def _parse_subtasks(text: str) -> list:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    subtasks = json.loads(text)
+    return subtasks if isinstance(subtasks, list) else []
+
+
+def ask_ai(user_message: str, tasks: list, conversation_history: Optional[list] = None,
+           task_context: Optional[str] = None) -> str:
+    """Send a message to OpenRouter with the current task list as context.
+
+    The tasks are sent as a compact, token-budgeted table (see task_context);
+    pass a prebuilt task_context to skip encoding them again.
+    """
+    messages = _chat_messages(user_message, tasks, conversation_history, task_context)
+    return _openrouter_request(messages, max_tokens=1024)
+
+
+def stream_ai(user_message: str, tasks: list, conversation_history: Optional[list] = None,
+              task_context: Optional[str] = None, timings: Optional[dict] = None) -> Iterator[str]:
+    """Like ask_ai, but yields the reply in pieces as the model produces them.
+
+    With OPENROUTER_STREAM off this makes one ordinary request and yields
+    the whole reply. timings is filled in as for _openrouter_stream.
+    """
+    messages = _chat_messages(user_message, tasks, conversation_history, task_context)
+    if OPENROUTER_STREAM:
+        yield from _openrouter_stream(messages, 1024, timings)
+        return
+    start = time.perf_counter()
+    reply = _openrouter_request(messages, max_tokens=1024)
+    if timings is not None:
+        timings["ttft"] = timings["total"] = time.perf_counter() - start
+    yield reply
+
+
+def suggest_priority(task: dict, background: bool = False) -> str:
+    """Ask OpenRouter to suggest a priority level for a single task (cached).
+
+    background=True queues the call behind interactive ones.
+    """
     try:
-        text = _openrouter_request(messages, max_tokens=300).strip()
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        subtasks = json.loads(text)
-        return subtasks if isinstance(subtasks, list) else []
+        return _cached_request(_priority_messages(task), 10, task.get("id"), _parse_priority,
+                               BACKGROUND if background else INTERACTIVE)
     except Exception:
-        return []
\ No newline at end of file
+        return "medium"
+
+
+def generate_subtasks(task: dict, background: bool = False) -> list:
+    """Ask OpenRouter to break a task into 3-5 subtasks (cached)."""
+    try:
+        return _cached_request(_subtask_messages(task), 300, task.get("id"), _parse_subtasks,
+                               BACKGROUND if background else INTERACTIVE)
+    except Exception:
+        return []
+
+
+async def ask_ai_async(user_message: str, tasks: list, conversation_history: Optional[list] = None,
+                       task_context: Optional[str] = None) -> str:
+    """asyncio version of ask_ai."""
+    messages = _chat_messages(user_message, tasks, conversation_history, task_context)
+    return await _openrouter_request_async(messages, max_tokens=1024)
+
+
+async def suggest_priority_async(task: dict, background: bool = False) -> str:
+    """asyncio version of suggest_priority."""
+    try:
+        return await _cached_request_async(_priority_messages(task), 10, task.get("id"), _parse_priority,
+                                           BACKGROUND if background else INTERACTIVE)
+    except Exception:
+        return "medium"
+
+
+async def generate_subtasks_async(task: dict, background: bool = False) -> list:
+    """asyncio version of generate_subtasks."""
+    try:
+        return await _cached_request_async(_subtask_messages(task), 300, task.get("id"), _parse_subtasks,
+                                           BACKGROUND if background else INTERACTIVE)
+    except Exception:
+        return []
+
+
+# ── Batched priorities ───────────────────────────────────────
+BATCH_PRIORITY_SYSTEM = (
+    "You are a task prioritisation assistant. For every task line you are given, decide "
+    "low, medium, or high priority. Reply ONLY with a JSON object mapping each task's "
+    "\"i\" to its priority, e.g. {\"0\": \"high\", \"1\": \"low\"}."
+)
+
+
+def _batch_line(i: int, task: dict) -> str:
+    row = {"i": i, "title": task["title"], "subject": task.get("subject", ""),
+           "due": task.get("due_date") or "none", "notes": task.get("description", "")}
+    return json.dumps(row, ensure_ascii=False)
+
+
+def _chunk_by_budget(tasks: List[dict], budget: int) -> List[List[int]]:
+    """Split task positions into chunks whose prompt lines fit the token budget."""
+    chunks: List[List[int]] = []
+    used = 0
+    for i, task in enumerate(tasks):
+        cost = estimate_tokens(_batch_line(i, task))
+        if not chunks or (chunks[-1] and used + cost > budget):
+            chunks.append([])
+            used = estimate_tokens(BATCH_PRIORITY_SYSTEM)
+        chunks[-1].append(i)
+        used += cost
+    return chunks
+
+
+def _batch_priority_messages(tasks: List[dict]) -> list:
+    lines = "\n".join(_batch_line(i, task) for i, task in enumerate(tasks))
+    return [
+        {"role": "system", "content": BATCH_PRIORITY_SYSTEM},
+        {"role": "user", "content": f"Tasks, one JSON object per line:\n{lines}"},
+    ]
+
+
+def _parse_priorities(text: str, count: int) -> Dict[int, str]:
+    """Positions 0..count-1 that got a valid priority; anything else is left out."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    if isinstance(data, list):
+        data = dict(enumerate(data))
+    if not isinstance(data, dict):
+        return {}
+    found = {}
+    for key, value in data.items():
+        try:
+            i = int(key)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= i < count and isinstance(value, str) and value.strip().lower() in VALID_PRIORITIES:
+            found[i] = value.strip().lower()
+    return found
+
+
+def _cached_priority(task: dict) -> Optional[str]:
+    """A priority already cached by suggest_priority() for this exact task."""
+    cache = llm_cache.get_cache()
+    if cache is None:
+        return None
+    reply = cache.get(llm_cache.cache_key(OPENROUTER_MODEL, _priority_messages(task), 10))
+    return _parse_priority(reply) if reply is not None else None
+
+
+def _remember_priority(task: dict, priority: str) -> None:
+    """Store a batch answer where suggest_priority() will find it."""
+    cache = llm_cache.get_cache()
+    if cache is not None:
+        key = llm_cache.cache_key(OPENROUTER_MODEL, _priority_messages(task), 10)
+        cache.put(key, priority, task.get("id"))
+
+
+def _plan_batch(tasks: List[dict], token_budget: Optional[int]):
+    """(results with cache hits filled in, chunks of the positions still to ask)."""
+    results: List[Optional[str]] = [_cached_priority(t) for t in tasks]
+    todo = [i for i, r in enumerate(results) if r is None]
+    chunks = _chunk_by_budget([tasks[i] for i in todo], token_budget or PRIORITY_BATCH_TOKENS)
+    return results, [[todo[j] for j in chunk] for chunk in chunks]
+
+
+def _batch_request_args(chunk_tasks: List[dict]):
+    return _batch_priority_messages(chunk_tasks), 8 * len(chunk_tasks) + 16
+
+
+def suggest_priorities(tasks: List[dict], token_budget: Optional[int] = None) -> List[str]:
+    """Suggest a priority for every task, in input order, with few LLM calls.
+
+    Tasks are packed into prompts of about token_budget tokens (default
+    PRIORITY_BATCH_TOKENS) that are sent concurrently; each asks for a JSON
+    object of priorities. Tasks a reply leaves out or garbles fall back to
+    suggest_priority() one by one, which itself falls back to "medium".
+    All of these calls are queued as background work.
+    """
+    results, chunks = _plan_batch(tasks, token_budget)
+
+    def run(chunk: List[int]) -> None:
+        chunk_tasks = [tasks[i] for i in chunk]
+        try:
+            reply = _openrouter_request(*_batch_request_args(chunk_tasks), BACKGROUND)
+            found = _parse_priorities(reply, len(chunk))
+        except Exception:
+            found = {}
+        for j, i in enumerate(chunk):
+            if j in found:
+                results[i] = found[j]
+                _remember_priority(tasks[i], found[j])
+            else:
+                results[i] = suggest_priority(tasks[i], background=True)
+
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(len(chunks), OPENROUTER_POOL_SIZE)) as executor:
+            list(executor.map(run, chunks))
+    return results
+
+
+async def suggest_priorities_async(tasks: List[dict], token_budget: Optional[int] = None) -> List[str]:
+    """asyncio version of suggest_priorities."""
+    results, chunks = _plan_batch(tasks, token_budget)
+
+    async def run(chunk: List[int]) -> None:
+        chunk_tasks = [tasks[i] for i in chunk]
+        try:
+            reply = await _openrouter_request_async(*_batch_request_args(chunk_tasks), BACKGROUND)
+            found = _parse_priorities(reply, len(chunk))
+        except Exception:
+            found = {}
+        missing = [i for j, i in enumerate(chunk) if j not in found]
+        for j, i in enumerate(chunk):
+            if j in found:
+                results[i] = found[j]
+                _remember_priority(tasks[i], found[j])
+        fallbacks = await asyncio.gather(*(suggest_priority_async(tasks[i], background=True) for i in missing))
+        for i, priority in zip(missing, fallbacks):
+            results[i] = priority
+
+    await asyncio.gather(*(run(chunk) for chunk in chunks))
+    return results
+
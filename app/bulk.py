@@ -0,0 +1,65 @@
+"""
+Line-oriented task import/export formats — JSONL and CSV.
+
+Both directions work on iterators, so a file or HTTP body is read and written
+one row at a time instead of being held in memory as one big string.
+"""
+
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator
+
+from app import codec
+
+FORMATS = ("jsonl", "csv")
+EXPORT_FIELDS = ["id", "title", "description", "subject", "due_date",
+                 "priority", "status", "created_at", "updated_at"]
+CONTENT_TYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+
+def format_for_path(path: str) -> str:
+    """Guess the format from a file name: .csv is CSV, anything else JSONL."""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Format must be one of {list(FORMATS)}, got: '{fmt}'")
+
+
+def read_rows(lines: Iterable[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """Parse task rows from an iterable of text lines."""
+    _check_format(fmt)
+    if fmt == "csv":
+        for row in csv.DictReader(lines):
+            yield {k: v for k, v in row.items() if k and v != ""}
+        return
+    for n, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = codec.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Row {n}: invalid JSON ({e})") from e
+        if not isinstance(row, dict):
+            raise ValueError(f"Row {n}: expected a JSON object")
+        yield row
+
+
+def write_rows(tasks: Iterable[Dict[str, Any]], fmt: str) -> Iterator[str]:
+    """Serialise tasks as text chunks, one row per chunk (plus a CSV header)."""
+    _check_format(fmt)
+    if fmt == "jsonl":
+        for task in tasks:
+            yield codec.dumps_text(task) + "\n"
+        return
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for task in tasks:
+        writer.writerow(task)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.getvalue():
+        yield buf.getvalue()
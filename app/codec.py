@@ -0,0 +1,119 @@
+"""
+JSON encoding and decoding for storage files and API responses.
+
+dumps() returns UTF-8 bytes and loads() takes bytes or str, whichever library
+does the work:
+  msgspec   if installed (fastest on task lists, see benchmarks/bench_codec.py)
+  orjson    if installed
+  json      the standard library otherwise
+JSON_CODEC=msgspec|orjson|json picks one explicitly (auto by default).
+
+Output is compact. JSON_PRETTY=1 indents the JSON store's data file and API
+responses for humans; dumps(obj, pretty=True) does the same for one call.
+Decode errors are always ValueError, whatever the library.
+"""
+
+import dataclasses
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Optional, Tuple, Union
+
+JSON_CODEC = os.environ.get("JSON_CODEC", "auto")
+JSON_PRETTY = os.environ.get("JSON_PRETTY", "0") == "1"
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+Dumps = Callable[[Any, bool], bytes]
+Loads = Callable[[Union[bytes, str]], Any]
+
+
+def _default(obj: Any) -> Any:
+    """Values the encoders don't know natively: objects with to_dict() (Task,
+    TaskRow), dataclasses, dates, sets."""
+    to_dict = getattr(obj, "to_dict", None)
+    if callable(to_dict):
+        return to_dict()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def _orjson_dumps(obj: Any, pretty: bool = False) -> bytes:
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def _msgspec_dumps(obj: Any, pretty: bool = False) -> bytes:
+    try:
+        data = _msgspec_encoder.encode(obj)
+    except TypeError:  # e.g. a None dict key, which the stdlib writes as "null"
+        return _json_dumps(obj, pretty)
+    return msgspec.json.format(data, indent=2) if pretty else data
+
+
+def _msgspec_loads(data: Union[bytes, str]) -> Any:
+    try:
+        return _msgspec_decoder.decode(data)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder(enc_hook=_default)
+    _msgspec_decoder = msgspec.json.Decoder()
+
+CODECS = {"json": (_json_dumps, json.loads)}
+if orjson is not None:
+    CODECS["orjson"] = (_orjson_dumps, orjson.loads)
+if msgspec is not None:
+    CODECS["msgspec"] = (_msgspec_dumps, _msgspec_loads)
+
+_codec: Optional[Tuple[str, Dumps, Loads]] = None
+_codec_key: Optional[str] = None
+
+
+def get_codec() -> Tuple[str, Dumps, Loads]:
+    """(name, dumps, loads) for JSON_CODEC, re-chosen whenever the setting changes."""
+    global _codec, _codec_key
+    if _codec_key != JSON_CODEC:
+        if JSON_CODEC == "auto":
+            name = next(n for n in ("msgspec", "orjson", "json") if n in CODECS)
+        elif JSON_CODEC in CODECS:
+            name = JSON_CODEC
+        else:
+            raise ValueError(f"JSON_CODEC must be auto or one of {sorted(CODECS)}, got: '{JSON_CODEC}'")
+        _codec, _codec_key = (name, *CODECS[name]), JSON_CODEC
+    return _codec
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """obj as UTF-8 JSON; compact unless pretty."""
+    return get_codec()[1](obj, pretty)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    return get_codec()[2](data)
+
+
+def dumps_text(obj: Any) -> str:
+    """Compact JSON as str, for text columns and line-based formats."""
+    return dumps(obj).decode("utf-8")
@@ -0,0 +1,108 @@
+"""
+HTTP caching helpers: content-coding negotiation and fingerprinted static files.
+
+Kept free of Flask so the pieces can be tested on their own; server.py wires
+them into the request cycle.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {"gzip": lambda data: gzip.compress(data, compresslevel=6, mtime=0)}
+    if brotli is not None:
+        encoders["br"] = lambda data: brotli.compress(data, quality=5)
+    return encoders
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best coding we can produce from an Accept-Encoding header.
+
+    Brotli wins over gzip when both are acceptable; q=0 rules a coding out.
+    Returns None when the body should be sent uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    encoders = _encoders()
+    best = None
+    for name in ("br", "gzip"):
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if name in encoders and q > 0 and (best is None or q > best[1]):
+            best = (name, q)
+    return best[0] if best else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Encode data with a coding returned by choose_encoding()."""
+    return _encoders()[encoding](data)
+
+
+class StaticFile:
+    """A file read once per change, with its content hash and compressed forms.
+
+    The fingerprint is the first 12 hex digits of its SHA-256, used both as a
+    strong ETag and in the immutable URL returned by fingerprinted_name().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self.data = b""
+        self.fingerprint = ""
+        self._encoded: Dict[str, bytes] = {}
+
+    def _refresh(self) -> None:
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return
+        with open(self.path, "rb") as f:
+            self.data = f.read()
+        self.fingerprint = hashlib.sha256(self.data).hexdigest()[:12]
+        self._encoded = {}
+        self._signature = signature
+
+    def encoded(self, encoding: Optional[str]) -> Tuple[str, bytes]:
+        """(fingerprint, body in the given coding); each coding is compressed once.
+
+        encoding None means the identity coding.
+        """
+        with self._lock:
+            self._refresh()
+            if encoding is None:
+                return self.fingerprint, self.data
+            if encoding not in self._encoded:
+                self._encoded[encoding] = compress(self.data, encoding)
+            return self.fingerprint, self._encoded[encoding]
+
+    def fingerprinted_name(self) -> str:
+        """e.g. index.html -> index.3f2a9c0d1b7e.html"""
+        with self._lock:
+            self._refresh()
+            fingerprint = self.fingerprint
+        stem, ext = os.path.splitext(os.path.basename(self.path))
+        return f"{stem}.{fingerprint}{ext}"
@@ -0,0 +1,251 @@
+"""
+Keep-alive HTTP/1.1 connection pools, one blocking and one for asyncio.
+
+ConnectionPool keeps up to `size` http.client connections to a single origin
+and hands them out one request at a time, so repeated API calls skip the TCP
+and TLS handshakes. AsyncConnectionPool does the same on asyncio streams, so
+many requests can be in flight on one thread. Both retry a request once on a
+fresh connection when a reused one turns out to have been closed by the
+server while it sat idle.
+
+Either pool can be given an observe(phase, seconds) callback; it is called
+with "connect" each time a new connection is opened and with "ttfb" once the
+response headers of a request have arrived.
+"""
+
+import asyncio
+import http.client
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+Response = Tuple[int, bytes]
+Observer = Callable[[str, float], None]
+
+# Errors that mean "the idle connection was already dead", not "the request failed".
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionResetError, BrokenPipeError)
+
+
+class ConnectionPool:
+    """Blocking keep-alive pool for one scheme://host:port."""
+
+    def __init__(self, url: str, size: int = 4, timeout: float = 30,
+                 connect_timeout: float = 10, idle_timeout: float = 60,
+                 observe: Optional[Observer] = None):
+        parts = urlsplit(url)
+        self.scheme, self.host = parts.scheme, parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.size = size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.observe = observe
+        self._idle: List[Tuple[float, http.client.HTTPConnection]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connections_opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        start = time.perf_counter()
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.connect_timeout,
+                                               context=ssl.create_default_context())
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.timeout)
+        if self.observe:
+            self.observe("connect", time.perf_counter() - start)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _checkout(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """An idle connection (and True), or a new one (and False)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                since, conn = self._idle.pop()
+                if now - since < self.idle_timeout:
+                    return conn, True
+                conn.close()
+        return self._connect(), False
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        """Send one request and return (status, body)."""
+        with self.stream(method, path, body, headers) as resp:
+            return resp.status, resp.read()
+
+    @contextmanager
+    def stream(self, method: str, path: str, body: Optional[bytes] = None,
+               headers: Optional[Dict[str, str]] = None) -> Iterator[http.client.HTTPResponse]:
+        """Send one request and yield the response unread, for incremental reading.
+
+        The connection goes back to the pool only if the body was read to
+        the end; leaving early closes it.
+        """
+        with self._slots:
+            conn, reused = self._checkout()
+            try:
+                try:
+                    resp = self._start(conn, method, path, body, headers)
+                except _STALE_ERRORS:
+                    if not reused:
+                        raise
+                    conn.close()
+                    conn = self._connect()
+                    resp = self._start(conn, method, path, body, headers)
+                yield resp
+            except BaseException:
+                conn.close()
+                raise
+            if resp.isclosed() and not resp.will_close:
+                with self._lock:
+                    self._idle.append((time.monotonic(), conn))
+            else:
+                conn.close()
+
+    def _start(self, conn, method, path, body, headers) -> http.client.HTTPResponse:
+        start = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        if self.observe:
+            self.observe("ttfb", time.perf_counter() - start)
+        return resp
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, conn in idle:
+            conn.close()
+
+
+class AsyncConnectionPool:
+    """asyncio keep-alive pool for one scheme://host:port.
+
+    Speaks just enough HTTP/1.1 for JSON APIs: Content-Length and chunked
+    bodies, keep-alive unless the server says Connection: close. A pool
+    belongs to the event loop it is first used on.
+    """
+
+    def __init__(self, url: str, size: int = 10, timeout: float = 30,
+                 connect_timeout: float = 10, idle_timeout: float = 60,
+                 observe: Optional[Observer] = None):
+        parts = urlsplit(url)
+        self.scheme, self.host = parts.scheme, parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.size = size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.observe = observe
+        self._idle: List[Tuple[float, asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.connections_opened = 0
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        start = time.perf_counter()
+        ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context), self.connect_timeout)
+        self.connections_opened += 1
+        if self.observe:
+            self.observe("connect", time.perf_counter() - start)
+        return reader, writer
+
+    async def request(self, method: str, path: str, body: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        """Send one request and return (status, body)."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            reused = False
+            now = time.monotonic()
+            while self._idle and not reused:
+                since, reader, writer = self._idle.pop()
+                if now - since < self.idle_timeout and not reader.at_eof():
+                    reused = True
+                else:
+                    writer.close()
+            if not reused:
+                reader, writer = await self._connect()
+            try:
+                try:
+                    status, data, keep = await asyncio.wait_for(
+                        self._send(reader, writer, method, path, body, headers), self.timeout)
+                except (*_STALE_ERRORS, asyncio.IncompleteReadError):
+                    if not reused:
+                        raise
+                    writer.close()
+                    reader, writer = await self._connect()
+                    status, data, keep = await asyncio.wait_for(
+                        self._send(reader, writer, method, path, body, headers), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            if keep:
+                self._idle.append((time.monotonic(), reader, writer))
+            else:
+                writer.close()
+            return status, data
+
+    async def _send(self, reader, writer, method, path, body, headers) -> Tuple[int, bytes, bool]:
+        start = time.perf_counter()
+        body = body or b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise http.client.RemoteDisconnected("Remote end closed connection without response")
+        parts = status_line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise http.client.BadStatusLine(status_line.decode("latin-1"))
+        status = int(parts[1])
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if self.observe:
+            self.observe("ttfb", time.perf_counter() - start)
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b"".join(chunks)
+            framed = True
+        elif "content-length" in response_headers:
+            data = await reader.readexactly(int(response_headers["content-length"]))
+            framed = True
+        else:
+            data = await reader.read()
+            framed = False
+        keep = framed and response_headers.get("connection", "").lower() != "close"
+        return status, data, keep
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, _, writer in idle:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
@@ -0,0 +1,355 @@
+"""
+Background jobs for AI enrichment.
+
+Slow model calls (subtasks, priority suggestions) are queued here instead of
+running inside a request handler. Each job is a row in a small SQLite table
+next to the task data, so queued work survives a restart; AI_JOB_WORKERS
+threads take jobs in order and write the result back onto the task:
+
+  - "subtasks":   task["subtasks"] = [{"text": ..., "done": False}, ...]
+  - "priority":   task["ai_priority"] = "low" | "medium" | "high"
+  - "priorities": ai_priority for every task in payload["task_ids"]
+
+Model calls from jobs are queued behind interactive ones by the scheduler.
+
+Every process sharing the table (one per gunicorn worker) has its own
+JobQueue. A running job records its owner (host:pid:queue) and a heartbeat
+the owner refreshes while it is alive; another queue only takes a running
+job back once its owner has exited or its heartbeat is older than
+AI_JOB_LEASE seconds, so a job is never run twice at once.
+"""
+
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from app import ai_agent, storage, task_manager
+
+AI_JOB_WORKERS = int(os.environ.get("AI_JOB_WORKERS", 2))
+AI_JOB_KEEP = float(os.environ.get("AI_JOB_KEEP", 24 * 3600))  # seconds a finished job is kept
+AI_JOB_LEASE = float(os.environ.get("AI_JOB_LEASE", 60))  # seconds without a heartbeat before a running job is retaken
+
+STATUSES = ("queued", "running", "done", "failed")
+WAIT_POLL = 0.25  # seconds between re-reads of a job another process may be running
+
+
+def _task(task_id: str) -> Dict[str, Any]:
+    task = task_manager.get_task_by_id(task_id)
+    if task is None:
+        raise KeyError(f"Task with id '{task_id}' not found.")
+    return task
+
+
+def _subtasks(payload: Dict[str, Any]) -> Any:
+    task = _task(payload["task_id"])
+    subtasks = ai_agent.generate_subtasks(task, background=True)
+    task_manager.save_ai_results(task["id"], subtasks=[{"text": s, "done": False} for s in subtasks])
+    return {"task_id": task["id"], "subtasks": subtasks}
+
+
+def _priority(payload: Dict[str, Any]) -> Any:
+    task = _task(payload["task_id"])
+    priority = ai_agent.suggest_priority(task, background=True)
+    task_manager.save_ai_results(task["id"], ai_priority=priority)
+    return {"task_id": task["id"], "priority": priority}
+
+
+def _priorities(payload: Dict[str, Any]) -> Any:
+    tasks = [_task(i) for i in payload["task_ids"]]
+    priorities = ai_agent.suggest_priorities(tasks)
+    for task, priority in zip(tasks, priorities):
+        task_manager.save_ai_results(task["id"], ai_priority=priority)
+    return {"priorities": {t["id"]: p for t, p in zip(tasks, priorities)}}
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "subtasks": _subtasks,
+    "priority": _priority,
+    "priorities": _priorities,
+}
+
+
+class JobQueue:
+    """A persistent FIFO of jobs run by a pool of worker threads."""
+
+    def __init__(self, path: str, workers: int = 2, keep: float = 24 * 3600, lease: float = 60):
+        self.path = path
+        self.workers = workers
+        self.keep = keep
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        with self._db:
+            self._db.executescript("""
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id          TEXT PRIMARY KEY,
+                    kind        TEXT NOT NULL,
+                    payload     TEXT NOT NULL,
+                    status      TEXT NOT NULL,
+                    result      TEXT,
+                    error       TEXT,
+                    created_at  REAL NOT NULL,
+                    started_at  REAL,
+                    finished_at REAL,
+                    owner       TEXT,
+                    heartbeat   REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            """)
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:  # tables created before leases
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._finished = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.running = 0
+        self.counts = {"enqueued": 0, "done": 0, "failed": 0, "resumed": 0}
+        self._waits: deque = deque(maxlen=1000)  # seconds from enqueue to start
+        self._runs: deque = deque(maxlen=1000)   # seconds from start to finish
+
+    # ── Table access ──────────────────────────────────────────
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._db_lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    def _row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._row(rows[0]) if rows else None
+
+    # ── Producer side ─────────────────────────────────────────
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new job and hand it to the workers; returns the job record."""
+        if kind not in HANDLERS:
+            raise ValueError(f"Job kind must be one of {sorted(HANDLERS)}.")
+        self.start()
+        job_id = uuid.uuid4().hex
+        payload = {**payload, "user": storage.current_user()}  # run against the same shard
+        self._execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, kind, json.dumps(payload), time.time()),
+        )
+        self._count("enqueued")
+        self._queue.put(job_id)
+        return self.get(job_id)
+
+    def wait(self, job_id: str, timeout: float = 0) -> Optional[Dict[str, Any]]:
+        """The job once it has finished, or as it stands after timeout seconds.
+
+        Jobs finished here wake the wait at once; the row is also re-read
+        every WAIT_POLL seconds, for jobs run by another process.
+        """
+        deadline = time.monotonic() + timeout
+        with self._finished:
+            while True:
+                job = self.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in ("done", "failed") or remaining <= 0:
+                    return job
+                self._finished.wait(min(remaining, WAIT_POLL))
+
+    # ── Workers ───────────────────────────────────────────────
+    def start(self) -> None:
+        """Start the workers, first picking up queued jobs and running jobs
+        whose owner is gone (see _recover)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            cutoff = time.time() - self.keep
+            self._execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,))
+            self._recover(requeue=False)
+            for row in self._execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"):
+                self._queue.put(row["id"])
+                self._count("resumed")
+            for n in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"ai-job-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._heartbeat = threading.Thread(target=self._beat, name="ai-job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _recover(self, requeue: bool = True) -> None:
+        """Mark running jobs queued again if their owner has exited or stopped
+        sending heartbeats (and hand them to the workers if requeue). Jobs a
+        live queue is running are left alone."""
+        expired = time.time() - self.lease
+        rows = self._execute("SELECT id, owner, heartbeat FROM jobs WHERE status = 'running'")
+        for row in rows:
+            if row["owner"] == self.owner:
+                continue
+            if row["heartbeat"] is not None and row["heartbeat"] >= expired and _owner_alive(row["owner"]):
+                continue
+            with self._db_lock, self._db:
+                # Only if it is still the same run: the owner may have finished it meanwhile.
+                taken = self._db.execute(
+                    "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL, heartbeat = NULL"
+                    " WHERE id = ? AND status = 'running' AND owner IS ? AND heartbeat IS ?",
+                    (row["id"], row["owner"], row["heartbeat"])).rowcount
+            if taken and requeue:
+                self._queue.put(row["id"])
+                self._count("resumed")
+
+    def _beat(self) -> None:
+        """Refresh this queue's leases, and retake jobs whose owner has gone."""
+        while not self._stopping.wait(self.lease / 4):
+            self._execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'",
+                          (time.time(), self.owner))
+            self._recover()
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            if name == "running":
+                self.running += n
+            else:
+                self.counts[name] += n
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self._run(job_id)
+
+    def _run(self, job_id: str) -> None:
+        started = time.time()
+        with self._db_lock, self._db:
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (started, self.owner, started, job_id)).rowcount
+        job = self.get(job_id)
+        if not claimed or job is None:
+            return  # already taken, e.g. by another process sharing the table
+        self._waits.append(started - job["created_at"])
+        self._count("running")
+        try:
+            with storage.user_scope(job["payload"].get("user")):
+                result = HANDLERS[job["kind"]](job["payload"])
+        except Exception as e:
+            status, result, error = "failed", None, f"{type(e).__name__}: {e}"
+        else:
+            status, error = "done", None
+        finally:
+            self._count("running", -1)
+        finished = time.time()
+        self._runs.append(finished - started)
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, heartbeat = NULL"
+            " WHERE id = ? AND owner = ?",
+            (status, json.dumps(result) if result is not None else None, error, finished, job_id, self.owner),
+        )
+        self._count(status)
+        with self._finished:
+            self._finished.notify_all()
+
+    def close(self) -> None:
+        """Stop the workers after their current job; queued jobs stay in the table."""
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        self._threads, self._heartbeat = [], None
+        self._db.close()
+
+    # ── Metrics ───────────────────────────────────────────────
+    def stats(self) -> Dict[str, Any]:
+        by_status = {s: 0 for s in STATUSES}
+        for row in self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            by_status[row["status"]] = row["n"]
+        with self._lock:
+            counts, running = dict(self.counts), self.running
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "running": running,
+            "jobs": by_status,
+            **counts,
+            "wait_ms": _percentiles(self._waits),
+            "run_ms": _percentiles(self._runs),
+        }
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """False if owner is a process on this host that has exited; processes on
+    other hosts are assumed alive and only time out through their lease."""
+    try:
+        host, pid, _ = (owner or "").split(":")
+        pid = int(pid)
+    except ValueError:
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _percentiles(samples: deque) -> Dict[str, float]:
+    values = sorted(samples)
+    if not values:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+    def at(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+    return {"avg": round(sum(values) / len(values) * 1000, 1), "p50": at(0.5), "p95": at(0.95),
+            "max": round(values[-1] * 1000, 1)}
+
+
+def jobs_path() -> str:
+    """The job table lives next to the task data file."""
+    return os.path.join(os.path.dirname(storage.DATA_FILE), "jobs.db")
+
+
+_jobs: Optional[JobQueue] = None
+_jobs_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    """Return the shared queue, rebuilt if the data directory or worker count changes."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None or _jobs.path != jobs_path() or _jobs.workers != AI_JOB_WORKERS:
+            if _jobs is not None:
+                _jobs.close()
+            _jobs = JobQueue(jobs_path(), AI_JOB_WORKERS, AI_JOB_KEEP, AI_JOB_LEASE)
+        return _jobs
+
+
+def reset_queue() -> None:
+    """Stop the workers and forget the shared queue (the table is kept)."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is not None:
+            _jobs.close()
+        _jobs = None
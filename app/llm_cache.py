@@ -0,0 +1,168 @@
+"""
+Response cache for LLM calls.
+
+Replies are keyed on a SHA-256 of (model, messages, max_tokens), so the same
+prompt is only sent once. Entries live in an in-memory LRU with a TTL and,
+when LLM_CACHE_DB is set, in a SQLite file as well so they survive restarts.
+
+Every entry can carry a tag (ai_agent uses the task id); task_manager calls
+invalidate_task() when a task's title, description, subject or due date
+changes, which drops everything cached for it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", 512))        # 0 disables the cache
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 24 * 3600))  # seconds
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", "")                  # e.g. data/llm_cache.db
+
+
+def cache_key(model: str, messages: list, max_tokens: int) -> str:
+    raw = json.dumps([model, messages, max_tokens], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL map of key -> reply text, optionally backed by SQLite."""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 24 * 3600, path: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            with self._db:
+                self._db.executescript("""
+                    PRAGMA journal_mode = WAL;
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY, tag TEXT, value TEXT NOT NULL, expires REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_llm_cache_tag ON llm_cache (tag);
+                """)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached reply, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT tag, value, expires FROM llm_cache WHERE key = ?",
+                                       (key,)).fetchone()
+                if row is not None and row[2] > time.time():
+                    tag, value, expires = row
+                    self._remember(key, tag, value, time.monotonic() + (expires - time.time()))
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str, tag: Optional[str] = None) -> None:
+        with self._lock:
+            self._remember(key, tag, value, time.monotonic() + self.ttl)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                                     (key, tag, value, time.time() + self.ttl))
+                    self._db.execute("DELETE FROM llm_cache WHERE expires <= ?", (time.time(),))
+
+    def _remember(self, key: str, tag: Optional[str], value: str, expires: float) -> None:
+        self._entries[key] = (expires, tag, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry stored with tag; returns how many were in memory."""
+        with self._lock:
+            doomed = [k for k, (_, t, _) in self._entries.items() if t == tag]
+            for key in doomed:
+                del self._entries[key]
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM llm_cache WHERE tag = ?", (tag,))
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "disk": bool(self._db),
+            }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_cache: Optional[ResponseCache] = None
+_cache_config: Optional[tuple] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Return the shared cache (rebuilt if its settings change), or None when disabled."""
+    global _cache, _cache_config
+    config = (LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_DB)
+    with _cache_lock:
+        if config != _cache_config:
+            if _cache is not None:
+                _cache.close()
+            _cache = ResponseCache(*config) if LLM_CACHE_SIZE > 0 else None
+            _cache_config = config
+        return _cache
+
+
+def reset_cache() -> None:
+    """Close and drop the shared cache; the next get_cache() starts empty."""
+    global _cache, _cache_config
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = _cache_config = None
+
+
+def invalidate_task(task_id: str) -> None:
+    """Forget cached replies about a task (call when its prompt fields change)."""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate_tag(task_id)
+
+
+def cache_stats() -> Dict[str, Any]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"disabled": True}
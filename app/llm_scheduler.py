@@ -0,0 +1,405 @@
+"""
+Central scheduler for OpenRouter calls.
+
+Every request from ai_agent passes through one LLMScheduler, which applies,
+in order:
+  - a circuit breaker: after LLM_BREAKER_FAILURES upstream failures in a row
+    calls fail at once with CircuitOpenError (so callers fall back to their
+    "medium" / [] defaults) until a probe after LLM_BREAKER_RESET seconds works
+  - a bounded priority queue: at most LLM_MAX_CONCURRENT calls run at once and
+    waiting INTERACTIVE calls (chat, a single button press) go ahead of
+    BACKGROUND ones (batches, jobs); past LLM_MAX_QUEUE waiters it refuses
+  - a token bucket: LLM_RATE_PER_MIN calls a minute, bursts of LLM_BURST
+  - singleflight: identical requests already in flight share one call
+  - retries on 429, 5xx and network errors with full-jitter exponential backoff
+"""
+
+import asyncio
+import heapq
+import http.client
+import itertools
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+INTERACTIVE, BACKGROUND = 0, 1
+
+LLM_RATE_PER_MIN = float(os.environ.get("LLM_RATE_PER_MIN", 20))
+LLM_BURST = int(os.environ.get("LLM_BURST", 5))
+LLM_MAX_CONCURRENT = int(os.environ.get("LLM_MAX_CONCURRENT", 4))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", 64))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_CAP = float(os.environ.get("LLM_BACKOFF_CAP", 8))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.environ.get("LLM_BREAKER_RESET", 30))
+
+
+class OpenRouterError(RuntimeError):
+    """An error response from the API; status is the HTTP status code."""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"OpenRouter API error {status}: {body}")
+        self.status = status
+
+
+class SchedulerBusy(RuntimeError):
+    """The queue is full, or a call waited longer than LLM_QUEUE_TIMEOUT."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream is failing; calls are refused until the breaker resets."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429, 5xx and transport errors are worth retrying; other errors are not."""
+    if isinstance(error, OpenRouterError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (OSError, http.client.HTTPException, asyncio.TimeoutError))
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst; reserve() may go into debt."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token now and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class CircuitBreaker:
+    """Opens after `failures` upstream failures in a row.
+
+    While open, one call per `reset` seconds is let through as a probe; a
+    success closes the breaker again.
+    """
+
+    def __init__(self, failures: int, reset: float):
+        self.failures = failures
+        self.reset = reset
+        self._count = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset:
+                self._opened_at = now  # this call is the probe; the next waits another period
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._count, self._opened_at = 0, None
+                return
+            self._count += 1
+            if self._count >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+class _Gate:
+    """At most `limit` holders; waiters are admitted lowest priority value first."""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def acquire(self, priority: int, timeout: float) -> None:
+        with self._cond:
+            if self.active < self.limit and not self._waiting:
+                self.active += 1
+                return
+            if len(self._waiting) >= self.max_queue:
+                raise SchedulerBusy("Too many AI requests queued; try again shortly.")
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + timeout
+            while not (self.active < self.limit and self._waiting[0] == entry):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise SchedulerBusy("Timed out waiting for an AI request slot.")
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiting)
+            self.active += 1
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class _AsyncGate:
+    """_Gate for one event loop; a released slot is handed straight to the next waiter."""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int, timeout: float) -> None:
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return
+        if len(self._waiting) >= self.max_queue:
+            raise SchedulerBusy("Too many AI requests queued; try again shortly.")
+        fut = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), fut)
+        heapq.heappush(self._waiting, entry)
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            self._waiting = [e for e in self._waiting if e is not entry]
+            heapq.heapify(self._waiting)
+            raise SchedulerBusy("Timed out waiting for an AI request slot.")
+
+    def release(self) -> None:
+        while self._waiting:
+            _, _, fut = heapq.heappop(self._waiting)
+            if not fut.done():
+                fut.set_result(None)  # the slot passes to this waiter; active is unchanged
+                return
+        self.active -= 1
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class LLMScheduler:
+    def __init__(self, rate_per_min: float = 20, burst: int = 5, max_concurrent: int = 4,
+                 max_queue: int = 64, queue_timeout: float = 30, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_cap: float = 8,
+                 breaker_failures: int = 5, breaker_reset: float = 30):
+        self.bucket = TokenBucket(rate_per_min / 60, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._gate = _Gate(max_concurrent, max_queue)
+        self._async_gates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncGate]" = \
+            weakref.WeakKeyDictionary()
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "coalesced": 0, "retries": 0, "rejected": 0, "rate_limited": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("AI service is unavailable right now; using a fallback.")
+
+    def _outcome(self, error: Optional[BaseException]) -> bool:
+        """Feed the breaker; returns True if the error is worth retrying."""
+        retryable = error is not None and is_retryable(error)
+        self.breaker.record(not retryable)
+        return retryable
+
+    # ── Blocking calls ────────────────────────────────────────
+    @contextmanager
+    def admit(self, priority: int = INTERACTIVE) -> Iterator[None]:
+        """One attempt: breaker check, a queue slot, then a rate-limit token.
+
+        The caller must report how the attempt went with attempt_done().
+        """
+        self._check_breaker()
+        self._gate.acquire(priority, self.queue_timeout)
+        try:
+            wait = self.bucket.reserve()
+            if wait:
+                self._count("rate_limited")
+                time.sleep(wait)
+            self._count("calls")
+            yield
+        finally:
+            self._gate.release()
+
+    def attempt_done(self, error: Optional[BaseException]) -> bool:
+        """Record an attempt's outcome; True means the error is worth retrying."""
+        return self._outcome(error)
+
+    def wait_before_retry(self, attempt: int) -> None:
+        self._count("retries")
+        time.sleep(self.backoff(attempt))
+
+    def call(self, fn: Callable[[], Any], key: Optional[str] = None,
+             priority: int = INTERACTIVE) -> Any:
+        """Run fn under the scheduler, sharing the result with identical keyed calls."""
+        if key is None:
+            return self._with_retries(fn, priority)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count("coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._with_retries(fn, priority)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _with_retries(self, fn: Callable[[], Any], priority: int) -> Any:
+        for attempt in itertools.count():
+            with self.admit(priority):
+                try:
+                    result = fn()
+                except Exception as e:
+                    if not self.attempt_done(e) or attempt >= self.max_retries:
+                        raise
+                else:
+                    self.attempt_done(None)
+                    return result
+            self.wait_before_retry(attempt)
+
+    # ── asyncio calls ─────────────────────────────────────────
+    @asynccontextmanager
+    async def admit_async(self, priority: int = INTERACTIVE):
+        self._check_breaker()
+        loop = asyncio.get_running_loop()
+        gate = self._async_gates.get(loop)
+        if gate is None:
+            gate = self._async_gates[loop] = _AsyncGate(self.max_concurrent, self.max_queue)
+        await gate.acquire(priority, self.queue_timeout)
+        try:
+            wait = self.bucket.reserve()
+            if wait:
+                self._count("rate_limited")
+                await asyncio.sleep(wait)
+            self._count("calls")
+            yield
+        finally:
+            gate.release()
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], key: Optional[str] = None,
+                         priority: int = INTERACTIVE) -> Any:
+        """asyncio version of call(); fn is a coroutine function.
+
+        Coalescing is per event loop.
+        """
+        if key is None:
+            return await self._with_retries_async(fn, priority)
+        flight_key = (id(asyncio.get_running_loop()), key)
+        existing = self._async_flights.get(flight_key)
+        if existing is not None:
+            self._count("coalesced")
+            return await asyncio.shield(existing)
+        fut = asyncio.get_running_loop().create_future()
+        self._async_flights[flight_key] = fut
+        try:
+            result = await self._with_retries_async(fn, priority)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._async_flights[flight_key]
+
+    async def _with_retries_async(self, fn: Callable[[], Awaitable[Any]], priority: int) -> Any:
+        for attempt in itertools.count():
+            async with self.admit_async(priority):
+                try:
+                    result = await fn()
+                except Exception as e:
+                    if not self.attempt_done(e) or attempt >= self.max_retries:
+                        raise
+                else:
+                    self.attempt_done(None)
+                    return result
+            self._count("retries")
+            await asyncio.sleep(self.backoff(attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {**counts, "queued": self._gate.queued(), "in_flight": self._gate.active,
+                "breaker": self.breaker.state}
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_config: Optional[tuple] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Return the shared scheduler, rebuilt (with fresh state) if its settings change."""
+    global _scheduler, _scheduler_config
+    config = (LLM_RATE_PER_MIN, LLM_BURST, LLM_MAX_CONCURRENT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT,
+              LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_CAP, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+    with _scheduler_lock:
+        if config != _scheduler_config:
+            _scheduler = LLMScheduler(*config)
+            _scheduler_config = config
+        return _scheduler
+
+
+def reset_scheduler() -> None:
+    """Forget all scheduler state (counters, breaker, rate limit)."""
+    global _scheduler, _scheduler_config
+    with _scheduler_lock:
+        _scheduler = _scheduler_config = None
@@ -1,11 +1,14 @@
 """
 Smart Student Task Agent — CLI Entry Point
-Usage: python -m app.main
+Usage: python -m app.main                       (interactive menu)
+       python -m app.main import FILE [--format jsonl|csv]
+       python -m app.main export [FILE] [--format jsonl|csv]
 """
 
+import argparse
 import sys
 from typing import Optional
-from app import task_manager
+from app import bulk, task_manager, task_model
 
 
 def print_task(task: dict) -> None:
@@ -70,7 +73,7 @@ def cmd_update():
     task_id = input("Enter Task ID: ").strip()
     print("Leave any field blank to keep current value.")
     fields = {}
-    for field in ["title", "description", "due_date", "priority", "status", "subject"]:
+    for field in task_model.EDITABLE_FIELDS:
         val = input(f"  New {field}: ").strip()
         if val:
             fields[field] = val
@@ -112,6 +115,8 @@ def cmd_summary():
     print(f"  Total tasks : {s['total']}")
     print(f"  By status   : {s['by_status']}")
     print(f"  By priority : {s['by_priority']}")
+    print(f"  Overdue     : {s['overdue']}")
+    print(f"  Due in 7d   : {s['due_this_week']}")
 
 
 MENU = """
@@ -140,7 +145,48 @@ COMMANDS = {
 }
 
 
+def cmd_import(path: str, fmt: Optional[str]) -> int:
+    fmt = fmt or bulk.format_for_path(path)
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            count = task_manager.import_tasks(bulk.read_rows(f, fmt))
+    except (OSError, ValueError) as e:
+        print(f"❌ Import failed: {e}", file=sys.stderr)
+        return 1
+    print(f"✅ Imported {count} tasks from {path}")
+    return 0
+
+
+def cmd_export(path: Optional[str], fmt: Optional[str]) -> int:
+    fmt = fmt or (bulk.format_for_path(path) if path else "jsonl")
+    out = open(path, "w", newline="", encoding="utf-8") if path else sys.stdout
+    try:
+        for chunk in bulk.write_rows(task_manager.get_all_tasks(), fmt):
+            out.write(chunk)
+    finally:
+        if path:
+            out.close()
+    return 0
+
+
+def run_command(argv: list) -> int:
+    parser = argparse.ArgumentParser(prog="task-agent")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="create tasks from a JSONL or CSV file")
+    p_import.add_argument("file")
+    p_import.add_argument("--format", choices=bulk.FORMATS)
+    p_export = sub.add_parser("export", help="write all tasks as JSONL or CSV")
+    p_export.add_argument("file", nargs="?", help="output file (default: stdout)")
+    p_export.add_argument("--format", choices=bulk.FORMATS)
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        return cmd_import(args.file, args.format)
+    return cmd_export(args.file, args.format)
+
+
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     while True:
         print(MENU)
         choice = input("Choose an option: ").strip()
@@ -0,0 +1,189 @@
+"""
+Low-overhead counters and latency histograms, exported in Prometheus text format.
+
+Histograms keep one list of bucket counts per label set; observe() is a
+bisect plus a few additions under a lock. Everything here is a no-op while
+METRICS_ENABLED is off (METRICS_ENABLED=0), so the hooks can stay in place.
+
+What is measured:
+  - http_request_duration_seconds{route,method,status} and the request and
+    response body sizes, from server.py's before/after-request hooks
+  - storage_operation_seconds{operation} around app.storage's task functions
+  - task_manager_operation_seconds{operation} around each task_manager call
+  - openrouter_request_seconds{phase}: connect (new connections only),
+    ttfb (request sent -> response headers) and total, per attempt, plus
+    openrouter_responses_total{status}
+render() produces the text served at /metrics.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # labels -> [per-bucket..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(labels)
+        return int(sum(counts[:-1])) if counts else 0
+
+    def total(self, *labels: str) -> float:
+        counts = self._values.get(labels)
+        return counts[-1] if counts else 0.0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for labels, counts in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {int(running)}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(round(counts[-1], 6))}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {int(running)}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+REGISTRY: List = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+HTTP_SECONDS = _register(Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.", ("route", "method", "status")))
+HTTP_REQUEST_BYTES = _register(Histogram(
+    "http_request_bytes", "Size of HTTP request bodies.", ("route",), BYTE_BUCKETS))
+HTTP_RESPONSE_BYTES = _register(Histogram(
+    "http_response_bytes", "Size of HTTP response bodies as sent (after compression).", ("route",), BYTE_BUCKETS))
+STORAGE_SECONDS = _register(Histogram(
+    "storage_operation_seconds", "Time spent in app.storage task functions.", ("operation",)))
+TASK_MANAGER_SECONDS = _register(Histogram(
+    "task_manager_operation_seconds", "Time spent in task_manager operations.", ("operation",)))
+OPENROUTER_SECONDS = _register(Histogram(
+    "openrouter_request_seconds", "OpenRouter call latency by phase: connect, ttfb, total.", ("phase",)))
+OPENROUTER_RESPONSES = _register(Counter(
+    "openrouter_responses_total", "OpenRouter responses by HTTP status (error = no response).", ("status",)))
+
+
+def timed(histogram: Histogram, operation: str = "") -> Callable:
+    """Decorator: observe each call's duration under operation (default: the function name)."""
+    def decorate(fn: Callable) -> Callable:
+        label = operation or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, label)
+        return wrapper
+    return decorate
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Zero every metric."""
+    for metric in REGISTRY:
+        metric.clear()
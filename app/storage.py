@@ -1,27 +1,1177 @@
-import json
+"""
+Task persistence.
+
+Three interchangeable backends live here, selected with the TASK_STORAGE
+environment variable:
+
+  json  — the original format: data/tasks.json holds the whole task list and
+          is rewritten on every mutation (default).
+  wal   — data/tasks.json is a snapshot; each mutation is appended as one JSONL
+          record to data/tasks.json.wal and the log is folded back into the
+          snapshot in the background once it grows past WAL_COMPACT_BYTES.
+  sqlite  — data/tasks.db (stdlib sqlite3 in WAL mode) with indexes on the
+            fields task_manager filters by; filters and due-date ranges run as
+            SQL, and summary counters are kept up to date by triggers. An
+            existing data/tasks.json is imported on first use.
+
+The json and wal stores keep a parsed copy of the data in memory, as compact
+task_model.Task records, and hand those records out as they are (a Task is
+never changed in place, so no copy is needed); they only touch the
+disk again when the files change underneath them (another process,
+a manual edit). Their summary counters are also saved to data/tasks.summary.json
+after every write, so a fresh process can answer counts() without parsing the
+task data at all. Writes go through transaction(), which holds a thread lock
+plus an fcntl lock on data/tasks.json.lock so several server processes can
+share the same files; whole-file writes go to a temp file that is fsynced and
+renamed over the original, so readers never see a half-written file.
+
+Each user gets a shard of their own: inside user_scope(email) (the server
+enters it from the X-User header) every function here works on
+data/users/<hash>.json (or .db) instead of data/tasks.json. Up to
+STORAGE_MAX_SHARDS stores stay open; the least recently used is dropped, and
+closes once no request is still using it.
+"""
+
+import bisect
+import contextvars
+import hashlib
 import os
-from typing import List, Dict, Any
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+
+from app.task_index import TaskIndex, SummaryCounters, counters_drift
+from app.task_model import Task, as_task
+from app import codec, metrics
+from app.text_index import parse_query
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+DATA_FILE = os.environ.get("TASK_DATA_FILE") or os.path.join(os.path.dirname(__file__), '..', 'data', 'tasks.json')
+STORAGE_BACKEND = os.environ.get("TASK_STORAGE", "json")
+WAL_COMPACT_BYTES = int(os.environ.get("TASK_WAL_COMPACT_BYTES", 1024 * 1024))
+STORAGE_MAX_SHARDS = int(os.environ.get("STORAGE_MAX_SHARDS", 64))
+
+SORT_FIELDS = ("created_at", "updated_at", "due_date", "title")
+
+Signature = Optional[Tuple[int, int, int]]
+# (op, task_id, task): op is "create", "update" or "delete"; task is None for deletes.
+Record = Tuple[str, str, Optional[Union[Task, Dict[str, Any]]]]
+
+
+def _file_signature(path: str) -> Signature:
+    """Return (mtime_ns, size, inode) of a file, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _ensure_file(path: str, content: str) -> None:
+    """Ensure the parent directory and the file exist."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        with open(path, 'w') as f:
+            f.write(content)
+
+
+def _sort_key(field: str):
+    """Total order used by scan(): the field (missing values last), then id."""
+    def key(task: Dict[str, Any]) -> Tuple[bool, str, str]:
+        value = task.get(field)
+        return (value is None, value or "", task["id"])
+    return key
+
+
+def _lock_file(path: str, blocking: bool = True) -> Optional[int]:
+    """Take an exclusive flock on path and return its fd.
+
+    Returns None if blocking is False and another holder has the lock.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return None
+    return fd
+
+
+def _unlock_file(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _atomic_write(path: str, data: Union[str, bytes]) -> None:
+    """Write data to a temp file next to path, fsync it and rename it into place."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class TaskStore:
+    """In-memory task table kept in sync with files on disk.
+
+    Tasks are held in a TaskIndex, so lookups by id, status, priority, subject
+    and due date don't scan the list. Subclasses decide how staleness is
+    detected and how mutations are persisted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.counters_path = os.path.splitext(path)[0] + ".summary.json"
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._file_lock_fd: Optional[int] = None
+        self._file_lock_depth = 0
+        self.index = TaskIndex()
+        self._loaded = False
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the thread lock and the inter-process file lock (re-entrant)."""
+        with self._lock:
+            if self._file_lock_depth == 0:
+                self._file_lock_fd = _lock_file(self.lock_path)
+            self._file_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth -= 1
+                if self._file_lock_depth == 0:
+                    _unlock_file(self._file_lock_fd)
+                    self._file_lock_fd = None
+
+    @contextmanager
+    def transaction(self) -> Iterator["TaskStore"]:
+        """Serialise a read-modify-write against other threads and processes.
+
+        The store is brought up to date on entry, and no other writer can get
+        in until the block exits. Transactions nest.
+        """
+        with self._locked():
+            self.refresh(count=False)
+            yield self
+
+    # ── Subclass hooks ────────────────────────────────────────
+    def _is_stale(self) -> bool:
+        raise NotImplementedError
+
+    def _reload(self) -> None:
+        """Rebuild self.index from disk."""
+        raise NotImplementedError
+
+    def _persist(self, op: str, task_id: str, task: Optional[Dict[str, Any]]) -> None:
+        """Persist a single create/update/delete that was applied to self.index."""
+        raise NotImplementedError
+
+    def _persist_many(self, records: List[Record]) -> None:
+        """Persist several records that were applied to self.index."""
+        for record in records:
+            self._persist(*record)
+
+    def _persist_all(self) -> None:
+        """Persist every task in self.index."""
+        raise NotImplementedError
+
+    def _data_signature(self) -> List[Signature]:
+        """Signatures of the data files on disk, used to validate saved counters."""
+        raise NotImplementedError
+
+    def _state_signature(self) -> List[Signature]:
+        """Signatures of the data files as of the in-memory state."""
+        return self._data_signature()
+
+    # ── Persisted counters ────────────────────────────────────
+    def _save_counters(self) -> None:
+        # No fsync: a stale or torn file fails the signature check and is ignored.
+        data = {"signature": self._state_signature(), "counters": self.index.counters.to_dict()}
+        tmp = f"{self.counters_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(codec.dumps(data))
+        os.replace(tmp, self.counters_path)
+
+    def _read_counters(self) -> Optional[SummaryCounters]:
+        """Return the saved counters if they match the data files as they are now."""
+        try:
+            with open(self.counters_path, 'rb') as f:
+                data = codec.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        current = [list(sig) if sig else None for sig in self._data_signature()]
+        if data.get("signature") != current:
+            return None
+        return SummaryCounters.from_dict(data["counters"])
+
+    def _committed(self) -> None:
+        """Bookkeeping after a write has been persisted."""
+        self.generation += 1
+        self._save_counters()
+
+    # ── Reads ─────────────────────────────────────────────────
+    def refresh(self, count: bool = True) -> None:
+        """Re-read from disk if the files changed since the last read."""
+        with self._lock:
+            if self._loaded and not self._is_stale():
+                if count:
+                    self.hits += 1
+                return
+            self._reload()
+            self._loaded = True
+            self.misses += 1
+            self.generation += 1
+            # Writers save the counters in _committed(); a read only fills in
+            # a missing or stale file, so workers don't all rewrite it.
+            if self._read_counters() is None:
+                self._save_counters()
+
+    def all(self) -> List[Task]:
+        """Return all tasks, in insertion order."""
+        with self._lock:
+            self.refresh()
+            return list(self.index)
+
+    def get(self, task_id: str) -> Optional[Task]:
+        """Return one task, or None."""
+        with self._lock:
+            self.refresh()
+            return self.index.get(task_id)
+
+    def filter(self, status: Optional[str] = None, priority: Optional[str] = None,
+               subject: Optional[str] = None) -> List[Task]:
+        """Return tasks matching every given field, in insertion order.
+
+        subject is a case-insensitive substring match.
+        """
+        with self._lock:
+            self.refresh()
+            return self.index.filter(status, priority, subject)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Task, float]]:
+        """(task, score) for tasks matching every word of query, best first."""
+        with self._lock:
+            self.refresh()
+            return self.index.search(query, limit)
+
+    def scan(self, status: Optional[str] = None, priority: Optional[str] = None,
+             subject: Optional[str] = None, sort: str = "created_at", descending: bool = False,
+             after: Optional[Tuple[Optional[str], str]] = None,
+             limit: Optional[int] = None) -> Iterator[Task]:
+        """Yield matching tasks ordered by (sort field, id).
+
+        after is the (sort value, id) of the last task already seen; only
+        tasks strictly past it are yielded.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Sort must be one of {list(SORT_FIELDS)}, got: '{sort}'")
+        key = _sort_key(sort)
+        with self._lock:
+            self.refresh()
+            tasks = self.index.filter(status, priority, subject)
+        tasks.sort(key=key, reverse=descending)
+        start = 0
+        if after is not None:
+            mark = key({sort: after[0], "id": after[1]})
+            keys = [key(t) for t in tasks]
+            if descending:
+                start = len(keys) - bisect.bisect_left(keys[::-1], mark)
+            else:
+                start = bisect.bisect_right(keys, mark)
+        end = len(tasks) if limit is None else start + limit
+        yield from tasks[start:end]
+
+    def due_between(self, first: str, last: str) -> List[Task]:
+        """Return unfinished tasks due on dates first..last (inclusive), soonest first."""
+        with self._lock:
+            self.refresh()
+            return self.index.open_due_between(first, last)
+
+    def counts(self, today: str, week_end: str) -> Dict[str, Any]:
+        """Return the total, counts by status and priority, and how many
+        unfinished tasks are overdue (before today) or due today..week_end.
+
+        Before the first load this is answered from the saved counters file.
+        """
+        with self._lock:
+            if not self._loaded:
+                counters = self._read_counters()
+                if counters is not None:
+                    self.hits += 1
+                    return counters.snapshot(today, week_end)
+            self.refresh()
+            return self.index.counters.snapshot(today, week_end)
+
+    def verify_counts(self) -> Dict[str, Dict[str, int]]:
+        """Recompute the counters from the tasks and report any drift.
+
+        Covers both the in-memory counters and the saved counters file; any
+        drift found is repaired.
+        """
+        with self._lock:
+            persisted = self._read_counters()
+            self.refresh()
+            actual = SummaryCounters.from_tasks(self.index).to_dict()
+            drift = counters_drift(self.index.counters.to_dict(), actual)
+            if persisted is not None:
+                for key, value in counters_drift(persisted.to_dict(), actual).items():
+                    drift[f"saved.{key}"] = value
+            if drift:
+                self.index.counters = SummaryCounters.from_dict(actual)
+                self._save_counters()
+            return drift
+
+    # ── Writes ────────────────────────────────────────────────
+    def insert(self, task: Union[Task, Dict[str, Any]]) -> None:
+        with self.transaction():
+            self.index.put(as_task(task))
+            self._persist("create", task["id"], task)
+            self._committed()
+
+    def replace(self, task: Union[Task, Dict[str, Any]]) -> None:
+        with self.transaction():
+            if task["id"] not in self.index:
+                raise KeyError(f"Task with id '{task['id']}' not found.")
+            self.index.put(as_task(task))
+            self._persist("update", task["id"], task)
+            self._committed()
+
+    def remove(self, task_id: str) -> bool:
+        with self.transaction():
+            if self.index.drop(task_id) is None:
+                return False
+            self._persist("delete", task_id, None)
+            self._committed()
+            return True
+
+    def write_batch(self, records: List[Record]) -> None:
+        """Apply several records in one transaction and a single write.
+
+        Records are applied in order; updates and deletes must name a task
+        that exists by the time they run.
+        """
+        with self.transaction():
+            for op, task_id, task in records:
+                if op == "delete":
+                    self.index.drop(task_id)
+                else:
+                    self.index.put(as_task(task))
+            self._persist_many(records)
+            self._committed()
+
+    def save_all(self, tasks: List[Dict[str, Any]]) -> None:
+        """Replace the whole task list."""
+        with self.transaction():
+            self.index = TaskIndex(as_task(t) for t in tasks)
+            self._persist_all()
+            self._committed()
+
+    def invalidate(self) -> None:
+        """Forget the in-memory copy so the next read goes to disk."""
+        with self._lock:
+            self._loaded = False
+
+    def version(self) -> str:
+        """Opaque tag for the current data, derived from the data files'
+        signatures so every process (and a reopened store) agrees on it."""
+        with self._locked():
+            self.refresh(count=False)
+            signature = self._state_signature()
+        return hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "generation": self.generation}
+
+    def close(self) -> None:
+        pass
+
+
+class JsonStore(TaskStore):
+    """The whole task list as one JSON array, rewritten on every change."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._signature: Signature = None
+
+    def _is_stale(self) -> bool:
+        return _file_signature(self.path) != self._signature
+
+    def _data_signature(self) -> List[Signature]:
+        return [_file_signature(self.path)]
+
+    def _state_signature(self) -> List[Signature]:
+        # Reads don't take the file lock, so the file may already be newer.
+        return [self._signature]
+
+    def _reload(self) -> None:
+        _ensure_file(self.path, "[]")
+        with open(self.path, 'rb') as f:
+            # fstat the open file: writers replace it, so a path stat could
+            # describe a newer file than the one being read.
+            st = os.fstat(f.fileno())
+            self.index = TaskIndex(map(Task, codec.loads(f.read())))
+        self._signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _persist(self, op, task_id, task) -> None:
+        self._persist_all()
+
+    def _persist_many(self, records) -> None:
+        self._persist_all()
+
+    def _persist_all(self) -> None:
+        _atomic_write(self.path, codec.dumps(list(self.index), pretty=codec.JSON_PRETTY))
+        self._signature = _file_signature(self.path)
+
+
+class WalStore(TaskStore):
+    """A JSON snapshot plus an append-only JSONL log of mutations.
+
+    Log records are {"op": "create"|"update"|"delete", "id": ..., "task": ...}
+    and always carry the full task, so replaying a record that is already in
+    the snapshot is harmless. That is what makes compaction crash-safe: the new
+    snapshot is renamed into place first, and only then is the log trimmed.
+    """
+
+    def __init__(self, path: str, compact_bytes: Optional[int] = None, fsync: bool = True):
+        super().__init__(path)
+        self.log_path = f"{path}.wal"
+        self.compact_lock_path = f"{path}.compact.lock"
+        self.compact_bytes = compact_bytes if compact_bytes is not None else WAL_COMPACT_BYTES
+        self.fsync = fsync
+        self._snapshot_signature: Signature = None
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        self._compactor: Optional[threading.Thread] = None
+
+    def refresh(self, count: bool = True) -> None:
+        # Snapshot and log must be read as a pair, so even reads take the file lock.
+        with self._locked():
+            super().refresh(count)
+
+    def _data_signature(self) -> List[Signature]:
+        return [_file_signature(self.path), _file_signature(self.log_path)]
+
+    def _is_stale(self) -> bool:
+        if _file_signature(self.path) != self._snapshot_signature:
+            return True
+        log = _file_signature(self.log_path)
+        if log is None or log[2] != self._log_inode or log[1] < self._log_offset:
+            return True
+        if log[1] > self._log_offset and self._replay_from(self._log_offset):
+            # Another writer appended records; picked up without a full reload.
+            self.generation += 1
+        return False
+
+    def _reload(self) -> None:
+        _ensure_file(self.path, "[]")
+        _ensure_file(self.log_path, "")
+        self._snapshot_signature = _file_signature(self.path)
+        with open(self.path, 'rb') as f:
+            self.index = TaskIndex(map(Task, codec.loads(f.read())))
+        self._log_inode = _file_signature(self.log_path)[2]
+        self._log_offset = 0
+        self._replay_from(0)
+
+    def _replay_from(self, offset: int) -> int:
+        """Apply complete log lines after offset; a torn final line is left alone.
+
+        Returns the number of records applied.
+        """
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        applied = 0
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(codec.loads(line))
+                applied += 1
+        self._log_offset = offset + end
+        return applied
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        if record["op"] == "delete":
+            self.index.drop(record["id"])
+        else:
+            self.index.put(Task(record["task"]))
+
+    def _persist(self, op, task_id, task) -> None:
+        self._persist_many([(op, task_id, task)])
+
+    def _persist_many(self, records) -> None:
+        lines = b"".join(
+            codec.dumps({"op": op, "id": task_id, "task": task}) + b"\n" for op, task_id, task in records
+        )
+        with open(self.log_path, 'ab') as f:
+            if f.tell() > self._log_offset:
+                # Drop the partial record left behind by a crashed writer.
+                f.truncate(self._log_offset)
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self._log_offset = f.tell()
+        if self._log_offset >= self.compact_bytes:
+            self._start_compaction()
+
+    def save_all(self, tasks: List[Dict[str, Any]]) -> None:
+        # Rewriting the snapshot must not interleave with a compaction.
+        fd = _lock_file(self.compact_lock_path)
+        try:
+            super().save_all(tasks)
+        finally:
+            _unlock_file(fd)
+
+    def _persist_all(self) -> None:
+        _ensure_file(self.log_path, "")
+        _atomic_write(self.path, codec.dumps(list(self.index)))
+        _atomic_write(self.log_path, "")
+        self._snapshot_signature = _file_signature(self.path)
+        self._log_inode = _file_signature(self.log_path)[2]
+        self._log_offset = 0
+
+    def _start_compaction(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="wal-compactor", daemon=True)
+        self._compactor.start()
+
+    def compact(self) -> None:
+        """Fold the log into a new snapshot.
+
+        The snapshot is written outside the store lock so writers keep
+        appending while it is serialised; records appended meanwhile are
+        carried over into the trimmed log. Only one compaction runs at a time
+        across processes; if another is in progress this returns immediately.
+        """
+        fd = _lock_file(self.compact_lock_path, blocking=False)
+        if fd is None:
+            return
+        try:
+            with self.transaction():
+                tasks = list(self.index)
+                offset = self._log_offset
+            _atomic_write(self.path, codec.dumps(tasks))
+            with self._locked():
+                # Catch up on records other writers appended meanwhile, then
+                # keep exactly those in the trimmed log.
+                self.refresh(count=False)
+                with open(self.log_path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read(self._log_offset - offset)
+                _atomic_write(self.log_path, tail.decode("utf-8"))
+                self._snapshot_signature = _file_signature(self.path)
+                self._log_inode = _file_signature(self.log_path)[2]
+                self._log_offset = len(tail)
+                self._save_counters()
+        finally:
+            _unlock_file(fd)
+
+    def wait_for_compaction(self) -> None:
+        if self._compactor is not None:
+            self._compactor.join()
+
+
+class SqliteStore:
+    """Tasks in a SQLite table, with the same interface as TaskStore.
+
+    path is the JSON data file; the database lives next to it with a .db
+    suffix, and the JSON file (plus any WAL log) is imported the first time
+    the database is created.
+    """
+
+    COLUMNS = ("id", "title", "description", "subject", "due_date",
+               "priority", "status", "created_at", "updated_at")
 
-DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'tasks.json')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id          TEXT PRIMARY KEY,
+            title       TEXT,
+            description TEXT,
+            subject     TEXT,
+            due_date    TEXT,
+            priority    TEXT,
+            status      TEXT,
+            created_at  TEXT,
+            updated_at  TEXT,
+            extra       TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+        CREATE INDEX IF NOT EXISTS idx_tasks_subject ON tasks (subject);
+        CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_open_due ON tasks (due_date) WHERE status != 'completed';
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at, id);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+    """
 
+    # counters(kind, key, n): kind is 'total', 'status', 'priority' or
+    # 'open_due' (due dates of unfinished tasks).
+    COUNTERS_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS counters (
+            kind TEXT NOT NULL,
+            key  TEXT NOT NULL,
+            n    INTEGER NOT NULL,
+            PRIMARY KEY (kind, key)
+        );
+        CREATE TRIGGER IF NOT EXISTS tasks_count_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO counters VALUES ('total', '', 1)
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+            INSERT INTO counters VALUES ('status', COALESCE(NEW.status, ''), 1)
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+            INSERT INTO counters VALUES ('priority', COALESCE(NEW.priority, ''), 1)
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+            INSERT INTO counters SELECT 'open_due', NEW.due_date, 1
+                WHERE NEW.due_date != '' AND NEW.status IS NOT 'completed'
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_count_delete AFTER DELETE ON tasks BEGIN
+            UPDATE counters SET n = n - 1 WHERE kind = 'total';
+            UPDATE counters SET n = n - 1 WHERE kind = 'status' AND key = COALESCE(OLD.status, '');
+            UPDATE counters SET n = n - 1 WHERE kind = 'priority' AND key = COALESCE(OLD.priority, '');
+            UPDATE counters SET n = n - 1 WHERE kind = 'open_due' AND key = OLD.due_date
+                AND OLD.due_date != '' AND OLD.status IS NOT 'completed';
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_count_update
+        AFTER UPDATE OF status, priority, due_date ON tasks BEGIN
+            UPDATE counters SET n = n - 1 WHERE kind = 'status' AND key = COALESCE(OLD.status, '');
+            UPDATE counters SET n = n - 1 WHERE kind = 'priority' AND key = COALESCE(OLD.priority, '');
+            UPDATE counters SET n = n - 1 WHERE kind = 'open_due' AND key = OLD.due_date
+                AND OLD.due_date != '' AND OLD.status IS NOT 'completed';
+            INSERT INTO counters VALUES ('status', COALESCE(NEW.status, ''), 1)
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+            INSERT INTO counters VALUES ('priority', COALESCE(NEW.priority, ''), 1)
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+            INSERT INTO counters SELECT 'open_due', NEW.due_date, 1
+                WHERE NEW.due_date != '' AND NEW.status IS NOT 'completed'
+                ON CONFLICT (kind, key) DO UPDATE SET n = n + 1;
+        END;
+    """
 
-def _ensure_data_file():
-    """Ensure the data directory and file exist."""
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w') as f:
-            json.dump([], f)
+    # Full-text index over the searchable columns, kept in step by triggers.
+    SEARCH_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, subject, content = 'tasks', content_rowid = 'rowid'
+        );
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description, subject)
+                VALUES (NEW.rowid, NEW.title, NEW.description, NEW.subject);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description, subject)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.description, OLD.subject);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+        AFTER UPDATE OF title, description, subject ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description, subject)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.description, OLD.subject);
+            INSERT INTO tasks_fts (rowid, title, description, subject)
+                VALUES (NEW.rowid, NEW.title, NEW.description, NEW.subject);
+        END;
+    """
 
+    # The same counts, recomputed from the tasks table.
+    RECOUNT = """
+        SELECT 'total', '', COUNT(*) FROM tasks
+        UNION ALL SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tasks GROUP BY 2
+        UNION ALL SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tasks GROUP BY 2
+        UNION ALL SELECT 'open_due', due_date, COUNT(*) FROM tasks
+            WHERE due_date != '' AND status IS NOT 'completed' GROUP BY 2
+    """
 
-def load_tasks() -> List[Dict[str, Any]]:
-    """Load all tasks from the JSON storage file."""
-    _ensure_data_file()
-    with open(DATA_FILE, 'r') as f:
-        return json.load(f)
+    def __init__(self, path: str):
+        self.path = path
+        self.db_path = os.path.splitext(path)[0] + ".db"
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = self._conn()
+        with conn:
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.executescript(self.SCHEMA + self.COUNTERS_SCHEMA + self.SEARCH_SCHEMA)
+        if "counters" not in tables:
+            # Databases created before the counters table existed.
+            self._rebuild_counters()
+        if "tasks_fts" not in tables:
+            with conn:
+                conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+        if "tasks" not in tables and os.path.exists(path):
+            self._import(_read_json_data(path))
 
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("py_lower", 1, lambda v: v.lower() if v else "", deterministic=True)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
 
+    def _to_row(self, task: Dict[str, Any]) -> tuple:
+        extra = {k: v for k, v in task.items() if k not in self.COLUMNS}
+        return tuple(task.get(c) for c in self.COLUMNS) + (codec.dumps_text(extra) if extra else None,)
+
+    def _from_row(self, row: sqlite3.Row) -> Task:
+        task = {c: row[c] for c in self.COLUMNS}
+        if row["extra"]:
+            task.update(codec.loads(row["extra"]))
+        return Task(task)
+
+    def _select(self, where: str = "", params: tuple = (), order: str = "rowid") -> List[Task]:
+        sql = "SELECT * FROM tasks"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        return [self._from_row(r) for r in self._conn().execute(sql, params)]
+
+    @contextmanager
+    def transaction(self) -> Iterator["SqliteStore"]:
+        """Run the block in one IMMEDIATE transaction on this thread's connection.
+
+        SQLite's own write lock serialises writers across threads and
+        processes. Transactions nest; only the outermost one commits.
+        """
+        conn = self._conn()
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.rollback()
+            raise
+        self._local.depth = depth
+        if depth == 0:
+            conn.commit()
+
+    def _write(self, sql: str, params: tuple) -> int:
+        """Run one write statement and bump the generation in the same transaction."""
+        with self.transaction():
+            conn = self._conn()
+            changed = conn.execute(sql, params).rowcount
+            if changed:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        return changed
+
+    def _import(self, tasks: List[Dict[str, Any]]) -> None:
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 1))
+        with self.transaction():
+            conn = self._conn()
+            conn.executemany(f"INSERT OR REPLACE INTO tasks VALUES ({placeholders})",
+                             [self._to_row(t) for t in tasks])
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    # ── Reads ─────────────────────────────────────────────────
+    @property
+    def generation(self) -> int:
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def refresh(self, count: bool = True) -> None:
+        pass
+
+    def all(self) -> List[Task]:
+        return self._select()
+
+    def get(self, task_id: str) -> Optional[Task]:
+        rows = self._select("id = ?", (task_id,))
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _filter_clauses(status: Optional[str], priority: Optional[str],
+                        subject: Optional[str]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if priority:
+            clauses.append("priority = ?")
+            params.append(priority)
+        if subject:
+            clauses.append("instr(py_lower(subject), ?) > 0")
+            params.append(subject.lower())
+        return clauses, params
+
+    def filter(self, status: Optional[str] = None, priority: Optional[str] = None,
+               subject: Optional[str] = None) -> List[Task]:
+        clauses, params = self._filter_clauses(status, priority, subject)
+        return self._select(" AND ".join(clauses), tuple(params))
+
+    def scan(self, status: Optional[str] = None, priority: Optional[str] = None,
+             subject: Optional[str] = None, sort: str = "created_at", descending: bool = False,
+             after: Optional[Tuple[Optional[str], str]] = None,
+             limit: Optional[int] = None) -> Iterator[Task]:
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Sort must be one of {list(SORT_FIELDS)}, got: '{sort}'")
+        clauses, params = self._filter_clauses(status, priority, subject)
+        # Keyset pagination on the same (missing last, value, id) order as TaskStore.scan.
+        key = [f"({sort} IS NULL)", f"COALESCE({sort}, '')", "id"]
+        direction = "DESC" if descending else "ASC"
+        if after is not None:
+            clauses.append(f"({', '.join(key)}) {'<' if descending else '>'} (?, ?, ?)")
+            params += [after[0] is None, after[0] or "", after[1]]
+        sql = "SELECT * FROM tasks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY " + ", ".join(f"{part} {direction}" for part in key)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        for row in self._conn().execute(sql, params):
+            yield self._from_row(row)
+
+    def due_between(self, first: str, last: str) -> List[Task]:
+        return self._select("due_date BETWEEN ? AND ? AND status != 'completed'",
+                            (first, last), order="due_date, rowid")
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Task, float]]:
+        words, prefix = parse_query(query)
+        if not words:
+            return []
+        terms = [f'"{w}"' for w in words]
+        if prefix:
+            terms[-1] += "*"
+        # bm25() is lower-is-better; title hits weigh double, as in TextIndex.
+        rows = self._conn().execute(
+            "SELECT tasks.*, bm25(tasks_fts, 2.0, 1.0, 1.0) AS rank FROM tasks_fts"
+            " JOIN tasks ON tasks.rowid = tasks_fts.rowid WHERE tasks_fts MATCH ?"
+            " ORDER BY rank, tasks.rowid LIMIT ?", (" ".join(terms), limit))
+        return [(self._from_row(r), -r["rank"]) for r in rows]
+
+    def _rebuild_counters(self) -> None:
+        with self.transaction():
+            conn = self._conn()
+            conn.execute("DELETE FROM counters")
+            conn.execute(f"INSERT INTO counters {self.RECOUNT}")
+
+    @staticmethod
+    def _counters_dict(rows) -> Dict[str, Any]:
+        """Shape (kind, key, n) rows like SummaryCounters.to_dict()."""
+        data: Dict[str, Any] = {"total": 0, "by_status": {}, "by_priority": {}, "open_due": {}}
+        fields = {"status": "by_status", "priority": "by_priority", "open_due": "open_due"}
+        for kind, key, n in rows:
+            if kind == "total":
+                data["total"] = n
+            elif n:
+                data[fields[kind]][key] = n
+        return data
+
+    def counts(self, today: str, week_end: str) -> Dict[str, Any]:
+        conn = self._conn()
+        data = self._counters_dict(conn.execute(
+            "SELECT kind, key, n FROM counters WHERE kind IN ('total', 'status', 'priority')"))
+        overdue, due_this_week = conn.execute(
+            "SELECT COALESCE(SUM(CASE WHEN key < ? THEN n END), 0),"
+            "       COALESCE(SUM(CASE WHEN key >= ? THEN n END), 0)"
+            " FROM counters WHERE kind = 'open_due' AND key <= ?",
+            (today, today, week_end)).fetchone()
+        return {"total": data["total"], "by_status": data["by_status"], "by_priority": data["by_priority"],
+                "overdue": overdue, "due_this_week": due_this_week}
+
+    def verify_counts(self) -> Dict[str, Dict[str, int]]:
+        with self.transaction():
+            conn = self._conn()
+            counted = self._counters_dict(conn.execute("SELECT kind, key, n FROM counters"))
+            actual = self._counters_dict(conn.execute(self.RECOUNT))
+            drift = counters_drift(counted, actual)
+            if drift:
+                self._rebuild_counters()
+        return drift
+
+    # ── Writes ────────────────────────────────────────────────
+    def insert(self, task: Dict[str, Any]) -> None:
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 1))
+        self._write(f"INSERT INTO tasks VALUES ({placeholders})", self._to_row(task))
+
+    def replace(self, task: Dict[str, Any]) -> None:
+        assignments = ", ".join(f"{c} = ?" for c in self.COLUMNS[1:] + ("extra",))
+        row = self._to_row(task)
+        if not self._write(f"UPDATE tasks SET {assignments} WHERE id = ?", row[1:] + (row[0],)):
+            raise KeyError(f"Task with id '{task['id']}' not found.")
+
+    def remove(self, task_id: str) -> bool:
+        return bool(self._write("DELETE FROM tasks WHERE id = ?", (task_id,)))
+
+    def write_batch(self, records: List[Record]) -> None:
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 1))
+        assignments = ", ".join(f"{c} = ?" for c in self.COLUMNS[1:] + ("extra",))
+        with self.transaction():
+            conn = self._conn()
+            for op, task_id, task in records:
+                if op == "create":
+                    conn.execute(f"INSERT INTO tasks VALUES ({placeholders})", self._to_row(task))
+                elif op == "update":
+                    row = self._to_row(task)
+                    conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", row[1:] + (row[0],))
+                else:
+                    conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    def save_all(self, tasks: List[Dict[str, Any]]) -> None:
+        with self.transaction():
+            self._conn().execute("DELETE FROM tasks")
+            self._import(tasks)
+
+    def invalidate(self) -> None:
+        pass
+
+    def version(self) -> str:
+        # The generation lives in the database, so it is shared by every process;
+        # the inode tells a recreated database apart.
+        return f"{os.stat(self.db_path).st_ino:x}-{self.generation}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": 0, "misses": 0, "generation": self.generation}
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _read_json_data(path: str) -> List[Dict[str, Any]]:
+    """Read tasks from a JSON data file, including any unfolded WAL records."""
+    store_class = WalStore if os.path.exists(f"{path}.wal") else JsonStore
+    return store_class(path).all()
+
+
+def migrate_json_to_sqlite(json_path: Optional[str] = None) -> int:
+    """Copy every task from the JSON data file into the SQLite database next to it.
+
+    Existing rows with the same id are overwritten. Returns the number of tasks copied.
+    """
+    json_path = json_path or DATA_FILE
+    tasks = _read_json_data(json_path)
+    store = SqliteStore(json_path)
+    store._import(tasks)
+    store.close()
+    return len(tasks)
+
+
+BACKENDS = {
+    "json": JsonStore,
+    "wal": WalStore,
+    "sqlite": SqliteStore,
+}
+
+_current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("task_user", default=None)
+
+
+def normalize_user(user: Optional[str]) -> Optional[str]:
+    """Users are identified by e-mail, compared case-insensitively; blank means none."""
+    user = (user or "").strip().lower()
+    return user or None
+
+
+def current_user() -> Optional[str]:
+    return _current_user.get()
+
+
+def set_user(user: Optional[str]) -> contextvars.Token:
+    """Make user's shard the current one; pass the token to reset_user() to undo."""
+    return _current_user.set(normalize_user(user))
+
+
+def reset_user(token: contextvars.Token) -> None:
+    _current_user.reset(token)
+
+
+@contextmanager
+def user_scope(user: Optional[str]) -> Iterator[None]:
+    """Work on user's shard inside the block (None: the shared data file)."""
+    token = set_user(user)
+    try:
+        yield
+    finally:
+        reset_user(token)
+
+
+def shard_path(user: Optional[str] = None) -> str:
+    """The data file for user; hashed so any e-mail makes a safe file name."""
+    user = normalize_user(user)
+    if user is None:
+        return DATA_FILE
+    key = hashlib.sha256(user.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(os.path.dirname(DATA_FILE), "users", f"{key}.json")
+
+
+_store_lock = threading.Lock()
+_stores: "OrderedDict[str, Any]" = OrderedDict()  # path -> open store, least recently used first
+_stores_config: Optional[tuple] = None
+
+
+def get_store():
+    """Return the store for the configured backend and the current user's shard."""
+    global _stores_config
+    backend = BACKENDS.get(STORAGE_BACKEND)
+    if backend is None:
+        raise ValueError(f"TASK_STORAGE must be one of {sorted(BACKENDS)}, got: '{STORAGE_BACKEND}'")
+    path = shard_path(current_user())
+    with _store_lock:
+        if _stores_config != (backend, DATA_FILE):
+            _close_all()
+            _stores_config = (backend, DATA_FILE)
+        store = _stores.get(path)
+        if store is not None:
+            _stores.move_to_end(path)
+            return store
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        store = _stores[path] = backend(path)
+        while len(_stores) > max(STORAGE_MAX_SHARDS, 1):
+            # Only forget the store: a request on another thread (or a lazy
+            # scan) may still be using it. Its connections close when the
+            # last reference goes away.
+            _stores.popitem(last=False)
+        return store
+
+
+def _close_all() -> None:
+    while _stores:
+        _stores.popitem()[1].close()
+
+
+def close_stores() -> None:
+    """Close every open shard (they reopen on next use)."""
+    with _store_lock:
+        _close_all()
+
+
+def shard_stats() -> Dict[str, Any]:
+    return {"open": len(_stores), "max": STORAGE_MAX_SHARDS}
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def load_tasks() -> List[Task]:
+    """Load all tasks as task_model.Task records (read-only; see Task.updated)."""
+    return get_store().all()
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
 def save_tasks(tasks: List[Dict[str, Any]]) -> None:
-    """Save all tasks to the JSON storage file."""
-    _ensure_data_file()
-    with open(DATA_FILE, 'w') as f:
-        json.dump(tasks, f, indent=2)
+    """Replace the stored task list with tasks."""
+    get_store().save_all(tasks)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def get_task(task_id: str) -> Optional[Task]:
+    """Return the task with this id, or None."""
+    return get_store().get(task_id)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def insert_task(task: Union[Task, Dict[str, Any]]) -> None:
+    """Persist a new task."""
+    get_store().insert(task)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def replace_task(task: Union[Task, Dict[str, Any]]) -> None:
+    """Persist new contents for an existing task. Raises KeyError if it is missing."""
+    get_store().replace(task)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def remove_task(task_id: str) -> bool:
+    """Delete a task. Returns True if it existed."""
+    return get_store().remove(task_id)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def write_batch(records: List[Record]) -> None:
+    """Apply (op, task_id, task) records atomically with a single write."""
+    get_store().write_batch(records)
+
+
+def transaction():
+    """Context manager that makes a read-modify-write atomic; see TaskStore.transaction."""
+    return get_store().transaction()
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def query_tasks(status: Optional[str] = None, priority: Optional[str] = None,
+                subject: Optional[str] = None) -> List[Task]:
+    """Return tasks matching status, priority and a subject substring."""
+    return get_store().filter(status=status, priority=priority, subject=subject)
+
+
+def scan_tasks(status: Optional[str] = None, priority: Optional[str] = None,
+               subject: Optional[str] = None, sort: str = "created_at", descending: bool = False,
+               after: Optional[Tuple[Optional[str], str]] = None,
+               limit: Optional[int] = None) -> Iterator[Task]:
+    """Lazily yield matching tasks in (sort, id) order; see TaskStore.scan."""
+    return get_store().scan(status=status, priority=priority, subject=subject, sort=sort,
+                            descending=descending, after=after, limit=limit)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def search_tasks(query: str, limit: int = 20) -> List[Tuple[Task, float]]:
+    """Full-text search over title, description and subject: (task, score), best first."""
+    return get_store().search(query, limit)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def tasks_due_between(first: str, last: str) -> List[Task]:
+    """Return unfinished tasks due between two YYYY-MM-DD dates, soonest first."""
+    return get_store().due_between(first, last)
+
+
+@metrics.timed(metrics.STORAGE_SECONDS)
+def task_counts(today: str, week_end: str) -> Dict[str, Any]:
+    """Return the total, counts by status and priority, and overdue / due-soon counts."""
+    return get_store().counts(today, week_end)
+
+
+def verify_task_counts() -> Dict[str, Dict[str, int]]:
+    """Recompute the summary counters from scratch; returns (and repairs) any drift."""
+    return get_store().verify_counts()
+
+
+def get_generation() -> int:
+    """Return a counter that changes whenever the stored task list changes."""
+    store = get_store()
+    store.refresh(count=False)
+    return store.generation
+
+
+def dataset_version() -> str:
+    """Return a short string that changes whenever the stored task list changes.
+
+    Unlike get_generation(), every process reports the same version for the
+    same data and a different one for different data, so it can be used as
+    an HTTP ETag whichever worker answers.
+    """
+    return get_store().version()
+
+
+def invalidate_cache() -> None:
+    """Drop the cached task list so the next load re-reads the files."""
+    get_store().invalidate()
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return cache hit/miss counters and the current generation."""
+    return get_store().stats()
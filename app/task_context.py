@@ -0,0 +1,139 @@
+"""
+Compact task context for chat prompts.
+
+Instead of the whole task list as indented JSON, the model gets a small
+pipe-separated table of the most urgent tasks (overdue first, then by due
+date and priority), only the fields it needs, and a one-line summary of
+whatever didn't fit in the token budget. Tasks are task_model.Task records,
+read through their typed attributes.
+"""
+
+import json
+import os
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.task_model import Task
+
+CHAT_CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS", 800))
+NOTES_CHARS = 80
+HEADER = "title|subject|due|days_left|priority|status|notes"
+_PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def _days_left(task: Task, today: date) -> Optional[int]:
+    due = task.due_date
+    return (due - today).days if type(due) is date else None
+
+
+def _urgency(task: Task, today: date) -> Tuple:
+    """Sort key: unfinished before completed, then overdue / soonest due, then priority."""
+    days = _days_left(task, today)
+    return (task.status == "completed", days is None, days if days is not None else 0,
+            _PRIORITY_RANK.get(task.priority, 1), task.title or "")
+
+
+def _cell(value: Any) -> str:
+    return " ".join(str(value if value is not None else "").replace("|", "/").split())
+
+
+def _row(task: Task, today: date) -> str:
+    days = _days_left(task, today)
+    notes = _cell(task.description)
+    if len(notes) > NOTES_CHARS:
+        notes = notes[:NOTES_CHARS - 1] + "…"
+    return "|".join([_cell(task.title), _cell(task.subject), _cell(task.due_date),
+                     "" if days is None else str(days), _cell(task.priority),
+                     _cell(task.status), notes])
+
+
+def _summary(rest: List[Task]) -> str:
+    by_status: Dict[str, int] = {}
+    subjects: Dict[str, int] = {}
+    for task in rest:
+        status = str(task.status or "unknown")
+        by_status[status] = by_status.get(status, 0) + 1
+        if task.subject:
+            subjects[task.subject] = subjects.get(task.subject, 0) + 1
+    counts = ", ".join(f"{n} {s}" for s, n in sorted(by_status.items()))
+    top = ", ".join(s for s, _ in sorted(subjects.items(), key=lambda kv: -kv[1])[:5])
+    return f"+{len(rest)} more not listed ({counts})" + (f"; subjects: {top}" if top else "")
+
+
+def build_context(tasks: List[Task], budget: Optional[int] = None,
+                  today: Optional[date] = None) -> str:
+    """Encode tasks as a table of about `budget` tokens, most urgent first."""
+    return _encode(tasks, budget, today)[0]
+
+
+def _encode(tasks, budget, today) -> Tuple[str, int]:
+    """(context text, number of tasks listed individually)."""
+    budget = CHAT_CONTEXT_TOKENS if budget is None else budget
+    today = today or date.today()
+    ranked = sorted(tasks, key=lambda t: _urgency(t, today))
+    lines = [f"Today: {today.isoformat()}. {len(tasks)} tasks, most urgent first.", HEADER]
+    used = sum(estimate_tokens(line) for line in lines)
+    reserve = estimate_tokens(_summary(ranked)) + 8  # room for the summary line
+    listed = 0
+    for task in ranked:
+        row = _row(task, today)
+        cost = estimate_tokens(row)
+        if used + cost + reserve > budget:
+            break
+        lines.append(row)
+        used += cost
+        listed += 1
+    if listed < len(ranked):
+        lines.append(_summary(ranked[listed:]))
+    return "\n".join(lines), listed
+
+
+def legacy_context(tasks: List[Task]) -> str:
+    """The old encoding (every field, indented JSON), kept for comparison."""
+    return json.dumps([task.to_dict() for task in tasks], indent=2)
+
+
+def context_report(tasks: List[Task], budget: Optional[int] = None) -> Dict[str, Any]:
+    """Token counts for the old and new encodings of the same tasks."""
+    compact, listed = _encode(tasks, budget, None)
+    before = estimate_tokens(legacy_context(tasks))
+    after = estimate_tokens(compact)
+    return {
+        "tasks": len(tasks),
+        "listed": listed,
+        "budget": CHAT_CONTEXT_TOKENS if budget is None else budget,
+        "tokens_before": before,
+        "tokens_after": after,
+        "saved": round(1 - after / before, 3) if before else 0.0,
+    }
+
+
+_cache_lock = threading.Lock()
+_cached: Tuple[Optional[tuple], str] = (None, "")
+stats = {"hits": 0, "misses": 0}
+
+
+def cached_context(version: str, load: Callable[[], List[Task]],
+                   budget: Optional[int] = None) -> str:
+    """build_context(load()), reused while (version, budget, today) is unchanged.
+
+    load is only called on a miss, so an unchanged task list is neither
+    re-read nor re-encoded.
+    """
+    global _cached
+    key = (version, CHAT_CONTEXT_TOKENS if budget is None else budget, date.today())
+    with _cache_lock:
+        if _cached[0] == key:
+            stats["hits"] += 1
+            return _cached[1]
+    text = build_context(load(), budget)
+    with _cache_lock:
+        stats["misses"] += 1
+        _cached = (key, text)
+    return text
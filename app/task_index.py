@@ -0,0 +1,312 @@
+"""
+In-memory secondary indexes over a list of task_model.Task records.
+
+Everything here reads the typed attributes (task.status, task.due_date as a
+date), never the dict view. A due_date that isn't a valid date (old data
+kept as-is by Task) is treated as no due date.
+
+TaskIndex holds the tasks by id (in insertion order, like the JSON array on
+disk) together with:
+  - id buckets by status and by priority
+  - a trigram index over lower-cased subjects, for substring matching
+  - (due_date, position, id) triples kept sorted, for date-range queries,
+    and the same for unfinished tasks only (deadlines: upcoming, overdue)
+  - SummaryCounters: totals by status and priority plus the due dates of
+    unfinished tasks, for the dashboard summary
+  - a TextIndex over title, description and subject, for full-text search,
+    built on the first search rather than on every load (it costs several
+    times more than the rest put together)
+so lookups cost O(1) or O(log N + k) instead of a scan over every task.
+"""
+
+import math
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from app.task_model import Status, Task
+from app.text_index import TextIndex
+
+Day = Union[str, date]  # query bounds: YYYY-MM-DD strings or dates
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SummaryCounters:
+    """Task counts maintained incrementally as tasks are added and removed.
+
+    Overdue and due-this-week depend on today's date, so instead of counts the
+    due dates of unfinished tasks are kept sorted and answered with bisect.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.by_status: Dict[str, int] = {}
+        self.by_priority: Dict[str, int] = {}
+        self._open_due: List[date] = []
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Task]) -> "SummaryCounters":
+        counters = cls()
+        for task in tasks:
+            counters.add(task)
+        return counters
+
+    def add(self, task: Task) -> None:
+        self.total += 1
+        _bump(self.by_status, _plain(task.status), 1)
+        _bump(self.by_priority, _plain(task.priority), 1)
+        due = _open_due_date(task)
+        if due is not None:
+            insort(self._open_due, due)
+
+    def remove(self, task: Task) -> None:
+        self.total -= 1
+        _bump(self.by_status, _plain(task.status), -1)
+        _bump(self.by_priority, _plain(task.priority), -1)
+        due = _open_due_date(task)
+        if due is not None:
+            del self._open_due[bisect_left(self._open_due, due)]
+
+    def snapshot(self, today: Day, week_end: Day) -> Dict[str, Any]:
+        """Counts as of today; due_this_week covers today..week_end."""
+        start = bisect_left(self._open_due, _day(today))
+        return {
+            "total": self.total,
+            "by_status": dict(self.by_status),
+            "by_priority": dict(self.by_priority),
+            "overdue": start,
+            "due_this_week": bisect_right(self._open_due, _day(week_end)) - start,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-JSON form; unfinished due dates are stored as a histogram."""
+        open_due: Dict[str, int] = {}
+        for due in self._open_due:
+            key = due.isoformat()
+            open_due[key] = open_due.get(key, 0) + 1
+        return {"total": self.total, "by_status": dict(self.by_status),
+                "by_priority": dict(self.by_priority), "open_due": open_due}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SummaryCounters":
+        counters = cls()
+        counters.total = data["total"]
+        counters.by_status = dict(data["by_status"])
+        counters.by_priority = dict(data["by_priority"])
+        counters._open_due = sorted(date.fromisoformat(d) for d, n in data["open_due"].items() for _ in range(n))
+        return counters
+
+
+def counters_drift(counted: Dict[str, Any], actual: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Compare two SummaryCounters.to_dict() results.
+
+    Returns {"by_status.pending": {"counted": 3, "actual": 4}, ...} for every
+    count that differs; empty when they agree.
+    """
+    drift = {}
+    if counted["total"] != actual["total"]:
+        drift["total"] = {"counted": counted["total"], "actual": actual["total"]}
+    for field in ("by_status", "by_priority", "open_due"):
+        for key in sorted(set(counted[field]) | set(actual[field]), key=str):
+            a, b = counted[field].get(key, 0), actual[field].get(key, 0)
+            if a != b:
+                drift[f"{field}.{key}"] = {"counted": a, "actual": b}
+    return drift
+
+
+class TaskIndex:
+    """Tasks by id plus the secondary indexes task_manager queries need.
+
+    Tasks are stored by reference and must be replaced with put(), never
+    mutated in place, or the indexes will go stale.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        self.by_id: Dict[str, Task] = {}
+        self.by_status: Dict[str, Set[str]] = {}
+        self.by_priority: Dict[str, Set[str]] = {}
+        self._position: Dict[str, int] = {}
+        self._next_position = 0
+        self._subject_ids: Dict[str, Set[str]] = {}   # lower-cased subject -> ids
+        self._trigrams: Dict[str, Set[str]] = {}      # trigram -> lower-cased subjects
+        self._due: List[Tuple[date, int, str]] = []
+        self._open_due: List[Tuple[date, int, str]] = []
+        self.counters = SummaryCounters()
+        self._text: Optional[TextIndex] = None
+        for task in tasks:
+            self.put(task)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    @property
+    def text(self) -> TextIndex:
+        """The full-text index, built on first use and maintained from then on."""
+        if self._text is None:
+            self._text = TextIndex.from_tasks(self.by_id.values())
+        return self._text
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.by_id
+
+    def __iter__(self) -> Iterator[Task]:
+        return iter(self.by_id.values())
+
+    def get(self, task_id: str) -> Optional[Task]:
+        return self.by_id.get(task_id)
+
+    # ── Maintenance ───────────────────────────────────────────
+    def put(self, task: Task) -> None:
+        """Add a task, or replace the task with the same id in place."""
+        task_id = task.id
+        old = self.by_id.get(task_id)
+        if old is not None:
+            self._unindex(old)
+        else:
+            self._position[task_id] = self._next_position
+            self._next_position += 1
+        self.by_id[task_id] = task
+        self._index(task)
+
+    def drop(self, task_id: str) -> Optional[Task]:
+        """Remove a task and return it, or None if it wasn't there."""
+        task = self.by_id.pop(task_id, None)
+        if task is not None:
+            self._unindex(task)
+            del self._position[task_id]
+        return task
+
+    def _index(self, task: Task) -> None:
+        task_id = task.id
+        self.by_status.setdefault(task.status, set()).add(task_id)
+        self.by_priority.setdefault(task.priority, set()).add(task_id)
+        subject = (task.subject or "").lower()
+        ids = self._subject_ids.get(subject)
+        if ids is None:
+            ids = self._subject_ids[subject] = set()
+            for gram in _trigrams(subject):
+                self._trigrams.setdefault(gram, set()).add(subject)
+        ids.add(task_id)
+        due = _due_date(task)
+        if due is not None:
+            entry = (due, self._position[task_id], task_id)
+            insort(self._due, entry)
+            if task.status != Status.COMPLETED:
+                insort(self._open_due, entry)
+        self.counters.add(task)
+        if self._text is not None:
+            self._text.add(task)
+
+    def _unindex(self, task: Task) -> None:
+        task_id = task.id
+        _discard(self.by_status, task.status, task_id)
+        _discard(self.by_priority, task.priority, task_id)
+        subject = (task.subject or "").lower()
+        if _discard(self._subject_ids, subject, task_id):
+            for gram in _trigrams(subject):
+                _discard(self._trigrams, gram, subject)
+        due = _due_date(task)
+        if due is not None:
+            entry = (due, self._position[task_id], task_id)
+            del self._due[bisect_left(self._due, entry)]
+            if task.status != Status.COMPLETED:
+                del self._open_due[bisect_left(self._open_due, entry)]
+        self.counters.remove(task)
+        if self._text is not None:
+            self._text.remove(task)
+
+    # ── Queries ───────────────────────────────────────────────
+    def subject_ids(self, needle: str) -> Set[str]:
+        """Ids of tasks whose lower-cased subject contains needle.lower()."""
+        needle = needle.lower()
+        grams = _trigrams(needle)
+        if grams:
+            postings = sorted((self._trigrams.get(g, set()) for g in grams), key=len)
+            subjects: Iterable[str] = set.intersection(*postings)
+        else:
+            subjects = self._subject_ids
+        ids: Set[str] = set()
+        for subject in subjects:
+            if needle in subject:
+                ids |= self._subject_ids[subject]
+        return ids
+
+    def filter(self, status: Optional[str] = None, priority: Optional[str] = None,
+               subject: Optional[str] = None) -> List[Task]:
+        """Tasks matching every given field, in insertion order."""
+        candidates = []
+        if status:
+            candidates.append(self.by_status.get(status, set()))
+        if priority:
+            candidates.append(self.by_priority.get(priority, set()))
+        if subject:
+            candidates.append(self.subject_ids(subject))
+        if not candidates:
+            return list(self.by_id.values())
+        candidates.sort(key=len)
+        smallest, rest = candidates[0], candidates[1:]
+        ids = [i for i in smallest if all(i in other for other in rest)]
+        ids.sort(key=self._position.__getitem__)
+        return [self.by_id[i] for i in ids]
+
+    def due_between(self, first: Day, last: Day) -> List[Task]:
+        """Tasks with first <= due_date <= last, soonest first (ties in insertion order)."""
+        return self._between(self._due, first, last)
+
+    def open_due_between(self, first: Day, last: Day) -> List[Task]:
+        """due_between() for unfinished tasks only, without skipping completed ones."""
+        return self._between(self._open_due, first, last)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Task, float]]:
+        """(task, BM25 score) for tasks matching every word of query, best first."""
+        hits = self.text.search(query, limit, self._position.__getitem__)
+        return [(self.by_id[task_id], score) for task_id, score in hits]
+
+    def _between(self, entries: List[Tuple[date, int, str]], first: Day, last: Day) -> List[Task]:
+        lo = bisect_left(entries, (_day(first),))
+        hi = bisect_right(entries, (_day(last), math.inf))
+        return [self.by_id[task_id] for _, _, task_id in entries[lo:hi]]
+
+
+def _day(value: Day) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _due_date(task: Task) -> Optional[date]:
+    due = task.due_date
+    return due if type(due) is date else None
+
+
+def _open_due_date(task: Task) -> Optional[date]:
+    return _due_date(task) if task.status != Status.COMPLETED else None
+
+
+def _plain(value: Any) -> Any:
+    """An enum member's string value, so counter keys stay plain JSON strings."""
+    return getattr(value, "value", value)
+
+
+def _bump(counts: Dict[Any, int], key: Any, delta: int) -> None:
+    n = counts.get(key, 0) + delta
+    if n:
+        counts[key] = n
+    else:
+        counts.pop(key, None)
+
+
+def _discard(buckets: Dict[Any, Set[Any]], key: Any, value: Any) -> bool:
+    """Remove value from buckets[key], dropping the bucket once empty.
+
+    Returns True if the bucket was dropped.
+    """
+    bucket = buckets.get(key)
+    if bucket is None:
+        return False
+    bucket.discard(value)
+    if not bucket:
+        del buckets[key]
+        return True
+    return False
@@ -1,144 +1,332 @@
-import uuid
-from datetime import datetime
-from typing import List, Dict, Any, Optional
-from app.storage import load_tasks, save_tasks
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+from app.storage import (
+    load_tasks, get_task, insert_task, replace_task, remove_task, write_batch,
+    query_tasks, scan_tasks, search_tasks as _search, tasks_due_between, task_counts, verify_task_counts, transaction,
+    SORT_FIELDS, dataset_version,
+)
+from app import llm_cache, metrics, task_context
+from app.task_model import Task, VALID_PRIORITIES, VALID_STATUSES, parse_due_date
 
-VALID_PRIORITIES = ["low", "medium", "high"]
-VALID_STATUSES = ["pending", "in-progress", "completed"]
+# Fields the AI prompts are built from; changing one invalidates cached AI replies.
+AI_PROMPT_FIELDS = ("title", "description", "subject", "due_date")
+# Fields only background AI jobs write (see app.jobs).
+AI_RESULT_FIELDS = ("subtasks", "ai_priority")
+MAX_SEARCH_RESULTS = 100
 
 
-def _now() -> str:
-    return datetime.now().isoformat()
+def _new_task(
+    title: str,
+    description: str = "",
+    due_date: Optional[str] = None,
+    priority: str = "medium",
+    subject: str = "",
+    status: str = "pending",
+) -> Task:
+    """Validate fields and build a new task (not yet persisted)."""
+    return Task.create({"title": title, "description": description, "due_date": due_date,
+                        "priority": priority, "subject": subject, "status": status})
 
 
-def _validate_due_date(due_date: Optional[str]) -> None:
-    """Validate that due_date is in YYYY-MM-DD format."""
-    if due_date is None:
-        return
-    try:
-        datetime.strptime(due_date, "%Y-%m-%d")
-    except ValueError:
-        raise ValueError(f"due_date must be in YYYY-MM-DD format, got: '{due_date}'")
+def _new_task_from(fields: Dict[str, Any]) -> Task:
+    """Build a new task from a loosely-typed mapping (JSON body, CSV row)."""
+    return Task.create(fields)
+
+
+def _forget_ai_replies(old: Task, new: Optional[Task]) -> None:
+    if new is None or any(getattr(old, f) != getattr(new, f) for f in AI_PROMPT_FIELDS):
+        llm_cache.invalidate_task(old.id)
 
 
+def _object(op: Dict[str, Any], key: str) -> Dict[str, Any]:
+    value = op.get(key) or {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{key} must be an object.")
+    return value
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
 def create_task(
     title: str,
     description: str = "",
     due_date: Optional[str] = None,
     priority: str = "medium",
-    subject: str = ""
-) -> Dict[str, Any]:
+    subject: str = "",
+    status: str = "pending",
+) -> Task:
     """Create a new task and persist it."""
-    if not title.strip():
-        raise ValueError("Task title cannot be empty.")
-    if priority not in VALID_PRIORITIES:
-        raise ValueError(f"Priority must be one of {VALID_PRIORITIES}.")
-    _validate_due_date(due_date)
-
-    task = {
-        "id": str(uuid.uuid4()),
-        "title": title.strip(),
-        "description": description.strip(),
-        "subject": subject.strip(),
-        "due_date": due_date,
-        "priority": priority,
-        "status": "pending",
-        "created_at": _now(),
-        "updated_at": _now(),
-    }
-
-    tasks = load_tasks()
-    tasks.append(task)
-    save_tasks(tasks)
+    task = _new_task(title, description, due_date, priority, subject, status)
+    insert_task(task)
     return task
 
 
-def get_all_tasks() -> List[Dict[str, Any]]:
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def get_all_tasks() -> List[Task]:
     """Return all tasks."""
     return load_tasks()
 
 
-def get_task_by_id(task_id: str) -> Optional[Dict[str, Any]]:
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def get_task_by_id(task_id: str) -> Optional[Task]:
     """Return a single task by ID, or None if not found."""
-    tasks = load_tasks()
-    return next((t for t in tasks if t["id"] == task_id), None)
+    return get_task(task_id)
 
 
-def update_task(task_id: str, **fields) -> Dict[str, Any]:
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def update_task(task_id: str, **fields) -> Task:
     """Update fields of an existing task."""
-    tasks = load_tasks()
-    for task in tasks:
-        if task["id"] == task_id:
-            allowed = {"title", "description", "due_date", "priority", "status", "subject"}
-            for key, value in fields.items():
-                if key not in allowed:
-                    raise ValueError(f"Cannot update field: {key}")
-                if key == "priority" and value not in VALID_PRIORITIES:
-                    raise ValueError(f"Priority must be one of {VALID_PRIORITIES}.")
-                if key == "status" and value not in VALID_STATUSES:
-                    raise ValueError(f"Status must be one of {VALID_STATUSES}.")
-                if key == "due_date":
-                    _validate_due_date(value)
-                task[key] = value
-            task["updated_at"] = _now()
-            save_tasks(tasks)
-            return task
-    raise KeyError(f"Task with id '{task_id}' not found.")
+    with transaction():
+        old = get_task(task_id)
+        if old is None:
+            raise KeyError(f"Task with id '{task_id}' not found.")
+        task = old.updated(fields)
+        replace_task(task)
+    _forget_ai_replies(old, task)
+    return task
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def save_ai_results(task_id: str, **fields) -> Task:
+    """Store AI output (AI_RESULT_FIELDS) on a task without touching anything else."""
+    unknown = set(fields) - set(AI_RESULT_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot store AI field(s): {sorted(unknown)}")
+    with transaction():
+        task = get_task(task_id)
+        if task is None:
+            raise KeyError(f"Task with id '{task_id}' not found.")
+        task = task.with_extra(fields)
+        replace_task(task)
+    return task
 
 
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
 def delete_task(task_id: str) -> bool:
     """Delete a task by ID. Returns True if deleted, False if not found."""
-    tasks = load_tasks()
-    new_tasks = [t for t in tasks if t["id"] != task_id]
-    if len(new_tasks) == len(tasks):
-        return False
-    save_tasks(new_tasks)
-    return True
+    deleted = remove_task(task_id)
+    if deleted:
+        llm_cache.invalidate_task(task_id)
+    return deleted
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def apply_batch(operations: List[Dict[str, Any]]) -> List[Union[Task, Dict[str, Any]]]:
+    """Apply a list of create/update/delete operations all-or-nothing.
+
+    Each operation is one of:
+        {"op": "create", "task": {...fields...}}
+        {"op": "update", "id": "...", "fields": {...}}
+        {"op": "delete", "id": "..."}
+    Every operation is validated (with the same rules as create_task and
+    update_task) before anything is written, and the whole batch is then
+    persisted with a single write. Raises ValueError or KeyError naming the
+    first bad operation; nothing is written in that case.
+    """
+    if not isinstance(operations, list):
+        raise ValueError("operations must be a list.")
+    records, results, changed = [], [], []
+    with transaction():
+        pending: Dict[str, Optional[Task]] = {}
+        for i, op in enumerate(operations):
+            try:
+                if not isinstance(op, dict):
+                    raise ValueError("must be an object.")
+                kind = op.get("op")
+                if kind == "create":
+                    task = _new_task_from(_object(op, "task"))
+                    pending[task.id] = task
+                    records.append(("create", task.id, task))
+                    results.append(task)
+                    continue
+                if kind not in ("update", "delete"):
+                    raise ValueError(f"Unknown op: {kind!r}")
+                task_id = op.get("id")
+                if not isinstance(task_id, str):
+                    raise ValueError("id must be a string.")
+                fields = _object(op, "fields") if kind == "update" else None
+                current = pending[task_id] if task_id in pending else get_task(task_id)
+                if current is None:
+                    raise KeyError(f"Task with id '{task_id}' not found.")
+                if kind == "update":
+                    task = current.updated(fields)
+                    changed.append((current, task))
+                    pending[task_id] = task
+                    records.append(("update", task_id, task))
+                    results.append(task)
+                else:
+                    changed.append((current, None))
+                    pending[task_id] = None
+                    records.append(("delete", task_id, None))
+                    results.append({"id": task_id, "deleted": True})
+            except (ValueError, KeyError) as e:
+                raise type(e)(f"Operation {i}: {e.args[0]}") from e
+        write_batch(records)
+    for old, new in changed:
+        _forget_ai_replies(old, new)
+    return results
+
 
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def import_tasks(rows: Iterable[Dict[str, Any]]) -> int:
+    """Create a task for every row, all-or-nothing. Returns the number created.
 
+    Rows use the same fields as create_task plus an optional status; ids and
+    timestamps in the rows are ignored, so every row becomes a new task.
+    """
+    records = []
+    for n, row in enumerate(rows, start=1):
+        try:
+            task = _new_task_from(row)
+        except ValueError as e:
+            raise ValueError(f"Row {n}: {e}") from e
+        records.append(("create", task.id, task))
+    write_batch(records)
+    return len(records)
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
 def filter_tasks(
     status: Optional[str] = None,
     priority: Optional[str] = None,
     subject: Optional[str] = None,
-) -> List[Dict[str, Any]]:
+) -> List[Task]:
     """Filter tasks by status, priority, and/or subject."""
-    tasks = load_tasks()
-    if status:
-        tasks = [t for t in tasks if t["status"] == status]
-    if priority:
-        tasks = [t for t in tasks if t["priority"] == priority]
-    if subject:
-        tasks = [t for t in tasks if subject.lower() in t["subject"].lower()]
-    return tasks
+    return query_tasks(status=status, priority=priority, subject=subject)
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def search_tasks(query: str, limit: int = 20) -> List[Tuple[Task, float]]:
+    """(task, score) for tasks whose title, description or subject contain
+    every word of query.
+
+    The last word also matches as a prefix unless the query ends with a
+    space. Best matches (BM25) come first.
+    """
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise ValueError(f"limit must be between 1 and {MAX_SEARCH_RESULTS}.")
+    return [(task, round(score, 4)) for task, score in _search(query, limit)]
+
+
+def encode_cursor(task: Task, sort: str = "created_at") -> str:
+    """Opaque page cursor pointing just past task in `sort` order."""
+    raw = json.dumps([task.get(sort), task["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
 
-def get_upcoming_tasks(days: int = 7) -> List[Dict[str, Any]]:
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor: the (sort value, id) a page starts after."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, task_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: '{cursor}'")
+    if not isinstance(task_id, str) or not (value is None or isinstance(value, str)):
+        raise ValueError(f"Invalid cursor: '{cursor}'")
+    return value, task_id
+
+
+def project(task: Task, fields: Optional[List[str]]) -> Dict[str, Any]:
+    """The task as a dict, keeping only the given fields (all of them when fields is None)."""
+    if fields is None:
+        return task.to_dict()
+    return {k: task[k] for k in fields if k in task}
+
+
+def iter_tasks(
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    subject: Optional[str] = None,
+    sort: str = "created_at",
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Iterator[Task]:
+    """Lazily yield matching tasks ordered by `sort` (then id), after cursor.
+
+    Arguments are validated here, before the first task is produced, so a
+    streaming caller can still answer with an error.
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Sort must be one of {list(SORT_FIELDS)}.")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be a positive integer.")
+    after = decode_cursor(cursor) if cursor else None
+    return scan_tasks(status=status, priority=priority, subject=subject, sort=sort,
+                      descending=descending, after=after, limit=limit)
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def list_tasks_page(
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    subject: Optional[str] = None,
+    sort: str = "created_at",
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> Dict[str, Any]:
+    """Return one page: {"tasks": [...], "next_cursor": str or None}."""
+    if limit < 1:
+        raise ValueError("limit must be a positive integer.")
+    tasks = list(iter_tasks(status, priority, subject, sort, descending, cursor, limit + 1))
+    next_cursor = encode_cursor(tasks[limit - 1], sort) if len(tasks) > limit else None
+    return {"tasks": tasks[:limit], "next_cursor": next_cursor}
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def get_upcoming_tasks(days: int = 7) -> List[Task]:
     """Return tasks due within the next `days` days."""
-    from datetime import timedelta
-    tasks = load_tasks()
-    cutoff = datetime.now() + timedelta(days=days)
-    upcoming = []
-    for task in tasks:
-        if task.get("due_date") and task["status"] != "completed":
-            try:
-                due = datetime.fromisoformat(task["due_date"])
-                if datetime.now() <= due <= cutoff:
-                    upcoming.append(task)
-            except ValueError:
-                pass
-    upcoming.sort(key=lambda t: t["due_date"])
-    return upcoming
+    now = datetime.now()
+    # A due date means midnight of that day, so today only counts at exactly 00:00.
+    first = now.date() if now.time() == time.min else now.date() + timedelta(days=1)
+    last = (now + timedelta(days=days)).date()
+    return tasks_due_between(first.isoformat(), last.isoformat())
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def get_tasks_due(first: str, last: Optional[str] = None) -> List[Task]:
+    """Return unfinished tasks due on dates first..last (inclusive), soonest first."""
+    last = last or first
+    if parse_due_date(first) > parse_due_date(last):
+        raise ValueError("The first date must not be after the last date.")
+    return tasks_due_between(first, last)
+
 
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def get_overdue_tasks(today: Optional[date] = None) -> List[Task]:
+    """Return unfinished tasks whose due date has passed, most overdue first."""
+    yesterday = (today or date.today()) - timedelta(days=1)
+    return tasks_due_between(date.min.isoformat(), yesterday.isoformat())
 
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
 def get_summary() -> Dict[str, Any]:
-    """Return a summary of task counts by status and priority."""
-    tasks = load_tasks()
-    summary = {
-        "total": len(tasks),
-        "by_status": {s: 0 for s in VALID_STATUSES},
-        "by_priority": {p: 0 for p in VALID_PRIORITIES},
+    """Return a summary of task counts by status and priority.
+
+    Also counts unfinished tasks that are overdue and those due this week
+    (today through the next six days).
+    """
+    today = date.today()
+    counts = task_counts(today.isoformat(), (today + timedelta(days=6)).isoformat())
+    return {
+        "total": counts["total"],
+        "by_status": {**{s: 0 for s in VALID_STATUSES}, **counts["by_status"]},
+        "by_priority": {**{p: 0 for p in VALID_PRIORITIES}, **counts["by_priority"]},
+        "overdue": counts["overdue"],
+        "due_this_week": counts["due_this_week"],
     }
-    for task in tasks:
-        summary["by_status"][task["status"]] = summary["by_status"].get(task["status"], 0) + 1
-        summary["by_priority"][task["priority"]] = summary["by_priority"].get(task["priority"], 0) + 1
-    return summary
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def get_chat_context(budget: Optional[int] = None) -> str:
+    """The compact task table for chat prompts, rebuilt only when tasks change."""
+    return task_context.cached_context(dataset_version(), load_tasks, budget)
+
+
+@metrics.timed(metrics.TASK_MANAGER_SECONDS)
+def check_summary() -> Dict[str, Any]:
+    """Recompute the summary counters from scratch and report any drift."""
+    drift = verify_task_counts()
+    return {"ok": not drift, "drift": drift}
@@ -0,0 +1,271 @@
+"""
+Typed task records.
+
+Task is what the stores load, keep in memory and return, what task_manager
+validates input into and hands back, and what TaskIndex and the chat context
+read; it only becomes a dict at the edges (JSON responses through the codec,
+CSV/JSONL export, the CLI). Compared with a task dict it has:
+  - __slots__ instead of a per-task dict
+  - status and priority as Status / Priority members shared by every task,
+    interned subjects, and one string for created_at and updated_at until
+    the task is edited (together about half the memory of a dict, see
+    benchmarks/bench_task_model.py)
+  - due_date as a datetime.date, parsed once when the task is built
+Tasks are never changed in place (updated() and with_extra() return copies),
+so the stores hand out the records they hold without copying them.
+
+Item access (task["due_date"], task.get("status"), keys(), items()) returns
+the JSON form, for the edges that want one field at a time (SqliteStore rows,
+CSV export, AI prompts); to_dict() is the whole JSON object.
+
+Task.create() and Task.updated() validate; Task(data) trusts its input (tasks
+read back from storage) and keeps any value it can't parse as-is, along with
+unknown fields such as subtasks, so to_dict() always gives the data back.
+"""
+
+import sys
+import uuid
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+FIELDS = ("id", "title", "description", "subject", "due_date",
+          "priority", "status", "created_at", "updated_at")
+# Fields a client may set when creating or updating a task.
+EDITABLE_FIELDS = ("title", "description", "due_date", "priority", "status", "subject")
+_FIELD_SET = frozenset(FIELDS)
+_TYPED_FIELDS = frozenset(("due_date", "priority", "status"))
+
+
+class Priority(str, Enum):
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class Status(str, Enum):
+    PENDING = "pending"
+    IN_PROGRESS = "in-progress"
+    COMPLETED = "completed"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+VALID_PRIORITIES = [p.value for p in Priority]
+VALID_STATUSES = [s.value for s in Status]
+_PRIORITIES = {p.value: p for p in Priority}
+_STATUSES = {s.value: s for s in Status}
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def parse_due_date(value: Any) -> Optional[date]:
+    """A YYYY-MM-DD string as a date (None stays None); ValueError otherwise."""
+    if value is None:
+        return None
+    if isinstance(value, str) and len(value) == 10 and value[4] == "-" and value[7] == "-":
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    raise ValueError(f"due_date must be in YYYY-MM-DD format, got: '{value}'")
+
+
+def _text(field: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string.")
+    return value.strip()
+
+
+def _validated(field: str, value: Any) -> Any:
+    """value checked and converted to the typed form of field."""
+    if field == "title":
+        title = _text(field, value)
+        if not title:
+            raise ValueError("Task title cannot be empty.")
+        return title
+    if field in ("description", "subject"):
+        return _text(field, value)
+    if field == "due_date":
+        return parse_due_date(value)
+    if field == "priority":
+        try:
+            return _PRIORITIES[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"Priority must be one of {VALID_PRIORITIES}.")
+    if field == "status":
+        try:
+            return _STATUSES[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"Status must be one of {VALID_STATUSES}.")
+    raise ValueError(f"Cannot update field: {field}")
+
+
+def _stored_due(value: Any) -> Any:
+    if isinstance(value, str) and len(value) == 10 and value[4] == "-" and value[7] == "-":
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _lookup(members: Dict[str, Enum], value: Any) -> Any:
+    return members.get(value, value) if isinstance(value, str) else value
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if type(value) is date:
+        return value.isoformat()
+    return value
+
+
+class Task:
+    """One task; see the module docstring for how it relates to task dicts."""
+
+    __slots__ = FIELDS + ("extra", "_absent")
+
+    def __init__(self, data: Mapping[str, Any]):
+        get = data.get
+        self.id: str = get("id")
+        self.title: str = get("title")
+        self.description: str = get("description")
+        subject = get("subject")
+        self.subject: str = sys.intern(subject) if type(subject) is str else subject
+        self.due_date: Optional[date] = _stored_due(get("due_date"))
+        self.priority: Union[Priority, Any] = _lookup(_PRIORITIES, get("priority"))
+        self.status: Union[Status, Any] = _lookup(_STATUSES, get("status"))
+        self.created_at: str = get("created_at")
+        updated_at = get("updated_at")
+        # Never-edited tasks share one timestamp string instead of two equal copies.
+        self.updated_at: str = self.created_at if updated_at == self.created_at else updated_at
+        self.extra: Optional[Dict[str, Any]] = None
+        self._absent: Tuple[str, ...] = ()
+        if data.keys() != _FIELD_SET:
+            self.extra = {k: v for k, v in data.items() if k not in _FIELD_SET} or None
+            self._absent = tuple(f for f in FIELDS if f not in data)
+
+    @classmethod
+    def create(cls, fields: Mapping[str, Any]) -> "Task":
+        """A new task (fresh id and timestamps) from loosely-typed input.
+
+        Missing fields get their defaults (an empty due_date means none);
+        anything invalid, including an empty priority or status, raises
+        ValueError. Fields other than EDITABLE_FIELDS are ignored.
+        """
+        now = _now()
+        return cls({
+            "id": str(uuid.uuid4()),
+            "title": _validated("title", fields.get("title")),
+            "description": _validated("description", fields.get("description")),
+            "subject": _validated("subject", fields.get("subject")),
+            "due_date": _validated("due_date", fields.get("due_date") or None),
+            "priority": _validated("priority", fields.get("priority", "medium")),
+            "status": _validated("status", fields.get("status", "pending")),
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    def updated(self, fields: Mapping[str, Any]) -> "Task":
+        """A validated copy with fields changed and updated_at bumped."""
+        task = self.copy()
+        for field, value in fields.items():
+            if field not in EDITABLE_FIELDS:
+                raise ValueError(f"Cannot update field: {field}")
+            setattr(task, field, _validated(field, value))
+        task._absent = tuple(f for f in task._absent if f not in fields and f != "updated_at")
+        task.updated_at = _now()
+        return task
+
+    def with_extra(self, fields: Mapping[str, Any]) -> "Task":
+        """A copy with extra (non-model) fields set, such as AI results."""
+        task = self.copy()
+        task.extra = {**(task.extra or {}), **fields}
+        task._absent = tuple(f for f in task._absent if f != "updated_at")
+        task.updated_at = _now()
+        return task
+
+    def copy(self) -> "Task":
+        task = Task.__new__(Task)
+        for name in self.__slots__:
+            setattr(task, name, getattr(self, name))
+        if self.extra:
+            task.extra = dict(self.extra)
+        return task
+
+    # ── The task-dict view ────────────────────────────────────
+    def __getitem__(self, field: str) -> Any:
+        if field in _FIELD_SET and field not in self._absent:
+            value = getattr(self, field)
+            return _json_value(value) if field in _TYPED_FIELDS else value
+        if self.extra and field in self.extra:
+            return self.extra[field]
+        raise KeyError(field)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field: object) -> bool:
+        return (field in _FIELD_SET and field not in self._absent) or bool(self.extra and field in self.extra)
+
+    def keys(self) -> List[str]:
+        keys = [f for f in FIELDS if f not in self._absent] if self._absent else list(FIELDS)
+        return keys + list(self.extra) if self.extra else keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(FIELDS) - len(self._absent) + len(self.extra or ())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "subject": self.subject,
+            "due_date": _json_value(self.due_date),
+            "priority": _json_value(self.priority),
+            "status": _json_value(self.status),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        for field in self._absent:
+            del data[field]
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other: object) -> bool:
+        """Equal to a Task or task dict with the same JSON form."""
+        if isinstance(other, Task):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Task({self.to_dict()!r})"
+
+
+def as_task(task: Union[Task, Mapping[str, Any]]) -> Task:
+    """task itself if it is already a Task, else Task(task)."""
+    return task if isinstance(task, Task) else Task(task)
@@ -0,0 +1,300 @@
+"""
+Columnar, read-only snapshot of tasks for analytics over large datasets.
+
+A list of task dicts costs roughly a kilobyte per task. TaskTable keeps one
+compact column per field instead:
+  - ids packed as 16-byte UUIDs in one bytearray
+  - status, priority and subject as small-int codes into interned value lists
+    (status and priority codes follow VALID_STATUSES / VALID_PRIORITIES)
+  - due dates as int32 day ordinals (0 = no due date)
+  - created_at / updated_at as float64 seconds
+  - title and description as plain lists of strings
+Any value that would not survive that encoding unchanged (a non-UUID id, a
+timezone-aware timestamp, an extra field such as subtasks) is kept as-is in
+a per-row overflow dict, so row(i).to_dict() always equals the original task.
+
+filter() and summary() mirror task_manager.filter_tasks() and get_summary().
+filter() works on whole columns at C speed: bytes.translate builds 0/1
+masks, big-int AND combines them and itertools.compress turns them into row
+numbers. The table never changes, so summary() answers from counts and a
+sorted array of open due dates taken once in from_tasks().
+"""
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from itertools import compress
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from app.task_manager import VALID_PRIORITIES, VALID_STATUSES
+
+COLUMNS = ("id", "title", "description", "subject", "due_date",
+           "priority", "status", "created_at", "updated_at")
+_EPOCH = datetime(1970, 1, 1)
+_NO_TIME = float("nan")
+_MISSING = object()  # overflow marker for a column the task didn't have
+
+
+class _Interned:
+    """Distinct values of one column and their small-int codes."""
+
+    def __init__(self, initial: Sequence[Any] = ()):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+        for value in initial:
+            self.code(value)
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _pack_id(value: Any) -> Optional[bytes]:
+    """16 bytes for a canonical (lower-case, dashed) UUID string, else None."""
+    if not isinstance(value, str) or len(value) != 36 or value != value.lower():
+        return None
+    if value[8] != "-" or value[13] != "-" or value[18] != "-" or value[23] != "-":
+        return None
+    try:
+        return bytes.fromhex(value[:8] + value[9:13] + value[14:18] + value[19:23] + value[24:])
+    except ValueError:
+        return None
+
+
+def _unpack_id(packed: bytes) -> str:
+    h = packed.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _pack_due(value: Any) -> Optional[int]:
+    if value is None:
+        return 0
+    try:
+        ordinal = date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return None
+    return ordinal if date.fromordinal(ordinal).isoformat() == value else None
+
+
+def _pack_time(value: Any) -> Optional[float]:
+    if value is None:
+        return _NO_TIME
+    try:
+        seconds = (datetime.fromisoformat(value) - _EPOCH).total_seconds()
+    except (TypeError, ValueError):
+        return None  # not ISO, or timezone-aware
+    return seconds if _unpack_time(seconds) == value else None
+
+
+def _unpack_time(seconds: float) -> Optional[str]:
+    if seconds != seconds:  # NaN
+        return None
+    return (_EPOCH + timedelta(seconds=seconds)).isoformat()
+
+
+class TaskRow:
+    """A read-only view of one row that behaves like the task dict."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: "TaskTable", row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, field: str) -> Any:
+        return self._table.value(self._row, field)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        overflow = self._table._overflow.get(self._row, {})
+        return [k for k in COLUMNS if overflow.get(k) is not _MISSING] + [
+            k for k in overflow if k not in COLUMNS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: self[k] for k in self.keys()}
+
+    def __repr__(self) -> str:
+        return f"TaskRow({self.to_dict()!r})"
+
+
+class TaskTable:
+    """Tasks stored column by column; build it with from_tasks()."""
+
+    def __init__(self):
+        self._ids = bytearray()
+        self.titles: List[str] = []
+        self.descriptions: List[str] = []
+        self.statuses = _Interned(VALID_STATUSES)
+        self.priorities = _Interned(VALID_PRIORITIES)
+        self.subjects = _Interned()
+        self._status = bytearray()
+        self._priority = bytearray()
+        self._subject = array("H")
+        self._due = array("i")
+        self._created = array("d")
+        self._updated = array("d")
+        self._overflow: Dict[int, Dict[str, Any]] = {}  # row -> fields kept verbatim
+        self._open_due = array("i")  # sorted due ordinals of unfinished tasks
+        self._status_counts: Dict[str, int] = {}
+        self._priority_counts: Dict[str, int] = {}
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Dict[str, Any]]) -> "TaskTable":
+        table = cls()
+        for task in tasks:
+            table._append(task)
+        completed = table.statuses.codes["completed"]
+        table._open_due = array("i", sorted(
+            d for d, s in zip(table._due, table._status) if d and s != completed))
+        table._status_counts = {s: table._status.count(c) for s, c in table.statuses.codes.items()}
+        table._priority_counts = {p: table._priority.count(c) for p, c in table.priorities.codes.items()}
+        return table
+
+    def _append(self, task: Dict[str, Any]) -> None:
+        row = len(self.titles)
+        overflow = {k: v for k, v in task.items() if k not in COLUMNS}
+
+        packed = _pack_id(task.get("id"))
+        self._ids += packed or bytes(16)
+        if packed is None:
+            overflow["id"] = task.get("id")
+        self.titles.append(task.get("title"))
+        self.descriptions.append(task.get("description"))
+
+        for field, interned, column in (("status", self.statuses, self._status),
+                                        ("priority", self.priorities, self._priority)):
+            code = interned.code(task.get(field))
+            if code > 255:
+                raise ValueError(f"More than 256 distinct {field} values.")
+            column.append(code)
+        code = self.subjects.code(task.get("subject"))
+        if code > 0xFFFF:
+            raise ValueError("More than 65536 distinct subjects.")
+        self._subject.append(code)
+
+        due = _pack_due(task.get("due_date"))
+        self._due.append(due or 0)
+        if due is None:
+            overflow["due_date"] = task.get("due_date")
+        for field, column in (("created_at", self._created), ("updated_at", self._updated)):
+            seconds = _pack_time(task.get(field))
+            column.append(_NO_TIME if seconds is None else seconds)
+            if seconds is None:
+                overflow[field] = task.get(field)
+        for field in COLUMNS:
+            if field not in task:
+                overflow[field] = _MISSING
+        if overflow:
+            self._overflow[row] = overflow
+
+    # ── Rows ──────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __getitem__(self, row: int) -> TaskRow:
+        if not -len(self) <= row < len(self):
+            raise IndexError("row out of range")
+        return TaskRow(self, row % len(self))
+
+    def __iter__(self) -> Iterator[TaskRow]:
+        return (TaskRow(self, i) for i in range(len(self)))
+
+    def value(self, row: int, field: str) -> Any:
+        """One field of one row, decoded back to its task-dict form."""
+        overflow = self._overflow.get(row)
+        if overflow and field in overflow:
+            if overflow[field] is _MISSING:
+                raise KeyError(field)
+            return overflow[field]
+        if field == "id":
+            return _unpack_id(self._ids[row * 16:row * 16 + 16])
+        if field == "title":
+            return self.titles[row]
+        if field == "description":
+            return self.descriptions[row]
+        if field == "subject":
+            return self.subjects.values[self._subject[row]]
+        if field == "status":
+            return self.statuses.values[self._status[row]]
+        if field == "priority":
+            return self.priorities.values[self._priority[row]]
+        if field == "due_date":
+            return date.fromordinal(self._due[row]).isoformat() if self._due[row] else None
+        if field == "created_at":
+            return _unpack_time(self._created[row])
+        if field == "updated_at":
+            return _unpack_time(self._updated[row])
+        raise KeyError(field)
+
+    def rows(self, numbers: Iterable[int]) -> List[TaskRow]:
+        return [TaskRow(self, i) for i in numbers]
+
+    # ── Queries ───────────────────────────────────────────────
+    @staticmethod
+    def _mask(column: bytearray, codes: Iterable[int]) -> bytes:
+        table = bytearray(256)
+        for code in codes:
+            table[code] = 1
+        return column.translate(table)
+
+    def filter_rows(self, status: Optional[str] = None, priority: Optional[str] = None,
+                    subject: Optional[str] = None) -> List[int]:
+        """Row numbers matching every given field, like task_manager.filter_tasks()."""
+        masks = []
+        for value, interned, column in ((status, self.statuses, self._status),
+                                        (priority, self.priorities, self._priority)):
+            if value:
+                code = interned.codes.get(value)
+                masks.append(self._mask(column, [] if code is None else [code]))
+        if subject:
+            needle = subject.lower()
+            wanted = {code for code, value in enumerate(self.subjects.values)
+                      if needle in (value or "").lower()}
+            masks.append(bytes(map(wanted.__contains__, self._subject)))
+        if not masks:
+            return list(range(len(self)))
+        combined = int.from_bytes(masks[0], "little")
+        for mask in masks[1:]:
+            combined &= int.from_bytes(mask, "little")
+        return list(compress(range(len(self)), combined.to_bytes(len(self), "little")))
+
+    def filter(self, status: Optional[str] = None, priority: Optional[str] = None,
+               subject: Optional[str] = None) -> List[TaskRow]:
+        return self.rows(self.filter_rows(status, priority, subject))
+
+    def summary(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """The same counts as task_manager.get_summary(), from the columns."""
+        today = today or date.today()
+        first = today.toordinal()
+        return {
+            "total": len(self),
+            "by_status": {s: n for s, n in self._status_counts.items() if n or s in VALID_STATUSES},
+            "by_priority": {p: n for p, n in self._priority_counts.items() if n or p in VALID_PRIORITIES},
+            "overdue": bisect_left(self._open_due, first),
+            "due_this_week": bisect_right(self._open_due, first + 6) - bisect_left(self._open_due, first),
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the table, strings included."""
+        size = sum(sys.getsizeof(c) for c in (
+            self._ids, self._status, self._priority, self._subject, self._due,
+            self._created, self._updated, self._open_due, self.titles, self.descriptions))
+        size += sum(sys.getsizeof(s) for s in self.titles) + sum(sys.getsizeof(s) for s in self.descriptions)
+        size += sum(sys.getsizeof(v) for v in self.subjects.values)
+        size += sys.getsizeof(self._overflow) + sum(sys.getsizeof(o) for o in self._overflow.values())
+        return size
+
+
+def load_table() -> TaskTable:
+    """A TaskTable of every stored task."""
+    from app import storage
+    return TaskTable.from_tasks(storage.load_tasks())
@@ -0,0 +1,152 @@
+"""
+Inverted index for full-text task search.
+
+Title, description and subject (attributes of task_model.Task) are split
+into lower-cased word tokens (title words count twice). Each token maps to
+{task id: term frequency}, and the vocabulary is kept sorted so the last word
+of a query can be matched as a prefix while the user is still typing it.
+Results must contain every query word and are ranked with BM25.
+
+TaskIndex builds one on its first search and keeps it up to date as tasks
+are put and dropped after that; SqliteStore answers the same queries with an
+FTS5 table instead. Tokens and scores follow FTS5 (the unicode61 tokenizer,
+bm25() with the same column weights), so both give the same scores.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.task_model import Task
+
+SEARCH_FIELDS = (("title", 2), ("description", 1), ("subject", 1))
+K1, B = 1.2, 0.75
+_TOKEN = re.compile(r"[^\W_]+")  # letters and digits, like FTS5's unicode61
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    text = text.lower()
+    if not text.isascii():  # unicode61 also drops diacritics: "café" -> "cafe"
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return _TOKEN.findall(text)
+
+
+def parse_query(query: str) -> Tuple[List[str], bool]:
+    """(words, last word is a prefix): a trailing space means the last word is complete."""
+    words = tokenize(query)
+    return words, bool(words) and not query[-1:].isspace()
+
+
+def _task_terms(task: Task) -> Tuple[Dict[str, int], int]:
+    """(weighted frequency by term, number of tokens)."""
+    counts: Dict[str, int] = {}
+    length = 0
+    for field, weight in SEARCH_FIELDS:
+        tokens = tokenize(getattr(task, field))
+        length += len(tokens)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + weight
+    return counts, length
+
+
+class TextIndex:
+    """Postings by token plus document lengths, for BM25 with prefix matching."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self._terms: List[str] = []  # sorted vocabulary
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Task]) -> "TextIndex":
+        """Index every task, sorting the vocabulary once at the end."""
+        index = cls()
+        for task in tasks:
+            index._add(task)
+        index._terms = sorted(index.postings)
+        return index
+
+    def add(self, task: Task) -> None:
+        for term in self._add(task):
+            insort(self._terms, term)
+
+    def _add(self, task: Task) -> List[str]:
+        """Post task's terms; returns the ones new to the vocabulary."""
+        task_id = task.id
+        terms, length = _task_terms(task)
+        new = []
+        for term, tf in terms.items():
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = {}
+                new.append(term)
+            docs[task_id] = tf
+        self._lengths[task_id] = length
+        self._total_length += length
+        return new
+
+    def remove(self, task: Task) -> None:
+        task_id = task.id
+        for term in _task_terms(task)[0]:
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(task_id, None)
+            if not docs:
+                del self.postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+        self._total_length -= self._lengths.pop(task_id, 0)
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\U0010ffff")
+        return self._terms[start:end]
+
+    def _matches(self, word: str, prefix: bool) -> Dict[str, int]:
+        """task id -> frequency of word (or of every term starting with it)."""
+        if not prefix:
+            return self.postings.get(word, {})
+        terms = self._expand(word)
+        if len(terms) == 1:
+            return self.postings[terms[0]]
+        merged: Dict[str, int] = {}
+        for term in terms:
+            for task_id, tf in self.postings[term].items():
+                merged[task_id] = merged.get(task_id, 0) + tf
+        return merged
+
+    def search(self, query: str, limit: int = 20,
+               position: Optional[Callable[[str], int]] = None) -> List[Tuple[str, float]]:
+        """(task id, score) for tasks containing every query word, best first.
+
+        Equal scores are ordered by position(task id) when given.
+        """
+        words, prefix = parse_query(query)
+        if not words:
+            return []
+        matches = [self._matches(w, prefix and i == len(words) - 1) for i, w in enumerate(words)]
+        matches.sort(key=len)
+        if not matches[0]:
+            return []
+        candidates: Set[str] = set(matches[0])
+        for docs in matches[1:]:
+            candidates.intersection_update(docs)
+        n = len(self._lengths)
+        avg = (self._total_length / n if n else 0) or 1.0
+        # FTS5's idf: a word in more than half the tasks gets a tiny positive weight.
+        idfs = [max(math.log((n - len(docs) + 0.5) / (len(docs) + 0.5)), 1e-6) for docs in matches]
+
+        def score(task_id: str) -> float:
+            norm = K1 * (1 - B + B * self._lengths[task_id] / avg)
+            return sum(idf * docs[task_id] * (K1 + 1) / (docs[task_id] + norm)
+                       for idf, docs in zip(idfs, matches))
+
+        order = position or (lambda task_id: 0)
+        return heapq.nlargest(limit, ((task_id, score(task_id)) for task_id in candidates),
+                              key=lambda item: (item[1], -order(item[0])))
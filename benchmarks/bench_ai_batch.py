@@ -0,0 +1,65 @@
+"""
+Per-task vs. batched priority suggestion against the local OpenRouter stub.
+
+Suggests priorities for N tasks with one suggest_priority() call per task (the
+old POST /api/ai/suggest-priority/<id> loop), then with a single
+suggest_priorities() call, and reports wall time and request counts.
+
+Usage: python -m benchmarks.bench_ai_batch [-n 50] [--latency 0.3] [--budget 1200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import ai_agent, llm_cache, llm_scheduler
+from benchmarks.openrouter_stub import StubServer, priority_reply
+
+
+def _tasks(n: int):
+    return [{"id": f"t{i}", "title": f"Problem set {i}", "subject": "Physics",
+             "due_date": "2025-06-01", "description": "Chapters 3-4, show working"} for i in range(n)]
+
+
+def run(n: int, latency: float, budget: int) -> dict:
+    """Return seconds and request counts for the per-task and batch paths."""
+    llm_cache.LLM_CACHE_SIZE = 0  # measure the network path, not the cache
+    llm_scheduler.LLM_RATE_PER_MIN = 1e6  # nor the rate limit
+    llm_scheduler.LLM_BURST = 1000
+    tasks = _tasks(n)
+    with StubServer(latency=latency, reply=priority_reply) as stub:
+        ai_agent.OPENROUTER_URL = stub.url
+        ai_agent.OPENROUTER_API_KEY = ai_agent.OPENROUTER_API_KEY or "stub"
+
+        start = time.perf_counter()
+        for task in tasks:
+            ai_agent.suggest_priority(task)
+        per_task = time.perf_counter() - start
+        per_task_requests = stub.requests
+
+        start = time.perf_counter()
+        ai_agent.suggest_priorities(tasks, token_budget=budget)
+        batch = time.perf_counter() - start
+        batch_requests = stub.requests - per_task_requests
+    return {"per_task_s": per_task, "per_task_requests": per_task_requests,
+            "batch_s": batch, "batch_requests": batch_requests}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub response delay in seconds")
+    parser.add_argument("--budget", type=int, default=ai_agent.PRIORITY_BATCH_TOKENS)
+    args = parser.parse_args()
+    r = run(args.n, args.latency, args.budget)
+    print(f"{args.n} tasks, {args.latency}s per call")
+    print(f"  per task: {r['per_task_s']:7.2f}s  ({r['per_task_requests']} requests)")
+    print(f"  batched:  {r['batch_s']:7.2f}s  ({r['batch_requests']} requests)  "
+          f"{r['per_task_s'] / r['batch_s']:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Batch vs. per-item task creation throughput, in tasks/sec.
+
+Creates N tasks one create_task() call at a time, then N more with a single
+task_manager.import_tasks() call (the path behind POST /api/tasks/batch,
+/api/tasks/import and `task-agent import`), for each storage backend.
+
+Usage: python -m benchmarks.bench_batch [-n 500] [--backend json|wal|sqlite ...]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import storage, task_manager
+
+
+def _rows(n: int):
+    return [{"title": f"Task {i}", "subject": "Math", "due_date": "2025-06-01", "priority": "high"}
+            for i in range(n)]
+
+
+def run(backend: str, n: int) -> dict:
+    """Return tasks/sec for the per-item and batch paths on one backend."""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.STORAGE_BACKEND = backend
+        storage.DATA_FILE = os.path.join(tmp, "tasks.json")
+        rows = _rows(n)
+
+        start = time.perf_counter()
+        for row in rows:
+            task_manager.create_task(**row)
+        per_item = n / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        task_manager.import_tasks(rows)
+        batch = n / (time.perf_counter() - start)
+
+        assert len(task_manager.get_all_tasks()) == 2 * n
+        storage.get_store().close()
+    return {"per_item": per_item, "batch": batch}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=500)
+    parser.add_argument("--backend", nargs="*", default=sorted(storage.BACKENDS), choices=sorted(storage.BACKENDS))
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'per-item tasks/s':>17} {'batch tasks/s':>14} {'speed-up':>9}")
+    for backend in args.backend:
+        r = run(backend, args.n)
+        print(f"{backend:<8} {r['per_item']:>17,.0f} {r['batch']:>14,.0f} {r['batch'] / r['per_item']:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
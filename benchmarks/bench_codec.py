@@ -0,0 +1,62 @@
+"""
+JSON encode/decode throughput for task lists: stdlib (as storage used to
+write it, indent=2) vs. each codec app.codec can use.
+
+Generates N tasks like the JSON store holds and reports MB/s and tasks/s for
+encoding the whole list and decoding it back, for every installed codec.
+
+Usage: python -m benchmarks.bench_codec [-n 10000 100000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import codec
+from benchmarks.bench_task_table import _json
+
+
+def _timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(n: int) -> dict:
+    """name -> (bytes, encode seconds, decode seconds)."""
+    tasks = json.loads(_json(n))
+    cases = {"stdlib indent=2": (lambda: json.dumps(tasks, indent=2).encode("utf-8"), json.loads)}
+    for name, (dumps, loads) in sorted(codec.CODECS.items()):
+        cases[name] = (lambda dumps=dumps: dumps(tasks, False), loads)
+    results = {}
+    for name, (encode, decode) in cases.items():
+        data = encode()
+        assert decode(data) == tasks
+        results[name] = (len(data), _timed(encode), _timed(lambda: decode(data)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    print(f"auto codec: {codec.get_codec()[0]}")
+    for n in args.n:
+        r = run(n)
+        base = r["stdlib indent=2"]
+        print(f"{n:,} tasks")
+        print(f"  {'codec':<16} {'size MB':>8} {'encode MB/s':>12} {'decode MB/s':>12} {'encode x':>9} {'decode x':>9}")
+        for name, (size, enc, dec) in r.items():
+            print(f"  {name:<16} {size / 1e6:>8.1f} {size / enc / 1e6:>12,.0f} {size / dec / 1e6:>12,.0f} "
+                  f"{base[1] / enc:>8.1f}x {base[2] / dec:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Chat prompt size: the old indented-JSON task dump vs. the compact table.
+
+Prints estimated tokens for both encodings at a few backlog sizes, and how
+long building the compact table takes.
+
+Usage: python -m benchmarks.bench_context [--budget 800] [-n 10 100 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import task_context, task_manager
+
+
+def _tasks(n: int):
+    today = date.today()
+    tasks = []
+    for i in range(n):
+        task = task_manager._new_task_from({
+            "title": f"Assignment {i}", "subject": ["Maths", "Physics", "English", "History"][i % 4],
+            "description": "Read the chapter, answer the end-of-chapter questions and check with notes.",
+            "due_date": (today + timedelta(days=i % 40 - 10)).isoformat(),
+            "priority": ["low", "medium", "high"][i % 3],
+            "status": ["pending", "in-progress", "completed"][i % 3],
+        })
+        tasks.append(task)
+    return tasks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--budget", type=int, default=task_context.CHAT_CONTEXT_TOKENS)
+    args = parser.parse_args()
+    print(f"{'tasks':>6} {'before':>9} {'after':>7} {'listed':>7} {'saved':>6} {'build ms':>9}")
+    for n in args.n:
+        tasks = _tasks(n)
+        start = time.perf_counter()
+        task_context.build_context(tasks, args.budget)
+        build_ms = (time.perf_counter() - start) * 1000
+        r = task_context.context_report(tasks, args.budget)
+        print(f"{n:>6} {r['tokens_before']:>9} {r['tokens_after']:>7} {r['listed']:>7} "
+              f"{r['saved']:>6.0%} {build_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
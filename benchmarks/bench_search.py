@@ -0,0 +1,97 @@
+"""
+Full-text search: linear scan vs. the TaskIndex inverted index.
+
+Generates N tasks with titles and descriptions drawn from a small study
+vocabulary, then times a handful of queries (whole words, several words and
+a type-ahead prefix) answered by scanning every task and by the index, plus
+the cost of building the index and of keeping it up to date on each edit.
+
+Usage: python -m benchmarks.bench_search [-n 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.task_index import TaskIndex
+from app.task_model import Task
+from app.text_index import parse_query
+
+SUBJECTS = ["Maths", "Physics", "Chemistry", "Biology", "English", "History", "Geography", "Computing"]
+WORDS = ("read write revise chapter essay draft lab report problem set exam quiz notes "
+         "project slides group outline research summary questions worksheet practice "
+         "paper presentation experiment poem novel equations graphs vocabulary").split()
+QUERIES = ["essay", "lab report ", "chapter notes", "revis", "physics exp"]
+
+
+def _tasks(n: int) -> list:
+    rng = random.Random(1)
+    return [{
+        "id": f"t{i}",
+        "title": " ".join(rng.sample(WORDS, 3)).capitalize() + f" {i}",
+        "description": " ".join(rng.choices(WORDS, k=rng.randrange(0, 12))),
+        "subject": rng.choice(SUBJECTS),
+        "status": "pending",
+        "priority": "medium",
+        "due_date": None,
+    } for i in range(n)]
+
+
+def _scan(tasks: list, query: str) -> list:
+    """What search costs without an index: tokenize and test every task."""
+    words, prefix = parse_query(query)
+    patterns = [re.compile(r"\b" + w + ("" if prefix and i == len(words) - 1 else r"\b"))
+                for i, w in enumerate(words)]
+    hits = []
+    for t in tasks:
+        text = f"{t['title']} {t['description']} {t['subject']}".lower()
+        if all(p.search(text) for p in patterns):
+            hits.append(t)
+    return hits
+
+
+def _timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(n: int) -> dict:
+    tasks = _tasks(n)
+    records = [Task(t) for t in tasks]
+    start = time.perf_counter()
+    index = TaskIndex(records)
+    index.text  # built on first use; count it here, not in the first query
+    build = time.perf_counter() - start
+    queries = {}
+    for q in QUERIES:
+        matches = len(_scan(tasks, q))
+        assert len(index.search(q, limit=n)) == matches, q
+        queries[q] = (matches, _timed(lambda: _scan(tasks, q)), _timed(lambda: index.search(q)))
+    edited = Task(dict(tasks[0], title="Rewrite the lab report"))
+    update = _timed(lambda: index.put(edited), repeat=100)
+    return {"build": build, "update": update, "queries": queries}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    for n in args.n:
+        r = run(n)
+        print(f"{n:,} tasks: index built in {r['build']:.1f} s, {r['update'] * 1000:.0f} µs per edit")
+        for q, (matches, scan, indexed) in r["queries"].items():
+            print(f"  {q!r:<16} {matches:>9,} hits   scan {scan:9.1f} ms   index {indexed:7.2f} ms   "
+                  f"{scan / indexed:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Memory and validation throughput: task dicts vs. task_model.Task.
+
+Generates N tasks as the JSON a store would load and reports bytes per task
+held as dicts (what the stores used to keep) and as Task records (traced with
+tracemalloc), plus the time to build Task records from the decoded dicts.
+Then times validating and building new tasks the old way (membership checks
+plus strptime, into a dict) against Task.create(), and applying an update
+both ways.
+
+Usage: python -m benchmarks.bench_task_model [-n 100000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.task_model import Task, VALID_PRIORITIES, VALID_STATUSES
+from benchmarks.bench_task_table import _json
+
+
+def _legacy_new_task(fields: dict) -> dict:
+    """How task_manager validated and built a task before Task existed."""
+    title = fields.get("title") or ""
+    priority = fields.get("priority") or "medium"
+    status = fields.get("status") or "pending"
+    due_date = fields.get("due_date") or None
+    if not title.strip():
+        raise ValueError("Task title cannot be empty.")
+    if priority not in VALID_PRIORITIES:
+        raise ValueError(f"Priority must be one of {VALID_PRIORITIES}.")
+    if status not in VALID_STATUSES:
+        raise ValueError(f"Status must be one of {VALID_STATUSES}.")
+    if due_date is not None:
+        datetime.strptime(due_date, "%Y-%m-%d")
+    return {
+        "id": str(uuid.uuid4()),
+        "title": title.strip(),
+        "description": (fields.get("description") or "").strip(),
+        "subject": (fields.get("subject") or "").strip(),
+        "due_date": due_date,
+        "priority": priority,
+        "status": status,
+        "created_at": datetime.now().isoformat(),
+        "updated_at": datetime.now().isoformat(),
+    }
+
+
+def _legacy_update(task: dict, fields: dict) -> dict:
+    task = dict(task)
+    allowed = {"title", "description", "due_date", "priority", "status", "subject"}
+    for key, value in fields.items():
+        if key not in allowed:
+            raise ValueError(f"Cannot update field: {key}")
+        if key == "priority" and value not in VALID_PRIORITIES:
+            raise ValueError(f"Priority must be one of {VALID_PRIORITIES}.")
+        if key == "status" and value not in VALID_STATUSES:
+            raise ValueError(f"Status must be one of {VALID_STATUSES}.")
+        if key == "due_date" and value is not None:
+            datetime.strptime(value, "%Y-%m-%d")
+        task[key] = value
+    task["updated_at"] = datetime.now().isoformat()
+    return task
+
+
+def _per_second(fn, items) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def _traced(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def run(n: int) -> dict:
+    raw = _json(n)
+    dicts, dict_bytes = _traced(lambda: json.loads(raw))
+    records, task_bytes = _traced(lambda: [Task(d) for d in json.loads(raw)])
+    assert [t.to_dict() for t in records[:100]] == dicts[:100]
+    del records
+
+    start = time.perf_counter()
+    [Task(d) for d in dicts]
+    load_seconds = time.perf_counter() - start
+
+    inputs = [{k: d[k] for k in ("title", "description", "subject", "due_date", "priority", "status")}
+              for d in dicts]
+    changes = [{"status": "completed", "due_date": d["due_date"] or "2025-06-01"} for d in dicts]
+    pairs = list(zip(dicts, changes))
+    typed_pairs = [(Task(d), c) for d, c in pairs]
+    return {
+        "dict_bytes": dict_bytes / n,
+        "task_bytes": task_bytes / n,
+        "load_per_s": n / load_seconds,
+        "create": (_per_second(_legacy_new_task, inputs), _per_second(Task.create, inputs)),
+        "update": (_per_second(lambda p: _legacy_update(*p), pairs),
+                   _per_second(lambda p: p[0].updated(p[1]), typed_pairs)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, nargs="+", default=[100_000])
+    args = parser.parse_args()
+    for n in args.n:
+        r = run(n)
+        print(f"{n:,} tasks")
+        print(f"  memory    dicts {r['dict_bytes']:7.0f} B/task   Task {r['task_bytes']:7.0f} B/task   "
+              f"{r['dict_bytes'] / r['task_bytes']:.1f}x smaller")
+        print(f"  load      Task(dict) {r['load_per_s']:>12,.0f} tasks/s")
+        for name in ("create", "update"):
+            old, new = r[name]
+            print(f"  {name:<8}  dict {old:>12,.0f}/s   Task {new:>12,.0f}/s   {new / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Memory and query time: a list of task dicts vs. the columnar TaskTable.
+
+Generates N tasks as the JSON a store would load, then reports bytes per task
+for each representation (traced with tracemalloc) and the time to filter by
+status + priority, filter by subject substring and compute the summary.
+
+Usage: python -m benchmarks.bench_task_table [-n 100000 1000000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.task_manager import VALID_PRIORITIES, VALID_STATUSES
+from app.task_table import TaskTable
+
+SUBJECTS = ["Maths", "Physics", "Chemistry", "Biology", "English", "History", "Geography", "Computing"]
+
+
+def _json(n: int) -> str:
+    rng = random.Random(1)
+    today, now = date.today(), datetime.now()
+    tasks = []
+    for i in range(n):
+        stamp = (now - timedelta(seconds=rng.randrange(10 ** 7))).isoformat()
+        tasks.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "title": f"Assignment {i}",
+            "description": rng.choice(["", "Read the chapter and answer the questions."]),
+            "subject": rng.choice(SUBJECTS),
+            "due_date": rng.choice([None, (today + timedelta(days=rng.randrange(-30, 60))).isoformat()]),
+            "priority": rng.choice(VALID_PRIORITIES),
+            "status": rng.choice(VALID_STATUSES),
+            "created_at": stamp,
+            "updated_at": stamp,
+        })
+    return json.dumps(tasks)
+
+
+def _timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _scan_summary(tasks, today: str, week_end: str) -> dict:
+    by_status, by_priority, overdue, week = {}, {}, 0, 0
+    for t in tasks:
+        by_status[t["status"]] = by_status.get(t["status"], 0) + 1
+        by_priority[t["priority"]] = by_priority.get(t["priority"], 0) + 1
+        if t["due_date"] and t["status"] != "completed":
+            overdue += t["due_date"] < today
+            week += today <= t["due_date"] <= week_end
+    return {"by_status": by_status, "by_priority": by_priority, "overdue": overdue, "due_this_week": week}
+
+
+def run(n: int) -> dict:
+    raw = _json(n)
+    gc.collect()
+    tracemalloc.start()
+    tasks = json.loads(raw)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    table = TaskTable.from_tasks(json.loads(raw))
+    gc.collect()
+    table_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del raw
+
+    today = date.today()
+    week_end = (today + timedelta(days=6)).isoformat()
+    assert len(table.filter_rows("pending", "high")) == sum(
+        1 for t in tasks if t["status"] == "pending" and t["priority"] == "high")
+    return {
+        "dict_bytes": dict_bytes / n,
+        "table_bytes": table_bytes / n,
+        "filter": (_timed(lambda: [t for t in tasks if t["status"] == "pending" and t["priority"] == "high"]),
+                   _timed(lambda: table.filter_rows("pending", "high"))),
+        "subject": (_timed(lambda: [t for t in tasks if "phys" in t["subject"].lower()]),
+                    _timed(lambda: table.filter_rows(subject="phys"))),
+        "summary": (_timed(lambda: _scan_summary(tasks, today.isoformat(), week_end)),
+                    _timed(lambda: table.summary(today))),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    for n in args.n:
+        r = run(n)
+        print(f"{n:,} tasks")
+        print(f"  memory    dicts {r['dict_bytes']:7.0f} B/task   table {r['table_bytes']:7.0f} B/task   "
+              f"{r['dict_bytes'] / r['table_bytes']:.1f}x smaller")
+        for name in ("filter", "subject", "summary"):
+            scan, table = r[name]
+            print(f"  {name:<8}  scan {scan:9.1f} ms       table {table:8.2f} ms       {scan / table:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
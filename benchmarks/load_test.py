@@ -0,0 +1,168 @@
+"""
+Load test: the Flask development server vs. gunicorn, with slow AI calls mixed in.
+
+Starts the server as a subprocess in each mode, pointed at a local OpenRouter
+stub whose replies take --ai-latency seconds and at a temporary data file.
+Then --crud clients loop over GET /api/tasks, GET /api/summary and
+POST /api/tasks while --ai clients loop over POST /api/ai/chat, all on
+keep-alive connections, for --duration seconds. Reports req/s and p50/p99
+latency for each kind of traffic; "shed" counts AI requests refused with 503
+(the client then waits for Retry-After, as a browser retry would).
+
+Modes:
+  dev       python server.py (what render.yaml used to run)
+  gunicorn  gunicorn -c gunicorn.conf.py server:app (gthread workers)
+  gevent    the same with GUNICORN_WORKER_CLASS=gevent (needs gevent)
+
+Usage: python -m benchmarks.load_test [--mode dev gunicorn] [--duration 10]
+                                      [--crud 16] [--ai 16] [--ai-latency 1.0]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.openrouter_stub import StubServer
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+COMMANDS = {
+    "dev": [sys.executable, "server.py"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+    "gevent": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+}
+CRUD_MIX = [("GET", "/api/tasks?limit=50", None), ("GET", "/api/summary", None),
+            ("POST", "/api/tasks", {"title": "Load test", "subject": "Maths"})]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(mode: str, port: int, stub_url: str, data_dir: str) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), RENDER="1", OPENROUTER_URL=stub_url, OPENROUTER_API_KEY="load-test",
+               TASK_DATA_FILE=os.path.join(data_dir, "tasks.json"), LLM_CACHE_SIZE="0",
+               LLM_RATE_PER_MIN="1000000", LLM_BURST="1000", LLM_MAX_CONCURRENT="64", OPENROUTER_POOL_SIZE="64",
+               GUNICORN_ACCESS_LOG="")
+    if mode == "gevent":
+        env["GUNICORN_WORKER_CLASS"] = "gevent"
+    proc = subprocess.Popen(COMMANDS[mode], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with status {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not become ready")
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _client(port: int, kind: str, n: int, stop: threading.Event, out: Dict[str, list]) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    i = 0
+    while not stop.is_set():
+        if kind == "crud":
+            method, path, body = CRUD_MIX[i % len(CRUD_MIX)]
+        else:
+            method, path, body = "POST", "/api/ai/chat", {"message": f"Plan my week ({n}-{i})"}
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=json.dumps(body) if body else None,
+                         headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            out["errors"].append(kind)
+            continue
+        elapsed = time.perf_counter() - start
+        if resp.status == 503 and kind == "ai":
+            out["shed"].append(elapsed)
+            stop.wait(float(resp.getheader("Retry-After", 1)))
+        elif resp.status >= 400:
+            out["errors"].append(kind)
+        else:
+            out[kind].append(elapsed)
+    conn.close()
+
+
+def run(mode: str, duration: float, crud: int, ai: int, ai_latency: float) -> Dict[str, Dict[str, float]]:
+    """req/s and p50/p99 latency (ms) per traffic kind for one serving mode."""
+    with StubServer(latency=ai_latency, reply="Start with the essay.") as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        proc = _start(mode, port, stub.url, tmp)
+        out: Dict[str, list] = {"crud": [], "ai": [], "shed": [], "errors": []}
+        stop = threading.Event()
+        pool = [threading.Thread(target=_client, args=(port, "crud", n, stop, out)) for n in range(crud)]
+        pool += [threading.Thread(target=_client, args=(port, "ai", n, stop, out)) for n in range(ai)]
+        try:
+            for t in pool:
+                t.start()
+            time.sleep(duration)
+            stop.set()
+            for t in pool:
+                t.join()
+        finally:
+            proc.terminate()
+            proc.wait(30)
+    results = {kind: {"rps": len(out[kind]) / duration,
+                      "p50_ms": _percentile(out[kind], 0.5) * 1000,
+                      "p99_ms": _percentile(out[kind], 0.99) * 1000} for kind in ("crud", "ai")}
+    results["ai"]["shed"] = len(out["shed"])
+    results["errors"] = {"count": len(out["errors"])}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", nargs="+", default=["dev", "gunicorn"], choices=sorted(COMMANDS))
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--crud", type=int, default=16, help="CRUD client threads")
+    parser.add_argument("--ai", type=int, default=16, help="AI chat client threads")
+    parser.add_argument("--ai-latency", type=float, default=1.0, help="seconds per stub AI reply")
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'traffic':<6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for mode in args.mode:
+        try:
+            r = run(mode, args.duration, args.crud, args.ai, args.ai_latency)
+        except RuntimeError as e:
+            print(f"{mode:<9} skipped: {e}")
+            continue
+        for kind in ("crud", "ai"):
+            extra = f"   shed {r['ai']['shed']}" if kind == "ai" else ""
+            print(f"{mode:<9} {kind:<6} {r[kind]['rps']:>9,.1f} {r[kind]['p50_ms']:>9.1f} "
+                  f"{r[kind]['p99_ms']:>9.1f}{extra}")
+        if r["errors"]["count"]:
+            print(f"{mode:<9} errors {r['errors']['count']}")
+
+
+if __name__ == "__main__":
+    main()
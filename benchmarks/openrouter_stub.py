@@ -0,0 +1,167 @@
+"""
+A local stand-in for the OpenRouter chat completions endpoint.
+
+Answers POSTs with a canned completion after a configurable delay, over
+HTTP/1.1 keep-alive, and counts requests and TCP connections so tests and
+benchmarks can check how ai_agent uses the network. Requests with
+"stream": true get the reply word by word as server-sent events.
+
+    with StubServer(latency=0.05, reply="high") as stub:
+        ai_agent.OPENROUTER_URL = stub.url
+        ...
+
+Usage: python -m benchmarks.openrouter_stub [--port 8765] [--latency 0.2]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Union
+
+Reply = Union[str, Callable[[dict], str]]
+
+
+def priority_reply(payload: dict, priority: str = "high") -> str:
+    """Answer single and batched priority prompts the way a model would."""
+    prompt = payload["messages"][-1]["content"]
+    positions = [json.loads(line)["i"] for line in prompt.splitlines() if line.startswith('{"i":')]
+    if not positions:
+        return priority
+    return json.dumps({str(i): priority for i in positions})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def do_POST(self):
+        stub = self.server.stub
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with stub.lock:
+            stub.requests += 1
+            stub.payloads.append(payload)
+            stub.in_flight += 1
+            stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+            status = stub.fail_next.pop(0) if stub.fail_next else stub.status
+        if payload.get("stream") and stub.sse and status == 200:
+            try:
+                self._stream(stub, payload)
+            finally:
+                with stub.lock:
+                    stub.in_flight -= 1
+            return
+        try:
+            time.sleep(stub.latency)
+            if status != 200:
+                body = json.dumps({"error": {"message": "stub error"}}).encode()
+            else:
+                content = stub.reply(payload) if callable(stub.reply) else stub.reply
+                body = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+        finally:
+            with stub.lock:
+                stub.in_flight -= 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if not stub.keep_alive:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, stub: "StubServer", payload: dict) -> None:
+        """Answer a stream:true request as chunked server-sent events, a word at a time."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(text: str) -> None:
+            data = text.encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        send(": OPENROUTER PROCESSING\n\n")
+        time.sleep(stub.latency)
+        content = stub.reply(payload) if callable(stub.reply) else stub.reply
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == len(words) - 1 else word + " "
+            send(f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n")
+            time.sleep(stub.token_delay)
+        send("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    stub: "StubServer"
+
+
+class StubServer:
+    """Serve fake completions on 127.0.0.1 in a background thread."""
+
+    def __init__(self, latency: float = 0.0, reply: Reply = "medium", status: int = 200,
+                 keep_alive: bool = True, port: int = 0, sse: bool = True, token_delay: float = 0.0):
+        self.latency = latency
+        self.sse = sse                  # honour "stream": true with server-sent events
+        self.token_delay = token_delay  # pause between streamed words
+        self.reply = reply
+        self.status = status
+        self.fail_next: List[int] = []  # statuses for the next requests, before `status` applies
+        self.keep_alive = keep_alive
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.payloads = []
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--reply", default="medium")
+    args = parser.parse_args()
+    stub = StubServer(latency=args.latency, reply=args.reply, port=args.port)
+    print(f"Stub OpenRouter at {stub.url} (latency {args.latency}s)")
+    stub._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
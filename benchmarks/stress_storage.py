@@ -0,0 +1,95 @@
+"""
+Storage stress test — several processes, each with several threads, mutate the
+same data file at once; afterwards every write must still be there.
+
+Each thread creates `ops` tasks through task_manager and increments a shared
+counter task with a read-modify-write inside storage.transaction(), so both
+lost appends and lost updates show up as a count mismatch.
+
+Usage: python -m benchmarks.stress_storage [--backend json|wal|sqlite]
+                                           [--processes 4] [--threads 8] [--ops 100]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import storage, task_manager
+
+COUNTER_ID = "stress-counter"
+
+
+def _use(backend: str, path: str) -> None:
+    storage.STORAGE_BACKEND = backend
+    storage.DATA_FILE = path
+
+
+def _worker(backend: str, path: str, threads: int, ops: int) -> None:
+    _use(backend, path)
+
+    def mutate(n: int) -> None:
+        for i in range(ops):
+            task_manager.create_task(title=f"stress {os.getpid()}-{n}-{i}")
+            with storage.transaction():
+                counter = storage.get_task(COUNTER_ID)
+                storage.replace_task(counter.with_extra({"count": counter["count"] + 1}))
+
+    pool = [threading.Thread(target=mutate, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def run(backend: str, path: str, processes: int, threads: int, ops: int) -> Tuple[int, int, float]:
+    """Run the stress test; returns (tasks created, counter value, seconds)."""
+    _use(backend, path)
+    storage.insert_task({"id": COUNTER_ID, "title": "counter", "description": "", "subject": "",
+                         "due_date": None, "priority": "low", "status": "pending", "count": 0})
+    start = time.perf_counter()
+    if processes == 1:
+        _worker(backend, path, threads, ops)
+    else:
+        procs = [multiprocessing.Process(target=_worker, args=(backend, path, threads, ops))
+                 for _ in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+    elapsed = time.perf_counter() - start
+    storage.invalidate_cache()
+    tasks = storage.load_tasks()
+    counter = next(t for t in tasks if t["id"] == COUNTER_ID)
+    return len(tasks) - 1, counter["count"], elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="json", choices=sorted(storage.BACKENDS))
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=100)
+    args = parser.parse_args()
+
+    expected = args.processes * args.threads * args.ops
+    with tempfile.TemporaryDirectory() as tmp:
+        created, count, elapsed = run(args.backend, os.path.join(tmp, "tasks.json"),
+                                      args.processes, args.threads, args.ops)
+    print(f"backend={args.backend} processes={args.processes} threads={args.threads} ops={args.ops}")
+    print(f"  {2 * expected} mutations in {elapsed:.2f}s ({2 * expected / elapsed:,.0f}/s)")
+    print(f"  tasks created : {created} / {expected}")
+    print(f"  counter value : {count} / {expected}")
+    assert created == expected, "lost task creations"
+    assert count == expected, "lost counter updates"
+    print("  OK — no lost writes")
+
+
+if __name__ == "__main__":
+    main()
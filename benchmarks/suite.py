@@ -0,0 +1,234 @@
+"""
+Benchmark suite: task_manager operations on real storage, and the HTTP API.
+
+For every backend and dataset size it seeds a temporary data file with N
+synthetic tasks, then times single create / update / delete calls and the
+filter, summary, upcoming and search reads through task_manager and the real
+app.storage (nothing is patched out). Finally it drives the Flask endpoints
+from several threads with the test client.
+
+Each case records the median and p95 latency per operation. Results are
+written as JSON; when a baseline file exists the run is compared with it and
+any case whose median is more than --tolerance slower is reported, with exit
+status 1. --save-baseline merges the run into the baseline, so the slow 100k
+cases can be recorded on their own (-n 100000 --save-baseline) and are only
+compared when a run asks for that size.
+
+Usage: python -m benchmarks.suite [-n 1000 10000 100000] [--backend json|wal|sqlite ...]
+                                  [--ops 50] [--out bench-results.json]
+                                  [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import storage, task_manager
+import server
+
+SUBJECTS = ["Maths", "Physics", "Chemistry", "Biology", "English", "History"]
+WORDS = "read write revise chapter essay draft lab report problem set exam quiz notes project".split()
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _rows(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    today = date.today()
+    return [{
+        "title": " ".join(rng.sample(WORDS, 3)).capitalize(),
+        "description": " ".join(rng.choices(WORDS, k=rng.randrange(0, 8))),
+        "subject": rng.choice(SUBJECTS),
+        "due_date": rng.choice([None, (today + timedelta(days=rng.randrange(-30, 60))).isoformat()]),
+        "priority": rng.choice(task_manager.VALID_PRIORITIES),
+        "status": rng.choice(task_manager.VALID_STATUSES),
+    } for _ in range(n)]
+
+
+def _stats(samples: List[float]) -> Dict[str, Any]:
+    """Latency summary in milliseconds for per-operation timings in seconds."""
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "ops": len(ms),
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "ops_per_s": round(len(ms) / (sum(ms) / 1000), 1) if sum(ms) else None,
+    }
+
+
+def _time_each(fn: Callable[[int], Any], ops: int) -> Dict[str, Any]:
+    samples = []
+    for i in range(ops):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return _stats(samples)
+
+
+def run_storage(backend: str, n: int, ops: int) -> Dict[str, Dict[str, Any]]:
+    """Time task_manager operations against a fresh data file holding n tasks."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.STORAGE_BACKEND = backend
+        storage.DATA_FILE = os.path.join(tmp, "tasks.json")
+        start = time.perf_counter()
+        task_manager.import_tasks(_rows(n))
+        results["seed"] = _stats([time.perf_counter() - start])
+        ids = [t["id"] for t in task_manager.get_all_tasks()]
+        rng = random.Random(2)
+        created = []
+
+        results["create"] = _time_each(
+            lambda i: created.append(task_manager.create_task(title=f"New {i}", subject="Maths")["id"]), ops)
+        results["update"] = _time_each(
+            lambda i: task_manager.update_task(rng.choice(ids), status=rng.choice(task_manager.VALID_STATUSES)),
+            ops)
+        results["delete"] = _time_each(lambda i: task_manager.delete_task(created[i]), ops)
+        results["filter"] = _time_each(lambda i: task_manager.filter_tasks(status="pending", priority="high"), ops)
+        results["filter_subject"] = _time_each(lambda i: task_manager.filter_tasks(subject="phys"), ops)
+        results["summary"] = _time_each(lambda i: task_manager.get_summary(), ops)
+        results["upcoming"] = _time_each(lambda i: task_manager.get_upcoming_tasks(7), ops)
+        results["search"] = _time_each(lambda i: task_manager.search_tasks("lab rep"), ops)
+        assert len(task_manager.get_all_tasks()) == n
+        storage.close_stores()
+    return results
+
+
+HTTP_MIX = [
+    ("GET", "/api/tasks?limit=50", None),
+    ("GET", "/api/summary", None),
+    ("GET", "/api/upcoming", None),
+    ("GET", "/api/search?q=essay", None),
+    ("POST", "/api/tasks", {"title": "Benchmark task", "subject": "Maths"}),
+]
+
+
+def run_http(backend: str, n: int, ops: int, threads: int = 8) -> Dict[str, Dict[str, Any]]:
+    """Drive a mix of endpoints from `threads` concurrent test clients."""
+    samples: Dict[str, List[float]] = {path: [] for _, path, _ in HTTP_MIX}
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def client_loop(k: int) -> None:
+        client = server.app.test_client()
+        for i in range(ops):
+            method, path, body = HTTP_MIX[(k + i) % len(HTTP_MIX)]
+            start = time.perf_counter()
+            resp = client.open(path, method=method, json=body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[path].append(elapsed)
+                if resp.status_code >= 400:
+                    errors.append(f"{method} {path}: {resp.status_code}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.STORAGE_BACKEND = backend
+        storage.DATA_FILE = os.path.join(tmp, "tasks.json")
+        task_manager.import_tasks(_rows(n))
+        pool = [threading.Thread(target=client_loop, args=(k,)) for k in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - start
+        storage.close_stores()
+    if errors:
+        raise RuntimeError(f"{len(errors)} failed requests, e.g. {errors[0]}")
+    results = {f"http {method} {path.split('?')[0]}": _stats(samples[path]) for method, path, _ in HTTP_MIX}
+    results["http total"] = dict(_stats([s for v in samples.values() for s in v]),
+                                 requests_per_s=round(threads * ops / wall, 1))
+    return results
+
+
+def run(sizes: List[int], backends: List[str], ops: int, http_ops: int) -> Dict[str, Any]:
+    """Every case, keyed "<backend>/<n>/<case>"."""
+    saved = storage.STORAGE_BACKEND, storage.DATA_FILE
+    results = {}
+    try:
+        for backend in backends:
+            for n in sizes:
+                cases = run_storage(backend, n, ops)
+                if http_ops:
+                    cases.update(run_http(backend, n, http_ops))
+                for case, stats in cases.items():
+                    results[f"{backend}/{n}/{case}"] = stats
+    finally:
+        storage.STORAGE_BACKEND, storage.DATA_FILE = saved
+    return {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "ops": ops, "http_ops": http_ops},
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Cases present in both runs, each with its median ratio and whether it regressed."""
+    rows = []
+    for key, stats in current["results"].items():
+        old = baseline["results"].get(key)
+        if not old or not old["median_ms"]:
+            continue
+        ratio = stats["median_ms"] / old["median_ms"]
+        rows.append({"case": key, "baseline_ms": old["median_ms"], "median_ms": stats["median_ms"],
+                     "ratio": round(ratio, 3), "regressed": ratio > 1 + tolerance})
+    return rows
+
+
+def merge(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """baseline with current's cases added or replaced; cases current didn't run are kept."""
+    return {"meta": current["meta"], "results": {**baseline.get("results", {}), **current["results"]}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--backend", nargs="+", default=sorted(storage.BACKENDS), choices=sorted(storage.BACKENDS))
+    parser.add_argument("--ops", type=int, default=50, help="timed calls per storage case")
+    parser.add_argument("--http-ops", type=int, default=25, help="requests per client thread (0 to skip)")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="allowed slow-down, 1.0 = twice as slow")
+    args = parser.parse_args()
+
+    current = run(args.n, args.backend, args.ops, args.http_ops)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    if args.save_baseline:
+        saved = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                saved = json.load(f)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(merge(saved, current), f, indent=2)
+    print(f"{'case':<40} {'median ms':>10} {'p95 ms':>10} {'ops/s':>10}")
+    for key, stats in current["results"].items():
+        print(f"{key:<40} {stats['median_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['ops_per_s'] or 0:>10,.0f}")
+    print(f"Results written to {args.out}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        rows = compare(current, json.load(f), args.tolerance)
+    regressed = [r for r in rows if r["regressed"]]
+    print(f"\nCompared with {args.baseline}: {len(rows)} cases, {len(regressed)} slower than "
+          f"{1 + args.tolerance:.1f}x")
+    for r in regressed:
+        print(f"  {r['case']:<40} {r['baseline_ms']:>9.3f} -> {r['median_ms']:.3f} ms ({r['ratio']:.2f}x)")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+gunicorn settings for production: gunicorn -c gunicorn.conf.py server:app
+
+Everything can be tuned from the environment:
+  WEB_CONCURRENCY            worker processes (default 2 x CPUs + 1, at most 8)
+  GUNICORN_THREADS           threads per worker for the default gthread worker (16)
+  GUNICORN_WORKER_CLASS      gthread, or gevent for the async path (pip install gevent):
+                             blocking AI calls then wait on greenlets, not threads
+  GUNICORN_CONNECTIONS       simultaneous clients per gevent worker (1000)
+  GUNICORN_KEEPALIVE         seconds an idle keep-alive connection stays open (5)
+  GUNICORN_TIMEOUT           seconds before a stuck worker is restarted (120)
+  GUNICORN_GRACEFUL_TIMEOUT  seconds a worker gets to finish requests on shutdown (30)
+  GUNICORN_DRAIN_SECONDS     seconds a worker keeps serving, with /readyz failing, after
+                             SIGTERM and before it stops accepting requests (5)
+  GUNICORN_MAX_REQUESTS      recycle a worker after this many requests (0 = never)
+
+With gthread workers, AI_MAX_REQUESTS defaults to three quarters of the
+threads, so requests waiting on OpenRouter always leave some threads of each
+worker free for CRUD traffic.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+worker_connections = int(os.environ.get("GUNICORN_CONNECTIONS", 1000))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+# Not a gunicorn setting: used by post_worker_init below. Keep it under graceful_timeout.
+DRAIN_SECONDS = float(os.environ.get("GUNICORN_DRAIN_SECONDS", 5))
+
+if worker_class == "gthread":
+    os.environ.setdefault("AI_MAX_REQUESTS", str(max(1, threads * 3 // 4)))
+
+
+def post_worker_init(worker):
+    """Fail readiness as soon as SIGTERM arrives, while the worker still serves.
+
+    gunicorn's own SIGTERM handler stops accepting requests at once, so it is
+    only called DRAIN_SECONDS later; meanwhile /readyz answers 503 and the
+    load balancer can take the worker out of rotation.
+    """
+    import server as app_server
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def drain_then_stop(sig, frame):
+        app_server.start_draining()
+        if DRAIN_SECONDS > 0:
+            timer = threading.Timer(DRAIN_SECONDS, stop, (sig, frame))
+            timer.daemon = True
+            timer.start()
+        else:
+            stop(sig, frame)
+
+    signal.signal(signal.SIGTERM, drain_then_stop)
+
+
+def worker_exit(server, worker):
+    """Runs in the worker after it has stopped taking requests: release resources."""
+    import server as app_server
+    app_server.shutdown()
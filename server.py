@@ -1,37 +1,288 @@
 """
 Flask web server for the Smart Student Task Agent.
-Run with: python server.py
+Run with: python server.py (development server)
+Production: gunicorn -c gunicorn.conf.py server:app
 """
 
-from flask import Flask, request, jsonify, send_from_directory
-import os, sys
+from flask import Flask, Response, g, request, jsonify, redirect, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from datetime import date
+import functools, io, os, sys, threading, time
 
 sys.path.insert(0, os.path.dirname(__file__))
 
 import app.task_manager as task_manager
 import app.ai_agent as ai_agent
+import app.storage as storage
+import app.bulk as bulk
+import app.codec as codec
+import app.http_cache as http_cache
+import app.llm_cache as llm_cache
+import app.llm_scheduler as llm_scheduler
+import app.jobs as jobs
+import app.metrics as metrics
+import app.task_context as task_context
+import app.task_model as task_model
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify() and request.json through app.codec (msgspec/orjson when installed).
+
+    Keys keep their insertion order and output is compact unless JSON_PRETTY=1.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return codec.dumps(obj, pretty=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return codec.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        body = codec.dumps(obj, pretty=codec.JSON_PRETTY or self.compact is False)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
 
 application = Flask(__name__, static_folder="web")
+application.json = CodecJSONProvider(application)
 app = application
 
+INDEX = http_cache.StaticFile(os.path.join(os.path.dirname(__file__), "web", "index.html"))
+# Requests carrying this header (the user's e-mail) only see that user's tasks.
+USER_HEADER = "X-User"
+# Most AI requests (POST /api/ai/...) handled at once per process; 0 = no limit.
+# Keeps slow upstream calls from taking every worker thread away from CRUD traffic.
+AI_MAX_REQUESTS = int(os.environ.get("AI_MAX_REQUESTS", 0))
+
+
+# ── Per-user Storage ──────────────────────────────────────────
+@app.before_request
+def enter_user_shard():
+    g.user_token = storage.set_user(request.headers.get(USER_HEADER))
+
+
+@app.teardown_request
+def leave_user_shard(exc=None):
+    # Streamed responses (stream_with_context) tear down after the last chunk.
+    token = g.pop("user_token", None)
+    if token is not None:
+        storage.reset_user(token)
+
+
+# ── AI Request Limit ──────────────────────────────────────────
+_ai_slots = None
+_ai_slots_size = None
+_ai_slots_lock = threading.Lock()
+
+
+def _get_ai_slots():
+    """The semaphore bounding concurrent AI requests, rebuilt when AI_MAX_REQUESTS changes."""
+    global _ai_slots, _ai_slots_size
+    with _ai_slots_lock:
+        if _ai_slots_size != AI_MAX_REQUESTS:
+            _ai_slots = threading.BoundedSemaphore(AI_MAX_REQUESTS) if AI_MAX_REQUESTS > 0 else None
+            _ai_slots_size = AI_MAX_REQUESTS
+        return _ai_slots
+
+
+@app.before_request
+def limit_ai_requests():
+    """Shed AI calls beyond AI_MAX_REQUESTS with 503; queued (?async=1) calls return at once and pass."""
+    if request.method != "POST" or not request.path.startswith("/api/ai/") or _wants_async():
+        return None
+    slots = _get_ai_slots()
+    if slots is None:
+        return None
+    if not slots.acquire(blocking=False):
+        return jsonify({"error": "Too many AI requests in progress; retry shortly or add ?async=1."}), \
+            503, {"Retry-After": "1"}
+    g.ai_slot = slots
+
+
+@app.teardown_request
+def release_ai_slot(exc=None):
+    slots = g.pop("ai_slot", None)
+    if slots is not None:
+        slots.release()
+
+
+# ── Health and Shutdown ───────────────────────────────────────
+_draining = threading.Event()
+
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: storage answers and the process isn't shutting down."""
+    if _draining.is_set():
+        return jsonify({"status": "draining"}), 503
+    try:
+        storage.dataset_version()
+    except Exception as e:
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({"status": "ready"})
+
+
+def start_draining() -> None:
+    """Fail readiness from now on, while requests are still being served.
+
+    gunicorn.conf.py calls this when a worker gets SIGTERM, some seconds
+    before the worker stops accepting requests.
+    """
+    _draining.set()
+
+
+def shutdown() -> None:
+    """Release resources on exit: finish running jobs, close storage and connections.
+
+    gunicorn.conf.py calls this from each worker once it has stopped serving.
+    """
+    jobs.reset_queue()
+    storage.close_stores()
+    ai_agent.get_pool().close()
+
+
+# ── Metrics ───────────────────────────────────────────────────
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+# Registered before compress_response, so it runs after it and sees the bytes actually sent.
+@app.after_request
+def record_request(resp):
+    start = g.pop("request_start", None)
+    if start is None or not metrics.METRICS_ENABLED:
+        return resp
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.HTTP_SECONDS.observe(time.perf_counter() - start, route, request.method, str(resp.status_code))
+    metrics.HTTP_REQUEST_BYTES.observe(request.content_length or 0, route)
+    if resp.content_length is not None:
+        metrics.HTTP_RESPONSE_BYTES.observe(resp.content_length, route)
+    return resp
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Counters and latency histograms in the Prometheus text format."""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)."}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# ── HTTP Caching ──────────────────────────────────────────────
+def conditional(view):
+    """Answer If-None-Match with 304 while the stored tasks are unchanged.
+
+    The ETag is the storage dataset version plus today's date (summary and
+    upcoming depend on it), so a matching request never reaches task_manager.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = f"{storage.dataset_version()}-{date.today().isoformat()}"
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+        else:
+            resp = app.make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+        resp.set_etag(etag, weak=True)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        resp.vary.update(("Accept", "Accept-Encoding", USER_HEADER))
+        return resp
+    return wrapper
+
+
+@app.after_request
+def compress_response(resp):
+    """gzip/brotli-encode buffered JSON bodies larger than COMPRESS_MIN_BYTES."""
+    if (resp.status_code != 200 or resp.is_streamed or resp.direct_passthrough
+            or resp.mimetype != "application/json" or "Content-Encoding" in resp.headers):
+        return resp
+    data = resp.get_data()
+    if len(data) < http_cache.COMPRESS_MIN_BYTES:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = http_cache.choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding:
+        resp.set_data(http_cache.compress(data, encoding))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
 
 # ── Static Files ──────────────────────────────────────────────
 @app.route("/")
 def index():
-    return send_from_directory("web", "index.html")
+    """Redirect to the fingerprinted page so browsers can cache it forever."""
+    resp = redirect(f"/{INDEX.fingerprinted_name()}")
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@app.route("/index.<fingerprint>.html")
+def fingerprinted_index(fingerprint):
+    encoding = http_cache.choose_encoding(request.headers.get("Accept-Encoding"))
+    current, body = INDEX.encoded(encoding)
+    if fingerprint != current:
+        return index()
+    resp = Response(body, mimetype="text/html")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(current)
+    resp.headers["Cache-Control"] = http_cache.IMMUTABLE
+    resp.vary.add("Accept-Encoding")
+    return resp.make_conditional(request)
 
 
 # ── Tasks API ─────────────────────────────────────────────────
 @app.route("/api/tasks", methods=["GET"])
+@conditional
 def get_tasks():
-    status = request.args.get("status")
-    priority = request.args.get("priority")
-    subject = request.args.get("subject")
-    if any([status, priority, subject]):
-        tasks = task_manager.filter_tasks(status=status, priority=priority, subject=subject)
-    else:
-        tasks = task_manager.get_all_tasks()
-    return jsonify(tasks)
+    """All matching tasks as a JSON array; paged when limit or cursor is given.
+
+    Optional query args: sort (created_at|updated_at|due_date|title),
+    order (asc|desc), fields (comma-separated projection), limit, cursor and
+    format=ndjson to stream one task per line instead of building one array.
+    """
+    args = request.args
+    status, priority, subject = args.get("status"), args.get("priority"), args.get("subject")
+    fields = [f for f in args.get("fields", "").split(",") if f] or None
+    ndjson = args.get("format") == "ndjson" or \
+        request.accept_mimetypes.best == "application/x-ndjson"
+    paged = "limit" in args or "cursor" in args
+    if not (paged or ndjson or fields or "sort" in args or "order" in args):
+        if any([status, priority, subject]):
+            tasks = task_manager.filter_tasks(status=status, priority=priority, subject=subject)
+        else:
+            tasks = task_manager.get_all_tasks()
+        return jsonify(tasks)
+
+    try:
+        query = dict(status=status, priority=priority, subject=subject,
+                     sort=args.get("sort", "created_at"),
+                     descending=args.get("order", "asc") == "desc",
+                     cursor=args.get("cursor"))
+        if args.get("order", "asc") not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'.")
+        limit = args.get("limit", type=int)
+        if "limit" in args and limit is None:
+            raise ValueError("limit must be a positive integer.")
+        if ndjson:
+            tasks = task_manager.iter_tasks(limit=limit, **query)
+            lines = (codec.dumps(task_manager.project(t, fields)) + b"\n" for t in tasks)
+            return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+        if not paged:
+            tasks = task_manager.iter_tasks(**query)
+            return jsonify([task_manager.project(t, fields) for t in tasks])
+        page = task_manager.list_tasks_page(limit=50 if limit is None else limit, **query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    page["tasks"] = [task_manager.project(t, fields) for t in page["tasks"]]
+    return jsonify(page)
 
 
 @app.route("/api/tasks", methods=["POST"])
@@ -50,12 +301,47 @@ def create_task():
         return jsonify({"error": str(e)}), 400
 
 
+@app.route("/api/tasks/batch", methods=["POST"])
+def batch_tasks():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object with an operations list."}), 400
+    try:
+        results = task_manager.apply_batch(data.get("operations", []))
+        return jsonify({"results": results})
+    except (ValueError, KeyError) as e:
+        return jsonify({"error": e.args[0]}), 400
+
+
+@app.route("/api/tasks/export")
+def export_tasks():
+    fmt = request.args.get("format", "jsonl")
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": f"Format must be one of {list(bulk.FORMATS)}"}), 400
+    tasks = task_manager.get_all_tasks()
+    return Response(
+        stream_with_context(bulk.write_rows(tasks, fmt)),
+        mimetype=bulk.CONTENT_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=tasks.{fmt}"},
+    )
+
+
+@app.route("/api/tasks/import", methods=["POST"])
+def import_tasks():
+    fmt = request.args.get("format", "jsonl")
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        count = task_manager.import_tasks(bulk.read_rows(lines, fmt))
+        return jsonify({"imported": count}), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
 @app.route("/api/tasks/<task_id>", methods=["PUT"])
 def update_task(task_id):
     data = request.json
     try:
-        allowed = {"title", "description", "due_date", "priority", "status", "subject"}
-        fields = {k: v for k, v in data.items() if k in allowed}
+        fields = {k: v for k, v in data.items() if k in task_model.EDITABLE_FIELDS}
         task = task_manager.update_task(task_id, **fields)
         return jsonify(task)
     except KeyError as e:
@@ -74,34 +360,140 @@ def delete_task(task_id):
 
 @app.route("/api/summary")
 def summary():
+    if request.args.get("check"):
+        return jsonify(task_manager.check_summary())
+    return _summary()
+
+
+@conditional
+def _summary():
     return jsonify(task_manager.get_summary())
 
 
 @app.route("/api/upcoming")
+@conditional
 def upcoming():
     days = int(request.args.get("days", 7))
     return jsonify(task_manager.get_upcoming_tasks(days=days))
 
 
+@app.route("/api/overdue")
+@conditional
+def overdue():
+    return jsonify(task_manager.get_overdue_tasks())
+
+
+@app.route("/api/due")
+@conditional
+def due():
+    """Unfinished tasks due from..to (YYYY-MM-DD, inclusive); both default to today."""
+    first = request.args.get("from") or date.today().isoformat()
+    try:
+        return jsonify(task_manager.get_tasks_due(first, request.args.get("to") or first))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/search")
+@conditional
+def search():
+    """Tasks matching every word of q, best first; the last word may be partial."""
+    try:
+        limit = request.args.get("limit", type=int)
+        if "limit" in request.args and limit is None:
+            raise ValueError("limit must be a positive integer.")
+        hits = task_manager.search_tasks(request.args.get("q", ""), 20 if limit is None else limit)
+        return jsonify([dict(task.to_dict(), score=score) for task, score in hits])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/storage/stats")
+def storage_stats():
+    return jsonify({**storage.cache_stats(), "shards": storage.shard_stats()})
+
+
 # ── AI API ────────────────────────────────────────────────────
+@app.route("/api/ai/cache/stats")
+def ai_cache_stats():
+    return jsonify(llm_cache.cache_stats())
+
+
+@app.route("/api/ai/scheduler/stats")
+def ai_scheduler_stats():
+    return jsonify(llm_scheduler.get_scheduler().stats())
+
+
+@app.route("/api/ai/context/stats")
+def ai_context_stats():
+    """Token counts of the chat task context: old JSON encoding vs. compact table."""
+    budget = request.args.get("budget", type=int)
+    return jsonify(task_context.context_report(task_manager.get_all_tasks(), budget))
+
+
 @app.route("/api/ai/chat", methods=["POST"])
 def ai_chat():
     data = request.json
     message = data.get("message", "")
     history = data.get("history", [])
-    tasks = task_manager.get_all_tasks()
     try:
-        reply = ai_agent.ask_ai(message, tasks, history)
+        reply = ai_agent.ask_ai(message, [], history, task_context=task_manager.get_chat_context())
         return jsonify({"reply": reply})
+    except (llm_scheduler.SchedulerBusy, llm_scheduler.CircuitOpenError) as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(int(llm_scheduler.LLM_BREAKER_RESET))}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _sse(data, event=None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {codec.dumps_text(data)}\n\n"
+
+
+@app.route("/api/ai/chat/stream", methods=["POST"])
+def ai_chat_stream():
+    """Server-sent events: {"delta": text} per piece of the reply, then a
+    "done" event with time to first token and total time in ms, or an
+    "error" event. /api/ai/chat remains for clients that can't stream."""
+    data = request.json
+    message = data.get("message", "")
+    history = data.get("history", [])
+    context = task_manager.get_chat_context()
+
+    def events():
+        timings = {}
+        try:
+            for text in ai_agent.stream_ai(message, [], history, task_context=context, timings=timings):
+                yield _sse({"delta": text})
+        except Exception as e:
+            yield _sse({"error": str(e)}, event="error")
+            return
+        yield _sse({"ttft_ms": round(timings["ttft"] * 1000, 1),
+                    "total_ms": round(timings["total"] * 1000, 1)}, event="done")
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _wants_async() -> bool:
+    """?async=1 or "Prefer: respond-async": queue the AI call as a background job."""
+    return (request.args.get("async", "").lower() in ("1", "true")
+            or "respond-async" in request.headers.get("Prefer", ""))
+
+
+def _accepted(kind: str, payload: dict):
+    job = jobs.get_queue().enqueue(kind, payload)
+    url = f"/api/jobs/{job['id']}"
+    return jsonify({"job_id": job["id"], "status": job["status"], "url": url}), 202, {"Location": url}
+
+
 @app.route("/api/ai/suggest-priority/<task_id>", methods=["POST"])
 def suggest_priority(task_id):
     task = task_manager.get_task_by_id(task_id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
+    if _wants_async():
+        return _accepted("priority", {"task_id": task_id})
     try:
         priority = ai_agent.suggest_priority(task)
         return jsonify({"priority": priority})
@@ -109,11 +501,37 @@ def suggest_priority(task_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/ai/suggest-priority", methods=["POST"])
+def suggest_priorities():
+    """Batch version: {"task_ids": [...]} (default: every unfinished task)."""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object."}), 400
+    if "task_ids" in data:
+        if not isinstance(data["task_ids"], list) or not all(isinstance(i, str) for i in data["task_ids"]):
+            return jsonify({"error": "task_ids must be a list of task id strings."}), 400
+        tasks = [task_manager.get_task_by_id(i) for i in data["task_ids"]]
+        missing = [i for i, t in zip(data["task_ids"], tasks) if t is None]
+        if missing:
+            return jsonify({"error": f"Tasks not found: {missing}"}), 404
+    else:
+        tasks = [t for t in task_manager.get_all_tasks() if t.get("status") != "completed"]
+    if _wants_async():
+        return _accepted("priorities", {"task_ids": [t["id"] for t in tasks]})
+    try:
+        priorities = ai_agent.suggest_priorities(tasks)
+        return jsonify({"priorities": {t["id"]: p for t, p in zip(tasks, priorities)}})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/ai/subtasks/<task_id>", methods=["POST"])
 def generate_subtasks(task_id):
     task = task_manager.get_task_by_id(task_id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
+    if _wants_async():
+        return _accepted("subtasks", {"task_id": task_id})
     try:
         subtasks = ai_agent.generate_subtasks(task)
         return jsonify({"subtasks": subtasks})
@@ -121,9 +539,30 @@ def generate_subtasks(task_id):
         return jsonify({"error": str(e)}), 500
 
 
+JOB_WAIT_MAX = 30  # seconds a long-poll may hold a request
+
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """A background job; ?wait=N long-polls up to N seconds for it to finish."""
+    wait = min(max(request.args.get("wait", 0, type=float), 0), JOB_WAIT_MAX)
+    job = jobs.get_queue().wait(job_id, wait)
+    if job is None or job["payload"].get("user") != storage.current_user():
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/jobs/stats")
+def job_stats():
+    return jsonify(jobs.get_queue().stats())
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     debug = os.environ.get("RENDER") is None
     print(f"🚀 Smart Student Task Agent running at http://localhost:{port}")
-    app.run(debug=debug, host="0.0.0.0", port=port)
+    try:
+        app.run(debug=debug, host="0.0.0.0", port=port)
+    finally:
+        shutdown()
     
\ No newline at end of file
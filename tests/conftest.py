@@ -0,0 +1,48 @@
+"""Fixtures shared across the test modules."""
+
+import pytest
+
+from app import ai_agent, llm_cache, llm_scheduler, storage
+from benchmarks.openrouter_stub import StubServer
+import server
+
+
+@pytest.fixture
+def temp_data_file(tmp_path, monkeypatch):
+    """Keep task data (and jobs.db) in tmp_path; yields that directory."""
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", storage.STORAGE_BACKEND)
+    monkeypatch.setattr(storage, "DATA_FILE", str(tmp_path / "tasks.json"))
+    storage.invalidate_cache()
+    yield tmp_path
+    storage.invalidate_cache()
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.fixture
+def no_response_cache(monkeypatch):
+    # Network tests count requests, so caching is off unless a test turns it on.
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_SIZE", 0)
+
+
+@pytest.fixture
+def open_scheduler(monkeypatch):
+    # No rate limit or retries here; TestScheduler sets its own limits.
+    monkeypatch.setattr(llm_scheduler, "LLM_RATE_PER_MIN", 1e6)
+    monkeypatch.setattr(llm_scheduler, "LLM_BURST", 1000)
+    monkeypatch.setattr(llm_scheduler, "LLM_MAX_CONCURRENT", 64)
+    monkeypatch.setattr(llm_scheduler, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(llm_scheduler, "LLM_BACKOFF_BASE", 0.01)
+    llm_scheduler.reset_scheduler()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with StubServer(latency=0.01, reply="high") as server:
+        monkeypatch.setattr(ai_agent, "OPENROUTER_URL", server.url)
+        monkeypatch.setattr(ai_agent, "OPENROUTER_API_KEY", "test-key")
+        yield server
+    ai_agent.get_pool().close()
@@ -0,0 +1,384 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app import ai_agent, llm_cache, llm_scheduler, task_manager
+from benchmarks.openrouter_stub import priority_reply
+import server
+
+
+pytestmark = pytest.mark.usefixtures("temp_data_file", "no_response_cache", "open_scheduler")
+
+TASK = {"title": "Essay", "subject": "English", "due_date": "2025-06-01", "description": ""}
+
+
+def _distinct(n):
+    # Different prompts, so concurrent calls aren't coalesced into one.
+    return [dict(TASK, title=f"Essay {i}") for i in range(n)]
+
+
+class TestConnectionPool:
+    def test_sequential_calls_reuse_one_connection(self, stub):
+        assert [ai_agent.suggest_priority(TASK) for _ in range(5)] == ["high"] * 5
+        assert stub.requests == 5
+        assert stub.connections == 1
+
+    def test_pool_size_bounds_open_connections(self, stub, monkeypatch):
+        monkeypatch.setattr(ai_agent, "OPENROUTER_POOL_SIZE", 2)
+        stub.latency = 0.05
+        threads = [threading.Thread(target=ai_agent.suggest_priority, args=(t,)) for t in _distinct(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert stub.requests == 8
+        assert stub.connections <= 2 and stub.max_in_flight <= 2
+
+    def test_server_closing_connections_is_handled(self, stub):
+        stub.keep_alive = False
+        assert [ai_agent.suggest_priority(TASK) for _ in range(3)] == ["high"] * 3
+        assert stub.connections == 3
+
+    def test_http_errors_raise_and_helpers_fall_back(self, stub):
+        stub.status = 503
+        with pytest.raises(RuntimeError, match="OpenRouter API error 503"):
+            ai_agent.ask_ai("hi", [])
+        assert ai_agent.suggest_priority(TASK) == "medium"
+        assert ai_agent.generate_subtasks(TASK) == []
+
+    def test_missing_api_key(self, stub, monkeypatch):
+        monkeypatch.setattr(ai_agent, "OPENROUTER_API_KEY", "")
+        with pytest.raises(ValueError, match="OPENROUTER_API_KEY"):
+            ai_agent.ask_ai("hi", [])
+        assert stub.requests == 0
+
+
+class TestAsync:
+    def test_calls_run_concurrently_on_one_thread(self, stub):
+        stub.latency = 0.2
+
+        async def main():
+            threads = threading.active_count()
+            start = time.perf_counter()
+            results = await asyncio.gather(*(ai_agent.suggest_priority_async(t) for t in _distinct(20)))
+            elapsed = time.perf_counter() - start
+            assert threading.active_count() - threads <= 20  # only the stub's handler threads
+            await ai_agent.get_async_pool().close()
+            return results, elapsed
+
+        results, elapsed = asyncio.run(main())
+        assert results == ["high"] * 20
+        assert elapsed < 1.5  # 20 x 0.2s one after another would take 4s
+        assert stub.max_in_flight > 1
+
+    def test_async_reuses_connections(self, stub):
+        stub.reply = '["Outline", "Draft", "Edit"]'
+
+        async def main():
+            results = [await ai_agent.generate_subtasks_async(TASK) for _ in range(3)]
+            reply = await ai_agent.ask_ai_async("hi", [TASK])
+            await ai_agent.get_async_pool().close()
+            return results, reply
+
+        results, reply = asyncio.run(main())
+        assert results == [["Outline", "Draft", "Edit"]] * 3
+        assert reply == '["Outline", "Draft", "Edit"]'
+        assert stub.connections == 1
+        assert "Essay" in stub.payloads[-1]["messages"][-1]["content"]
+
+    def test_async_errors_fall_back(self, stub):
+        stub.status = 429
+
+        async def main():
+            return await ai_agent.suggest_priority_async(TASK), await ai_agent.generate_subtasks_async(TASK)
+
+        assert asyncio.run(main()) == ("medium", [])
+
+
+class TestResponseCache:
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, no_response_cache, monkeypatch):
+        # Runs after no_response_cache, so the cache is turned back on here.
+        monkeypatch.setattr(llm_cache, "LLM_CACHE_SIZE", 64)
+        llm_cache.reset_cache()
+        yield
+        llm_cache.reset_cache()
+
+    def test_repeat_calls_are_answered_from_memory(self, stub):
+        stub.latency = 0.3
+        task = {**TASK, "id": "t1"}
+        assert ai_agent.suggest_priority(task) == "high"
+        start = time.perf_counter()
+        assert ai_agent.suggest_priority(task) == "high"
+        assert time.perf_counter() - start < 0.05
+        assert stub.requests == 1
+        stats = llm_cache.cache_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_malformed_replies_are_not_cached(self, stub):
+        stub.reply = "not json"
+        assert ai_agent.generate_subtasks(TASK) == []
+        assert ai_agent.generate_subtasks(TASK) == []
+        assert stub.requests == 2
+
+    def test_editing_prompt_fields_invalidates(self, stub):
+        task = task_manager.create_task(title="Essay", subject="English")
+        ai_agent.suggest_priority(task)
+        ai_agent.suggest_priority(task_manager.update_task(task["id"], status="in-progress"))
+        assert stub.requests == 1  # status isn't part of the prompt
+        task = task_manager.update_task(task["id"], title="Long essay")
+        assert llm_cache.cache_stats()["entries"] == 0
+        ai_agent.suggest_priority(task)
+        assert stub.requests == 2
+
+    def test_lru_and_ttl_eviction(self, monkeypatch):
+        cache = llm_cache.ResponseCache(max_entries=2, ttl=60)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+        now = time.monotonic()
+        monkeypatch.setattr(llm_cache.time, "monotonic", lambda: now + 61)
+        assert cache.get("a") is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "llm_cache.db")
+        first = llm_cache.ResponseCache(max_entries=2, path=path)
+        first.put("k", "reply", tag="t1")
+        first.put("gone", "reply", tag="t2")
+        first.invalidate_tag("t2")
+        first.close()
+        second = llm_cache.ResponseCache(max_entries=2, path=path)
+        assert second.get("k") == "reply" and second.get("gone") is None
+        assert second.stats()["disk_hits"] == 1
+        second.close()
+
+
+def _tasks(n):
+    return [{"id": f"t{i}", "title": f"Task {i}", "subject": "Maths", "due_date": "2025-06-01",
+             "description": "Worksheet " * 5} for i in range(n)]
+
+
+class TestBatchPriorities:
+    def test_many_tasks_take_few_concurrent_calls(self, stub):
+        stub.reply, stub.latency = priority_reply, 0.1
+        tasks = _tasks(50)
+        start = time.perf_counter()
+        assert ai_agent.suggest_priorities(tasks, token_budget=400) == ["high"] * 50
+        elapsed = time.perf_counter() - start
+        chunks = ai_agent._chunk_by_budget(tasks, 400)
+        assert 1 < len(chunks) == stub.requests < 50
+        assert stub.max_in_flight > 1 and elapsed < 0.1 * len(chunks)
+
+    def test_chunks_respect_the_token_budget(self):
+        chunks = ai_agent._chunk_by_budget(_tasks(30), 300)
+        assert sorted(i for chunk in chunks for i in chunk) == list(range(30))
+        for chunk in chunks:
+            messages = ai_agent._batch_priority_messages([_tasks(30)[i] for i in chunk])
+            assert sum(ai_agent.estimate_tokens(m["content"]) for m in messages) <= 300 + 2
+
+    def test_unanswered_tasks_fall_back_one_by_one(self, stub):
+        def reply(payload):
+            if '{"i":' in payload["messages"][-1]["content"]:
+                return '```json\n{"0": "low", "2": "urgent", "3": "HIGH"}\n```'
+            return "medium"
+        stub.reply = reply
+        assert ai_agent.suggest_priorities(_tasks(4)) == ["low", "medium", "medium", "high"]
+        assert stub.requests == 1 + 2
+
+    def test_failed_batch_falls_back_and_errors_give_medium(self, stub):
+        stub.status = 500
+        assert ai_agent.suggest_priorities(_tasks(3)) == ["medium"] * 3
+        assert stub.requests == 1 + 3
+
+    def test_async_matches_sync(self, stub):
+        stub.reply = lambda payload: priority_reply(payload, "low")
+
+        async def main():
+            result = await ai_agent.suggest_priorities_async(_tasks(20), token_budget=300)
+            await ai_agent.get_async_pool().close()
+            return result
+
+        assert asyncio.run(main()) == ["low"] * 20
+
+    def test_batch_answers_fill_the_single_task_cache(self, stub, monkeypatch):
+        monkeypatch.setattr(llm_cache, "LLM_CACHE_SIZE", 64)
+        llm_cache.reset_cache()
+        stub.reply = priority_reply
+        tasks = _tasks(5)
+        ai_agent.suggest_priorities(tasks)
+        assert ai_agent.suggest_priority(tasks[2]) == "high"
+        assert ai_agent.suggest_priorities(tasks) == ["high"] * 5
+        assert stub.requests == 1
+        llm_cache.reset_cache()
+
+    def test_endpoint(self, stub, monkeypatch):
+        stub.reply = priority_reply
+        a = task_manager.create_task(title="A")
+        task_manager.create_task(title="Done", status="completed")
+        client = server.app.test_client()
+        assert client.post("/api/ai/suggest-priority").json == {"priorities": {a["id"]: "high"}}
+        assert client.post("/api/ai/suggest-priority", json={"task_ids": ["nope"]}).status_code == 404
+
+
+class TestStreaming:
+    def test_sse_parser(self):
+        lines = [b": keep-alive\n", b"\n", b"data: one\n", b"data: two\r\n", b"\n",
+                 b"event: x\n", b"data:three\n", b"\n", b"data: [DONE]\n", b"\n", b"data: late\n", b"\n"]
+        assert list(ai_agent.iter_sse_data(lines)) == ["one\ntwo", "three"]
+
+    def test_tokens_arrive_before_the_reply_is_finished(self, stub):
+        stub.reply, stub.latency, stub.token_delay = "You should start with the essay", 0.05, 0.05
+        timings, received = {}, []
+        for text in ai_agent.stream_ai("what first?", [TASK], timings=timings):
+            received.append((text, time.perf_counter()))
+        assert "".join(t for t, _ in received) == "You should start with the essay"
+        assert len(received) == 6
+        assert timings["ttft"] < 0.15 and timings["total"] >= 0.3
+        assert received[-1][1] - received[0][1] >= 0.2
+        assert stub.payloads[-1]["stream"] is True
+
+    def test_connection_is_reused_after_a_stream(self, stub):
+        stub.reply = "a b c"
+        for _ in range(3):
+            assert "".join(ai_agent.stream_ai("hi", [])) == "a b c"
+        assert stub.connections == 1
+
+    def test_plain_json_reply_is_yielded_whole(self, stub):
+        stub.sse, stub.reply = False, "no streaming here"
+        assert list(ai_agent.stream_ai("hi", [])) == ["no streaming here"]
+
+    def test_streaming_can_be_switched_off(self, stub, monkeypatch):
+        monkeypatch.setattr(ai_agent, "OPENROUTER_STREAM", False)
+        stub.reply = "whole reply"
+        timings = {}
+        assert list(ai_agent.stream_ai("hi", [], timings=timings)) == ["whole reply"]
+        assert "stream" not in stub.payloads[-1] and timings["ttft"] == timings["total"]
+
+    def test_endpoint_forwards_events(self, stub):
+        stub.reply = "Start with maths"
+        resp = server.app.test_client().post("/api/ai/chat/stream", json={"message": "hi"})
+        assert resp.mimetype == "text/event-stream"
+        events = resp.get_data(as_text=True).strip().split("\n\n")
+        deltas = [json.loads(e[len("data: "):])["delta"] for e in events[:-1]]
+        assert "".join(deltas) == "Start with maths"
+        assert events[-1].startswith("event: done\n")
+        done = json.loads(events[-1].split("data: ")[1])
+        assert 0 < done["ttft_ms"] <= done["total_ms"]
+
+    def test_endpoint_reports_errors_as_events(self, stub):
+        stub.status = 429
+        body = server.app.test_client().post("/api/ai/chat/stream", json={"message": "hi"}).get_data(as_text=True)
+        assert body.startswith("event: error\n") and "429" in body
+
+
+class TestScheduler:
+    def test_token_bucket_spaces_out_calls_past_the_burst(self):
+        bucket = llm_scheduler.TokenBucket(rate=10, burst=2)
+        assert bucket.reserve() == 0 and bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+        assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+    def test_interactive_waiters_go_first(self):
+        gate = llm_scheduler._Gate(limit=1, max_queue=8)
+        gate.acquire(llm_scheduler.INTERACTIVE, 1)
+        order = []
+
+        def wait(name, priority):
+            gate.acquire(priority, 5)
+            order.append(name)
+            gate.release()
+
+        threads = [threading.Thread(target=wait, args=("background", llm_scheduler.BACKGROUND))]
+        threads[0].start()
+        while gate.queued() < 1:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=wait, args=("chat", llm_scheduler.INTERACTIVE)))
+        threads[1].start()
+        while gate.queued() < 2:
+            time.sleep(0.001)
+        gate.release()
+        for t in threads:
+            t.join()
+        assert order == ["chat", "background"]
+
+    def test_full_queue_is_refused(self):
+        gate = llm_scheduler._Gate(limit=1, max_queue=0)
+        gate.acquire(llm_scheduler.INTERACTIVE, 1)
+        with pytest.raises(llm_scheduler.SchedulerBusy):
+            gate.acquire(llm_scheduler.INTERACTIVE, 1)
+
+    def test_identical_requests_in_flight_are_coalesced(self, stub):
+        stub.latency = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(ai_agent.suggest_priority(TASK)))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == ["high"] * 5
+        assert stub.requests == 1
+        assert llm_scheduler.get_scheduler().stats()["coalesced"] == 4
+
+    def test_rate_limit_and_retry_after_429(self, stub, monkeypatch):
+        monkeypatch.setattr(llm_scheduler, "LLM_MAX_RETRIES", 2)
+        stub.fail_next = [429, 503]
+        assert ai_agent.suggest_priority(TASK) == "high"
+        assert stub.requests == 3
+        stats = server.app.test_client().get("/api/ai/scheduler/stats").get_json()
+        assert stats["retries"] == 2 and stats["breaker"] == "closed"
+
+        monkeypatch.setattr(llm_scheduler, "LLM_RATE_PER_MIN", 600)
+        monkeypatch.setattr(llm_scheduler, "LLM_BURST", 1)
+        start = time.perf_counter()
+        for t in _distinct(3):
+            ai_agent.suggest_priority(t)
+        assert time.perf_counter() - start >= 0.18  # 10 a second after the first
+
+    def test_client_errors_are_not_retried(self, stub, monkeypatch):
+        monkeypatch.setattr(llm_scheduler, "LLM_MAX_RETRIES", 2)
+        stub.status = 400
+        assert ai_agent.suggest_priority(TASK) == "medium"
+        assert stub.requests == 1
+
+    def test_breaker_opens_and_fails_fast(self, stub, monkeypatch):
+        monkeypatch.setattr(llm_scheduler, "LLM_BREAKER_FAILURES", 2)
+        monkeypatch.setattr(llm_scheduler, "LLM_BREAKER_RESET", 0.2)
+        stub.status = 503
+        assert [ai_agent.suggest_priority(t) for t in _distinct(4)] == ["medium"] * 4
+        assert stub.requests == 2
+        with pytest.raises(llm_scheduler.CircuitOpenError):
+            ai_agent.ask_ai("hi", [])
+        resp = server.app.test_client().post("/api/ai/chat", json={"message": "hi"})
+        assert resp.status_code == 503 and "Retry-After" in resp.headers
+        assert llm_scheduler.get_scheduler().stats()["breaker"] == "open"
+
+        stub.status = 200
+        time.sleep(0.25)
+        assert ai_agent.suggest_priority(TASK) == "high"  # the probe works, so it closes
+        assert llm_scheduler.get_scheduler().stats()["breaker"] == "closed"
+
+    def test_stream_retries_before_the_first_token(self, stub, monkeypatch):
+        monkeypatch.setattr(llm_scheduler, "LLM_MAX_RETRIES", 1)
+        stub.reply = "Start with maths"
+        stub.fail_next = [503]
+        assert "".join(ai_agent.stream_ai("hi", [])) == "Start with maths"
+        assert stub.requests == 2
+
+    def test_async_calls_are_coalesced_and_retried(self, stub, monkeypatch):
+        monkeypatch.setattr(llm_scheduler, "LLM_MAX_RETRIES", 1)
+        stub.latency = 0.1
+        stub.fail_next = [502]
+
+        async def main():
+            results = await asyncio.gather(*(ai_agent.suggest_priority_async(TASK) for _ in range(4)))
+            await ai_agent.get_async_pool().close()
+            return results
+
+        assert asyncio.run(main()) == ["high"] * 4
+        assert stub.requests == 2
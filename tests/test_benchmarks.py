@@ -0,0 +1,30 @@
+from app import storage
+from benchmarks import suite
+
+
+def test_suite_times_every_case_and_restores_storage(temp_data_file):
+    report = suite.run([20], ["json", "sqlite"], ops=3, http_ops=2)
+    results = report["results"]
+    for case in ("seed", "create", "update", "delete", "filter", "summary", "upcoming", "search",
+                 "http GET /api/tasks", "http POST /api/tasks", "http total"):
+        assert results[f"json/20/{case}"]["median_ms"] >= 0
+    assert results["sqlite/20/create"]["ops"] == 3 and results["sqlite/20/http total"]["ops"] == 16
+    assert storage.DATA_FILE == str(temp_data_file / "tasks.json") and storage.load_tasks() == []
+
+
+def test_compare_flags_slow_cases_only():
+    baseline = {"results": {"a": {"median_ms": 1.0}, "b": {"median_ms": 2.0}, "gone": {"median_ms": 1.0}}}
+    current = {"results": {"a": {"median_ms": 1.4}, "b": {"median_ms": 5.0}, "new": {"median_ms": 1.0}}}
+    rows = {r["case"]: r for r in suite.compare(current, baseline, tolerance=0.5)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regressed"] and rows["b"]["regressed"] and rows["b"]["ratio"] == 2.5
+
+
+def test_saving_a_baseline_keeps_cases_the_run_skipped():
+    baseline = {"meta": {"ops": 50}, "results": {"json/1000/create": {"median_ms": 1.0},
+                                                 "json/100000/create": {"median_ms": 9.0}}}
+    current = {"meta": {"ops": 20}, "results": {"json/100000/create": {"median_ms": 8.0}}}
+    merged = suite.merge(baseline, current)
+    assert merged["meta"] == {"ops": 20}
+    assert merged["results"] == {"json/1000/create": {"median_ms": 1.0}, "json/100000/create": {"median_ms": 8.0}}
+    assert suite.merge({}, current)["results"] == current["results"]
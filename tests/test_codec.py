@@ -0,0 +1,60 @@
+import dataclasses
+import json
+
+import pytest
+
+from app import codec, storage
+import server
+
+
+@pytest.fixture(params=sorted(codec.CODECS))
+def codec_name(request, monkeypatch):
+    monkeypatch.setattr(codec, "JSON_CODEC", request.param)
+    return request.param
+
+
+class TestCodec:
+    def test_round_trip_is_compact_utf8(self, codec_name):
+        task = {"id": "a", "title": "Café ✓", "due_date": None, "n": 1.5, "tags": [True]}
+        data = codec.dumps(task)
+        assert codec.get_codec()[0] == codec_name
+        assert data == '{"id":"a","title":"Café ✓","due_date":null,"n":1.5,"tags":[true]}'.encode("utf-8")
+        assert codec.loads(data) == codec.loads(data.decode("utf-8")) == task
+
+    def test_pretty_output_indents(self, codec_name):
+        assert codec.dumps({"a": [1]}, pretty=True).decode() == json.dumps({"a": [1]}, indent=2)
+
+    def test_values_the_stdlib_encoder_would_refuse(self, codec_name):
+        @dataclasses.dataclass
+        class Point:
+            x: int
+
+        assert codec.loads(codec.dumps({None: Point(1)})) == {"null": {"x": 1}}
+
+    def test_decode_errors_are_value_errors(self, codec_name):
+        with pytest.raises(ValueError):
+            codec.loads(b"{not json")
+
+    def test_unknown_codec_is_rejected(self, monkeypatch):
+        monkeypatch.setattr(codec, "JSON_CODEC", "yaml")
+        with pytest.raises(ValueError, match="JSON_CODEC"):
+            codec.dumps({})
+
+
+class TestCodecUsers:
+    def test_data_file_is_compact_unless_pretty(self, codec_name, temp_data_file, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", "json")
+        storage.insert_task({"id": "a", "title": "Essay"})
+        assert (temp_data_file / "tasks.json").read_text() == '[{"id":"a","title":"Essay"}]'
+        monkeypatch.setattr(codec, "JSON_PRETTY", True)
+        storage.insert_task({"id": "b", "title": "Lab"})
+        assert (temp_data_file / "tasks.json").read_text().startswith('[\n  {\n    "id": "a"')
+        storage.invalidate_cache()
+        assert [t["id"] for t in storage.load_tasks()] == ["a", "b"]
+
+    def test_api_responses_keep_key_order(self, codec_name, temp_data_file):
+        client = server.app.test_client()
+        resp = client.post("/api/tasks", json={"title": "Essay"})
+        assert resp.get_data(as_text=True).startswith('{"id":')
+        assert resp.json["title"] == "Essay"
+        assert client.post("/api/tasks", data="{oops", content_type="application/json").status_code == 400
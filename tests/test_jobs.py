@@ -0,0 +1,164 @@
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from app import jobs, storage, task_manager
+
+pytestmark = pytest.mark.usefixtures("no_response_cache", "open_scheduler")
+
+
+@pytest.fixture(autouse=True)
+def data_dir(temp_data_file):
+    yield temp_data_file
+    jobs.reset_queue()
+
+
+def _essay():
+    return task_manager.create_task(title="Essay", subject="English", due_date="2025-06-01")
+
+
+class TestJobQueue:
+    def test_subtasks_are_written_onto_the_task(self, stub):
+        stub.reply = '["Outline", "Draft", "Edit"]'
+        task = _essay()
+        job = jobs.get_queue().enqueue("subtasks", {"task_id": task["id"]})
+        assert job["status"] in ("queued", "running")
+        job = jobs.get_queue().wait(job["id"], 5)
+        assert job["status"] == "done"
+        assert job["result"]["subtasks"] == ["Outline", "Draft", "Edit"]
+        assert task_manager.get_task_by_id(task["id"])["subtasks"] == [
+            {"text": "Outline", "done": False}, {"text": "Draft", "done": False}, {"text": "Edit", "done": False}]
+
+    def test_missing_task_fails_the_job(self, stub):
+        job = jobs.get_queue().enqueue("priority", {"task_id": "nope"})
+        job = jobs.get_queue().wait(job["id"], 5)
+        assert job["status"] == "failed" and "not found" in job["error"]
+        assert stub.requests == 0
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError, match="Job kind"):
+            jobs.get_queue().enqueue("essay", {})
+
+    def test_unfinished_jobs_survive_a_restart(self, stub, data_dir):
+        task = _essay()
+        queue = jobs.JobQueue(str(data_dir / "jobs.db"))
+        queue._started = True  # no workers: the job stays queued
+        job = queue.enqueue("priority", {"task_id": task["id"]})
+        queue.close()
+
+        resumed = jobs.get_queue()
+        resumed.start()
+        assert resumed.wait(job["id"], 5)["status"] == "done"
+        assert resumed.stats()["resumed"] == 1
+        assert task_manager.get_task_by_id(task["id"])["ai_priority"] == "high"
+        assert task_manager.get_task_by_id(task["id"])["priority"] == "medium"  # the user's choice stays
+
+    def test_a_second_queue_on_the_table_leaves_running_jobs_alone(self, data_dir, monkeypatch):
+        release, runs = threading.Event(), []
+
+        def slow(payload):
+            runs.append(payload["n"])
+            release.wait(5)
+            return payload["n"]
+        monkeypatch.setitem(jobs.HANDLERS, "priority", slow)
+        path = str(data_dir / "jobs.db")
+        first, second = jobs.JobQueue(path), jobs.JobQueue(path)
+        ids = [first.enqueue("priority", {"n": n})["id"] for n in range(2)]
+        while len(runs) < 2:
+            time.sleep(0.01)
+        ids.append(second.enqueue("priority", {"n": 2})["id"])  # starts the second queue
+        release.set()
+        assert [first.wait(i, 5)["status"] for i in ids] == ["done"] * 3
+        assert sorted(runs) == [0, 1, 2]
+        first.close()
+        second.close()
+
+    def test_running_jobs_are_retaken_once_their_owner_is_gone(self, data_dir, monkeypatch):
+        monkeypatch.setitem(jobs.HANDLERS, "priority", lambda payload: payload["n"])
+        exited = subprocess.Popen([sys.executable, "-c", ""])
+        exited.wait()
+        host, now = socket.gethostname(), time.time()
+        queue = jobs.JobQueue(str(data_dir / "jobs.db"), lease=60)
+        owners = [(f"{host}:{exited.pid}:a", now),          # process has exited
+                  ("elsewhere:1:b", now - 120),              # lease has run out
+                  (f"{host}:{jobs.os.getpid()}:c", now)]     # alive and beating
+        for n, (owner, beat) in enumerate(owners):
+            queue._execute("INSERT INTO jobs (id, kind, payload, status, created_at, owner, heartbeat)"
+                           " VALUES (?, 'priority', ?, 'running', ?, ?, ?)",
+                           (f"j{n}", f'{{"n": {n}}}', now, owner, beat))
+        queue.start()
+        assert [queue.wait(f"j{n}", 5)["status"] for n in range(2)] == ["done", "done"]
+        assert queue.get("j2")["status"] == "running"
+        assert queue.stats()["resumed"] == 2
+        queue.close()
+
+    def test_wait_sees_jobs_finished_by_another_process(self, data_dir, monkeypatch):
+        monkeypatch.setitem(jobs.HANDLERS, "priority", lambda payload: "high")
+        path = str(data_dir / "jobs.db")
+        runner, poller = jobs.JobQueue(path), jobs.JobQueue(path)
+        poller._started = True  # a worker that isn't running the job
+        job_id = runner.enqueue("priority", {})["id"]
+        start = time.monotonic()
+        assert poller.wait(job_id, 5)["status"] == "done"
+        assert time.monotonic() - start < 2
+        runner.close()
+        poller.close()
+
+    def test_workers_run_jobs_concurrently(self, stub, monkeypatch):
+        monkeypatch.setattr(jobs, "AI_JOB_WORKERS", 4)
+        stub.latency = 0.2
+        tasks = [task_manager.create_task(title=f"Essay {i}") for i in range(4)]
+        queue = jobs.get_queue()
+        ids = [queue.enqueue("priority", {"task_id": t["id"]})["id"] for t in tasks]
+        assert all(queue.wait(i, 5)["status"] == "done" for i in ids)
+        assert stub.max_in_flight > 1
+        stats = queue.stats()
+        assert stats["workers"] == 4 and stats["done"] == 4 and stats["jobs"]["done"] == 4
+        assert stats["queue_depth"] == 0 and stats["wait_ms"]["max"] >= 0 and stats["run_ms"]["avg"] >= 150
+
+
+class TestJobEndpoints:
+    def test_async_subtasks_returns_202_and_long_polls(self, stub, client):
+        stub.reply = '["Read", "Write"]'
+        task = _essay()
+        resp = client.post(f"/api/ai/subtasks/{task['id']}?async=1")
+        assert resp.status_code == 202
+        assert resp.headers["Location"] == resp.get_json()["url"]
+        job = client.get(resp.get_json()["url"] + "?wait=5").get_json()
+        assert job["status"] == "done" and job["result"]["subtasks"] == ["Read", "Write"]
+        assert [s["text"] for s in task_manager.get_task_by_id(task["id"])["subtasks"]] == ["Read", "Write"]
+
+    def test_prefer_header_queues_a_batch(self, stub, client):
+        tasks = [_essay(), _essay()]
+        resp = client.post("/api/ai/suggest-priority", json={"task_ids": [t["id"] for t in tasks]},
+                           headers={"Prefer": "respond-async"})
+        assert resp.status_code == 202
+        job = client.get(f"/api/jobs/{resp.get_json()['job_id']}?wait=5").get_json()
+        assert job["status"] == "done" and job["result"]["priorities"] == {t["id"]: "high" for t in tasks}
+        assert all(task_manager.get_task_by_id(t["id"])["ai_priority"] == "high" for t in tasks)
+
+    @pytest.mark.parametrize("body", [{"task_ids": [["x"]]}, {"task_ids": "abc"}, {"task_ids": None}, [1]])
+    def test_batch_priorities_reject_bad_task_ids(self, stub, client, body):
+        resp = client.post("/api/ai/suggest-priority", json=body)
+        assert resp.status_code == 400 and "error" in resp.get_json()
+        assert stub.requests == 0
+
+    def test_jobs_run_in_the_requesting_users_shard(self, stub, client):
+        ada = {"X-User": "ada@example.com"}
+        task = client.post("/api/tasks", json={"title": "Essay"}, headers=ada).json
+        url = client.post(f"/api/ai/suggest-priority/{task['id']}?async=1", headers=ada).json["url"]
+        assert client.get(url + "?wait=5", headers=ada).json["status"] == "done"
+        assert client.get(url).status_code == 404  # another user's job
+        with storage.user_scope("ada@example.com"):
+            assert task_manager.get_task_by_id(task["id"])["ai_priority"] == "high"
+
+    def test_sync_endpoints_unchanged_and_unknown_job(self, stub, client):
+        task = _essay()
+        assert client.post(f"/api/ai/suggest-priority/{task['id']}").get_json() == {"priority": "high"}
+        assert client.post("/api/ai/subtasks/nope?async=1").status_code == 404
+        assert client.get("/api/jobs/nope").status_code == 404
+        assert client.get("/api/jobs/stats").get_json()["enqueued"] == 0
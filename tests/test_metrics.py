@@ -0,0 +1,77 @@
+import pytest
+
+from app import ai_agent, metrics, task_manager
+
+pytestmark = pytest.mark.usefixtures("temp_data_file", "no_response_cache", "open_scheduler")
+
+TASK = {"title": "Essay", "subject": "English", "due_date": "2025-06-01", "description": ""}
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestHistogram:
+    def test_renders_cumulative_buckets(self):
+        h = metrics.Histogram("demo_seconds", "Demo.", ("op",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            h.observe(value, 'say "hi"')
+        lines = list(h.samples())
+        assert lines == [
+            'demo_seconds_bucket{op="say \\"hi\\"",le="0.1"} 1',
+            'demo_seconds_bucket{op="say \\"hi\\"",le="1"} 3',
+            'demo_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 4',
+            'demo_seconds_sum{op="say \\"hi\\""} 4.05',
+            'demo_seconds_count{op="say \\"hi\\""} 4',
+        ]
+
+    def test_disabled_metrics_record_nothing(self, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+        task_manager.create_task(title="Essay")
+        metrics.OPENROUTER_RESPONSES.inc("200")
+        assert metrics.TASK_MANAGER_SECONDS.count("create_task") == 0
+        assert metrics.OPENROUTER_RESPONSES.value("200") == 0
+
+
+class TestInstrumentation:
+    def test_task_manager_and_storage_calls_are_timed(self):
+        task = task_manager.create_task(title="Essay")
+        task_manager.get_summary()
+        task_manager.delete_task(task["id"])
+        assert metrics.TASK_MANAGER_SECONDS.count("create_task") == 1
+        assert metrics.TASK_MANAGER_SECONDS.count("get_summary") == 1
+        assert metrics.STORAGE_SECONDS.count("insert_task") == 1
+        assert metrics.STORAGE_SECONDS.count("task_counts") == 1
+
+    def test_openrouter_phases(self, stub):
+        stub.latency = 0.05
+        ai_agent.suggest_priority(TASK)
+        ai_agent.suggest_priority(dict(TASK, title="Lab"))  # reuses the pooled connection
+        assert metrics.OPENROUTER_SECONDS.count("connect") == 1
+        assert metrics.OPENROUTER_SECONDS.count("ttfb") == metrics.OPENROUTER_SECONDS.count("total") == 2
+        assert metrics.OPENROUTER_SECONDS.total("ttfb") >= 0.1
+        assert metrics.OPENROUTER_RESPONSES.value("200") == 2
+
+
+class TestMetricsEndpoint:
+    def test_requests_are_recorded_by_route_and_status(self, client):
+        client.post("/api/tasks", json={"title": "Essay " * 400})
+        posted = metrics.HTTP_RESPONSE_BYTES.total("/api/tasks")
+        client.get("/api/tasks", headers={"Accept-Encoding": "gzip"})
+        client.get("/api/tasks/nope/status")
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'http_request_duration_seconds_count{route="/api/tasks",method="POST",status="201"} 1' in text
+        assert 'http_request_duration_seconds_count{route="/api/tasks",method="GET",status="200"} 1' in text
+        assert 'http_request_duration_seconds_count{route="<unmatched>",method="GET",status="404"} 1' in text
+        assert 'task_manager_operation_seconds_count{operation="create_task"} 1' in text
+        assert "# TYPE openrouter_request_seconds histogram" in text
+        assert posted > 2400 and metrics.HTTP_REQUEST_BYTES.total("/api/tasks") > 2400
+        assert 0 < metrics.HTTP_RESPONSE_BYTES.total("/api/tasks") - posted < 500  # counted gzipped
+
+    def test_endpoint_is_off_when_disabled(self, client, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+        assert client.get("/metrics").status_code == 404
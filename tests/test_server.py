@@ -0,0 +1,252 @@
+import gzip
+import importlib.util
+import json
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from app import http_cache, jobs, storage
+import server
+
+pytestmark = pytest.mark.usefixtures("temp_data_file", "no_response_cache", "open_scheduler")
+
+
+class TestBatchEndpoints:
+    def test_batch_creates_and_rejects_atomically(self, client):
+        resp = client.post("/api/tasks/batch", json={"operations": [
+            {"op": "create", "task": {"title": "A"}},
+            {"op": "create", "task": {"title": "B"}},
+        ]})
+        assert resp.status_code == 200
+        assert [r["title"] for r in resp.json["results"]] == ["A", "B"]
+
+        resp = client.post("/api/tasks/batch", json={"operations": [
+            {"op": "create", "task": {"title": "C"}},
+            {"op": "create", "task": {"title": ""}},
+        ]})
+        assert resp.status_code == 400
+        assert "Operation 1" in resp.json["error"]
+        assert len(client.get("/api/tasks").json) == 2
+
+    @pytest.mark.parametrize("body", [[1, 2], "x", None, {"operations": ["x"]},
+                                      {"operations": [{"op": "update", "id": ["x"]}]}])
+    def test_batch_rejects_malformed_bodies(self, client, body):
+        resp = client.post("/api/tasks/batch", json=body)
+        assert resp.status_code == 400 and "error" in resp.json
+
+    @pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+    def test_export_then_import_round_trips(self, client, fmt):
+        client.post("/api/tasks", json={"title": "Essay, draft 1", "subject": "English", "due_date": "2025-06-01"})
+        client.post("/api/tasks", json={"title": "Lab", "priority": "high"})
+        exported = client.get(f"/api/tasks/export?format={fmt}").get_data(as_text=True)
+
+        resp = client.post(f"/api/tasks/import?format={fmt}", data=exported)
+        assert resp.status_code == 201
+        assert resp.json == {"imported": 2}
+        tasks = client.get("/api/tasks").json
+        assert [t["title"] for t in tasks] == ["Essay, draft 1", "Lab"] * 2
+        assert tasks[2]["due_date"] == "2025-06-01" and tasks[3]["priority"] == "high"
+
+    def test_import_reports_bad_rows(self, client):
+        body = "\n".join([json.dumps({"title": "ok"}), "{not json"])
+        resp = client.post("/api/tasks/import?format=jsonl", data=body)
+        assert resp.status_code == 400
+        assert "Row 2" in resp.json["error"]
+        assert client.get("/api/tasks").json == []
+
+
+class TestTaskListing:
+    def seed(self, client, n=5):
+        for i in range(n):
+            client.post("/api/tasks", json={"title": f"T{i}", "priority": "high" if i % 2 else "low"})
+
+    def test_create_rejects_an_empty_priority(self, client):
+        resp = client.post("/api/tasks", json={"title": "T", "priority": ""})
+        assert resp.status_code == 400 and "Priority" in resp.get_json()["error"]
+
+    def test_limit_and_cursor_page_through_tasks(self, client):
+        self.seed(client)
+        titles, url = [], "/api/tasks?limit=2&sort=title&order=desc"
+        while url:
+            page = client.get(url).json
+            titles += [t["title"] for t in page["tasks"]]
+            cursor = page["next_cursor"]
+            url = cursor and f"/api/tasks?limit=2&sort=title&order=desc&cursor={cursor}"
+        assert titles == ["T4", "T3", "T2", "T1", "T0"]
+
+    def test_fields_projects_tasks(self, client):
+        self.seed(client, 2)
+        tasks = client.get("/api/tasks?fields=id,title").json
+        assert [sorted(t) for t in tasks] == [["id", "title"]] * 2
+
+    def test_ndjson_streams_one_task_per_line(self, client):
+        self.seed(client)
+        resp = client.get("/api/tasks?format=ndjson&priority=high&fields=title")
+        assert resp.mimetype == "application/x-ndjson"
+        lines = resp.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines] == [{"title": "T1"}, {"title": "T3"}]
+
+    @pytest.mark.parametrize("query", ["sort=priority", "limit=0", "limit=x", "cursor=bogus", "order=up"])
+    def test_bad_arguments_are_rejected(self, client, query):
+        resp = client.get(f"/api/tasks?{query}")
+        assert resp.status_code == 400
+        assert "error" in resp.json
+
+
+class TestUserScoping:
+    def test_each_user_has_their_own_tasks(self, client):
+        ada, bob = {"X-User": "ada@example.com"}, {"X-User": "bob@example.com"}
+        task = client.post("/api/tasks", json={"title": "Ada's essay"}, headers=ada).json
+        client.post("/api/tasks", json={"title": "Bob's lab"}, headers=bob)
+        assert [t["title"] for t in client.get("/api/tasks", headers=ada).json] == ["Ada's essay"]
+        assert client.get("/api/summary", headers=bob).json["total"] == 1
+        assert client.delete(f"/api/tasks/{task['id']}", headers=bob).status_code == 404
+        assert client.get("/api/tasks").json == []
+        lines = client.get("/api/tasks?format=ndjson", headers=bob).get_data(as_text=True).splitlines()
+        assert [json.loads(line)["title"] for line in lines] == ["Bob's lab"]
+        assert storage.current_user() is None
+
+    def test_etag_varies_by_user(self, client):
+        resp = client.get("/api/tasks", headers={"X-User": "ada@example.com"})
+        assert "X-User" in resp.headers["Vary"]
+        other = client.get("/api/tasks", headers={"X-User": "bob@example.com",
+                                                  "If-None-Match": resp.headers["ETag"]})
+        assert other.status_code == 200
+
+
+class TestDeadlines:
+    def test_overdue_and_due_range(self, client):
+        client.post("/api/tasks", json={"title": "Late", "due_date": "2020-01-02"})
+        client.post("/api/tasks", json={"title": "Later", "due_date": "2020-01-05"})
+        client.post("/api/tasks", json={"title": "Future", "due_date": "2999-01-01"})
+        assert [t["title"] for t in client.get("/api/overdue").json] == ["Late", "Later"]
+        assert [t["title"] for t in client.get("/api/due?from=2020-01-01&to=2020-01-03").json] == ["Late"]
+        assert client.get("/api/due").json == []
+        assert "ETag" in client.get("/api/overdue").headers
+
+    def test_bad_dates_are_rejected(self, client):
+        assert client.get("/api/due?from=tomorrow").status_code == 400
+        assert client.get("/api/due?from=2020-02-01&to=2020-01-01").status_code == 400
+
+
+class TestSearch:
+    def test_search_ranks_and_revalidates(self, client):
+        client.post("/api/tasks", json={"title": "Lab report", "subject": "Chemistry"})
+        client.post("/api/tasks", json={"title": "Reading", "description": "notes for the lab report"})
+        client.post("/api/tasks", json={"title": "Essay"})
+        resp = client.get("/api/search?q=lab rep")
+        assert [t["title"] for t in resp.json] == ["Lab report", "Reading"]
+        assert all("score" in t for t in resp.json)
+        assert client.get("/api/search?q=chem&limit=1").json[0]["title"] == "Lab report"
+        assert client.get("/api/search").json == []
+        again = client.get("/api/search?q=lab rep", headers={"If-None-Match": resp.headers["ETag"]})
+        assert again.status_code == 304
+
+    def test_bad_limit_is_rejected(self, client):
+        assert client.get("/api/search?q=lab&limit=0").status_code == 400
+        assert client.get("/api/search?q=lab&limit=500").status_code == 400
+        assert client.get("/api/search?q=lab&limit=x").status_code == 400
+
+
+class TestHealth:
+    def test_liveness_and_readiness(self, client):
+        assert client.get("/healthz").json == {"status": "ok"}
+        assert client.get("/readyz").json == {"status": "ready"}
+
+    def test_not_ready_while_draining(self, client, monkeypatch):
+        monkeypatch.setattr(server, "_draining", threading.Event())
+        server.start_draining()
+        assert client.get("/readyz").status_code == 503
+        assert client.get("/healthz").status_code == 200
+
+    def test_sigterm_fails_readiness_before_the_worker_stops(self, client, monkeypatch):
+        spec = importlib.util.spec_from_file_location(
+            "gunicorn_conf", os.path.join(os.path.dirname(server.__file__), "gunicorn.conf.py"))
+        conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(conf)
+        monkeypatch.setattr(conf, "DRAIN_SECONDS", 0.2)
+        monkeypatch.setattr(server, "_draining", threading.Event())
+        stopped = threading.Event()
+        previous = signal.signal(signal.SIGTERM, lambda sig, frame: stopped.set())  # gunicorn's handler
+        try:
+            conf.post_worker_init(None)
+            signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+            assert client.get("/readyz").json == {"status": "draining"} and not stopped.is_set()
+            assert stopped.wait(2)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+
+class TestAiRequestLimit:
+    def test_excess_ai_requests_are_shed_but_crud_and_async_pass(self, client, stub, monkeypatch):
+        monkeypatch.setattr(server, "AI_MAX_REQUESTS", 1)
+        stub.latency = 0.5
+        slow = threading.Thread(target=lambda: client.post("/api/ai/chat", json={"message": "plan"}))
+        slow.start()
+        time.sleep(0.2)
+        resp = server.app.test_client().post("/api/ai/chat", json={"message": "other"})
+        assert resp.status_code == 503 and resp.headers["Retry-After"] == "1"
+        assert server.app.test_client().post("/api/tasks", json={"title": "Essay"}).status_code == 201
+        task_id = storage.load_tasks()[0]["id"]
+        assert server.app.test_client().post(f"/api/ai/subtasks/{task_id}?async=1").status_code == 202
+        slow.join()
+        assert client.post("/api/ai/chat", json={"message": "again"}).status_code == 200
+        jobs.reset_queue()
+
+
+class TestHttpCaching:
+    def test_unchanged_data_revalidates_without_task_manager(self, client, monkeypatch):
+        client.post("/api/tasks", json={"title": "A"})
+        first = client.get("/api/tasks")
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        etag = first.headers["ETag"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("task_manager should not be called")
+        monkeypatch.setattr(server.task_manager, "get_all_tasks", fail)
+        monkeypatch.setattr(server.task_manager, "get_summary", fail)
+        resp = client.get("/api/tasks", headers={"If-None-Match": etag})
+        assert resp.status_code == 304 and resp.data == b""
+        summary_etag = client.get("/api/summary", headers={"If-None-Match": etag})
+        assert summary_etag.status_code == 304
+
+    def test_writes_change_the_etag(self, client):
+        etag = client.get("/api/summary").headers["ETag"]
+        client.post("/api/tasks", json={"title": "A"})
+        resp = client.get("/api/summary", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag and resp.json["total"] == 1
+
+    def test_large_json_is_gzipped_when_accepted(self, client):
+        for i in range(30):
+            client.post("/api/tasks", json={"title": f"Task {i}", "description": "x" * 50})
+        resp = client.get("/api/tasks", headers={"Accept-Encoding": "br;q=0, gzip"})
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert len(json.loads(gzip.decompress(resp.data))) == 30
+        assert "Content-Encoding" not in client.get("/api/tasks").headers
+        assert "Content-Encoding" not in client.get("/api/summary", headers={"Accept-Encoding": "gzip"}).headers
+
+    def test_index_is_served_from_an_immutable_fingerprinted_url(self, client):
+        resp = client.get("/")
+        assert resp.status_code == 302
+        url = resp.headers["Location"]
+        page = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert page.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert gzip.decompress(page.data).startswith(b"<!DOCTYPE html>")
+        assert client.get(url, headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+        assert client.get("/index.000000000000.html").status_code == 302
+
+
+class TestEncodingNegotiation:
+    @pytest.mark.parametrize("header, expected", [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("*", "br" if http_cache.brotli else "gzip"),
+    ])
+    def test_choose_encoding(self, header, expected):
+        assert http_cache.choose_encoding(header) == expected
@@ -0,0 +1,331 @@
+import json
+import os
+import threading
+import pytest
+
+from app import storage
+from benchmarks import stress_storage
+
+
+pytestmark = pytest.mark.usefixtures("temp_data_file")
+
+
+class TestCache:
+    def test_creates_missing_file(self):
+        assert storage.load_tasks() == []
+        assert os.path.exists(storage.DATA_FILE)
+
+    def test_repeated_loads_hit_cache(self):
+        storage.save_tasks([{"id": "a"}])
+        before = storage.cache_stats()
+        storage.load_tasks()
+        storage.load_tasks()
+        after = storage.cache_stats()
+        assert after["hits"] == before["hits"] + 2
+        assert after["misses"] == before["misses"]
+
+    def test_returned_tasks_are_read_only(self):
+        storage.save_tasks([{"id": "a", "title": "Original"}])
+        task = storage.load_tasks()[0]
+        with pytest.raises(TypeError):
+            task["title"] = "Changed"
+        assert task.updated({"title": "Changed"}).title == "Changed"
+        assert storage.load_tasks()[0]["title"] == "Original"
+
+    def test_external_edit_is_picked_up(self):
+        storage.save_tasks([{"id": "a"}])
+        generation = storage.get_generation()
+        with open(storage.DATA_FILE, "w") as f:
+            json.dump([{"id": "a"}, {"id": "b"}], f)
+        os.utime(storage.DATA_FILE, ns=(0, 0))
+        assert [t["id"] for t in storage.load_tasks()] == ["a", "b"]
+        assert storage.get_generation() > generation
+
+    @pytest.mark.parametrize("store_class", [storage.JsonStore, storage.WalStore])
+    def test_version_is_shared_by_every_store_on_the_file(self, store_class):
+        writer = store_class(storage.DATA_FILE)
+        writer.insert({"id": "a"})
+        reader = store_class(storage.DATA_FILE)
+        assert reader.version() == writer.version()
+        before = reader.version()
+        writer.insert({"id": "b"})
+        assert reader.version() == writer.version() != before
+
+    def test_save_bumps_generation(self):
+        generation = storage.get_generation()
+        storage.save_tasks([{"id": "a"}])
+        assert storage.get_generation() == generation + 1
+
+
+def _task(task_id, **fields):
+    return {"id": task_id, "title": task_id, **fields}
+
+
+class TestWalStore:
+    def make_store(self, **kwargs):
+        return storage.WalStore(storage.DATA_FILE, **kwargs)
+
+    def test_mutations_are_appended_and_replayed(self):
+        store = self.make_store()
+        store.insert(_task("a"))
+        store.insert(_task("b"))
+        store.replace(_task("a", title="A2"))
+        store.remove("b")
+        with open(store.log_path) as f:
+            ops = [json.loads(line)["op"] for line in f]
+        assert ops == ["create", "create", "update", "delete"]
+        assert self.make_store().all() == [_task("a", title="A2")]
+
+    def test_truncated_last_line_is_ignored(self):
+        store = self.make_store()
+        store.insert(_task("a"))
+        with open(store.log_path, "a") as f:
+            f.write('{"op": "create", "id": "b", "task": {"id": "b"')
+        reopened = self.make_store()
+        assert [t["id"] for t in reopened.all()] == ["a"]
+        reopened.insert(_task("c"))
+        assert [t["id"] for t in self.make_store().all()] == ["a", "c"]
+
+    def test_compaction_folds_log_into_snapshot(self):
+        store = self.make_store(compact_bytes=1)
+        store.insert(_task("a"))
+        store.wait_for_compaction()
+        store.insert(_task("b"))
+        store.wait_for_compaction()
+        assert os.path.getsize(store.log_path) == 0
+        with open(store.path) as f:
+            assert [t["id"] for t in json.load(f)] == ["a", "b"]
+        assert [t["id"] for t in self.make_store().all()] == ["a", "b"]
+
+    def test_replay_over_snapshot_is_idempotent(self):
+        store = self.make_store()
+        store.insert(_task("a"))
+        store.replace(_task("a", title="A2"))
+        with open(store.log_path) as f:
+            log = f.read()
+        store.compact()
+        # Simulate a crash between writing the snapshot and trimming the log.
+        with open(store.log_path, "w") as f:
+            f.write(log)
+        assert self.make_store().all() == [_task("a", title="A2")]
+
+    def test_picks_up_other_writers(self):
+        reader, writer = self.make_store(), self.make_store()
+        assert reader.all() == []
+        writer.insert(_task("a"))
+        assert [t["id"] for t in reader.all()] == ["a"]
+
+
+class TestSqliteStore:
+    def test_migrates_existing_json_on_first_use(self):
+        storage.JsonStore(storage.DATA_FILE).save_all([_task("a", status="pending"), _task("b")])
+        store = storage.SqliteStore(storage.DATA_FILE)
+        assert [t["id"] for t in store.all()] == ["a", "b"]
+        assert store.get("a")["status"] == "pending"
+        store.close()
+
+    def test_uses_wal_mode_and_indexes(self):
+        store = storage.SqliteStore(storage.DATA_FILE)
+        conn = store._conn()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(tasks)")}
+        assert {"idx_tasks_status", "idx_tasks_priority", "idx_tasks_subject", "idx_tasks_due_date"} <= indexes
+        store.close()
+
+    def test_deadline_queries_use_the_open_due_index(self):
+        store = storage.SqliteStore(storage.DATA_FILE)
+        plan = store._conn().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE due_date BETWEEN ? AND ? AND status != 'completed'",
+            ("2025-01-01", "2025-01-31")).fetchall()
+        assert "idx_tasks_open_due" in " ".join(str(row[-1]) for row in plan)
+        store.close()
+
+    def test_builds_search_index_for_existing_databases(self):
+        store = storage.SqliteStore(storage.DATA_FILE)
+        store.insert(_task("a", title="Lab report"))
+        store._conn().executescript("DROP TABLE tasks_fts; DROP TRIGGER tasks_fts_insert;"
+                                    " DROP TRIGGER tasks_fts_delete; DROP TRIGGER tasks_fts_update;")
+        store.close()
+        store = storage.SqliteStore(storage.DATA_FILE)
+        assert [t["id"] for t, _ in store.search("lab")] == ["a"]
+        store.close()
+
+    def test_round_trips_extra_fields(self):
+        store = storage.SqliteStore(storage.DATA_FILE)
+        task = {"id": "a", "title": "T", "priority": "low", "status": "pending", "subtasks": ["x"]}
+        store.insert(task)
+        assert store.get("a")["subtasks"] == ["x"]
+        store.close()
+
+
+@pytest.mark.parametrize("backend", sorted(storage.BACKENDS))
+class TestUserShards:
+    def test_users_only_see_their_own_tasks(self, backend, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        storage.insert_task(_task("shared"))
+        with storage.user_scope("Ada@Example.com "):
+            storage.insert_task(_task("ada"))
+            assert [t["id"] for t in storage.load_tasks()] == ["ada"]
+        with storage.user_scope("bob@example.com"):
+            assert storage.load_tasks() == [] and storage.task_counts("2025-01-01", "2025-01-07")["total"] == 0
+        with storage.user_scope("ada@example.com"):  # case and spaces don't matter
+            assert storage.get_task("ada") is not None and storage.get_task("shared") is None
+        assert [t["id"] for t in storage.load_tasks()] == ["shared"]
+        path = storage.shard_path("ada@example.com")
+        assert os.path.dirname(path).endswith("users") and "ada" not in os.path.basename(path)
+
+    def test_open_shards_are_bounded(self, backend, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        monkeypatch.setattr(storage, "STORAGE_MAX_SHARDS", 3)
+        for i in range(6):
+            with storage.user_scope(f"user{i}@example.com"):
+                storage.insert_task(_task(f"t{i}"))
+        assert storage.shard_stats()["open"] == 3
+        with storage.user_scope("user0@example.com"):  # evicted, reopened from disk
+            assert [t["id"] for t in storage.load_tasks()] == ["t0"]
+
+    def test_evicting_a_shard_leaves_open_scans_working(self, backend, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        monkeypatch.setattr(storage, "STORAGE_MAX_SHARDS", 1)
+        with storage.user_scope("alice@example.com"):
+            for i in range(3):
+                storage.insert_task(_task(f"a{i}"))
+            rows = storage.scan_tasks()
+            first = next(rows)
+        with storage.user_scope("bob@example.com"):  # evicts alice's store
+            storage.insert_task(_task("b0"))
+        assert [first["id"]] + [t["id"] for t in rows] == ["a0", "a1", "a2"]
+        with storage.user_scope("alice@example.com"):
+            assert len(storage.load_tasks()) == 3
+
+
+@pytest.mark.parametrize("backend", sorted(storage.BACKENDS))
+class TestSearch:
+    def test_search_follows_inserts_updates_and_deletes(self, backend, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        storage.insert_task(_task("a", title="Calculus homework", description="chapter 3", subject="Math"))
+        storage.insert_task(_task("b", title="History essay", description="first draft", subject="History"))
+        storage.insert_task(_task("c", title="Calculus exam", description="", subject="Math"))
+        assert sorted(t["id"] for t, _ in storage.search_tasks("calc")) == ["a", "c"]
+        assert [t["id"] for t, _ in storage.search_tasks("math hom")] == ["a"]
+        assert storage.search_tasks("calc ") == [] and storage.search_tasks("") == []
+
+        storage.replace_task(_task("b", title="History essay", description="calculus of war", subject=""))
+        storage.remove_task("c")
+        hits = storage.search_tasks("calculus")
+        assert [t["id"] for t, _ in hits] == ["a", "b"]  # the title hit ranks first
+        assert hits[0][1] >= hits[1][1] and len(storage.search_tasks("calculus", limit=1)) == 1
+        assert storage.search_tasks("draft") == []
+
+    def test_search_stays_in_the_users_shard(self, backend, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        with storage.user_scope("ada@example.com"):
+            storage.insert_task(_task("ada", title="Essay"))
+        assert storage.search_tasks("essay") == []
+        with storage.user_scope("ada@example.com"):
+            assert [t["id"] for t, _ in storage.search_tasks("ess")] == ["ada"]
+
+
+def test_search_scores_match_across_backends(temp_data_file):
+    tasks = [
+        _task("a", title="Calculus homework", description="chapter 3, calculus problems", subject="Math"),
+        _task("b", title="History essay", description="first draft on the calculus of war", subject="History"),
+        _task("c", title="Calculus exam", description="", subject="Math"),
+        _task("d", title="Café_review", description="Essay about the café's menu", subject="French"),
+        _task("e", title="Lab report", description="Physics lab, chapter 3", subject="Physics"),
+    ]
+    json_store = storage.JsonStore(str(temp_data_file / "scores.json"))
+    sqlite_store = storage.SqliteStore(str(temp_data_file / "fts.json"))
+    for task in tasks:
+        json_store.insert(task)
+        sqlite_store.insert(task)
+    for query in ["calculus", "calc", "math ", "chapter 3", "essay", "cafe review", "review", "lab ph", "physics"]:
+        expected = [(t["id"], round(score, 6)) for t, score in sqlite_store.search(query)]
+        assert expected
+        assert [(t["id"], round(score, 6)) for t, score in json_store.search(query)] == expected, query
+    sqlite_store.close()
+
+
+@pytest.mark.parametrize("backend", sorted(storage.BACKENDS))
+class TestConcurrency:
+    def test_parallel_threads_lose_no_writes(self, backend):
+        created, count, _ = stress_storage.run(backend, storage.DATA_FILE, processes=1, threads=8, ops=15)
+        assert created == count == 8 * 15
+
+    def test_parallel_processes_lose_no_writes(self, backend, monkeypatch):
+        # A tiny threshold keeps the WAL compactor racing the writers.
+        monkeypatch.setattr(storage, "WAL_COMPACT_BYTES", 2048)
+        created, count, _ = stress_storage.run(backend, storage.DATA_FILE, processes=3, threads=4, ops=10)
+        assert created == count == 3 * 4 * 10
+
+    def test_readers_never_see_a_partial_file(self, backend):
+        storage.insert_task(_task("seed"))
+        errors = []
+
+        def read():
+            for _ in range(200):
+                try:
+                    storage.get_store().invalidate()
+                    storage.load_tasks()
+                except ValueError as e:
+                    errors.append(e)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for i in range(50):
+            storage.insert_task(_task(f"t{i}"))
+        reader.join()
+        assert errors == []
+
+
+class TestSummaryCounters:
+    WEEK = ("2025-06-01", "2025-06-07")
+
+    @pytest.mark.parametrize("store_class", [storage.JsonStore, storage.WalStore])
+    def test_fresh_store_answers_from_saved_counters(self, store_class):
+        store_class(storage.DATA_FILE).insert(_task("a", status="pending", priority="low", due_date="2025-05-01"))
+        fresh = store_class(storage.DATA_FILE)
+        counts = fresh.counts(*self.WEEK)
+        assert counts["total"] == 1 and counts["overdue"] == 1
+        assert fresh.misses == 0  # the task data was never parsed
+
+    def test_saved_counters_ignored_after_external_edit(self):
+        storage.JsonStore(storage.DATA_FILE).insert(_task("a", status="pending", priority="low"))
+        with open(storage.DATA_FILE, "w") as f:
+            json.dump([], f)
+        assert storage.JsonStore(storage.DATA_FILE).counts(*self.WEEK)["total"] == 0
+
+    def test_reads_only_write_counters_when_missing(self):
+        storage.JsonStore(storage.DATA_FILE).insert(_task("a", status="pending", priority="low"))
+        counters_path = storage.JsonStore(storage.DATA_FILE).counters_path
+        saved = os.stat(counters_path).st_mtime_ns
+        os.utime(counters_path, ns=(saved - 10 ** 9, saved - 10 ** 9))
+        storage.JsonStore(storage.DATA_FILE).all()
+        assert os.stat(counters_path).st_mtime_ns == saved - 10 ** 9
+        os.remove(counters_path)
+        storage.JsonStore(storage.DATA_FILE).all()
+        assert os.path.exists(counters_path)
+
+    def test_verify_reports_and_repairs_drift(self):
+        store = storage.JsonStore(storage.DATA_FILE)
+        store.insert(_task("a", status="pending", priority="low"))
+        store.index.counters.total = 5
+        drift = store.verify_counts()
+        assert drift["total"] == {"counted": 5, "actual": 1}
+        assert store.verify_counts() == {}
+
+    def test_sqlite_triggers_track_writes(self):
+        store = storage.SqliteStore(storage.DATA_FILE)
+        store.insert(_task("a", status="pending", priority="low", due_date="2025-05-01"))
+        store.insert(_task("b", status="pending", priority="high", due_date="2025-06-03"))
+        store.replace(_task("a", status="completed", priority="low", due_date="2025-05-01"))
+        store.remove("b")
+        counts = store.counts(*self.WEEK)
+        assert counts == {"total": 1, "by_status": {"completed": 1}, "by_priority": {"low": 1},
+                          "overdue": 0, "due_this_week": 0}
+        assert store.verify_counts() == {}
+        store._conn().execute("UPDATE counters SET n = 7 WHERE kind = 'total'")
+        store._conn().commit()
+        assert store.verify_counts() == {"total": {"counted": 7, "actual": 1}}
+        assert store.counts(*self.WEEK)["total"] == 1
+        store.close()
@@ -0,0 +1,82 @@
+from datetime import date
+
+import pytest
+
+from app import storage, task_context, task_manager
+from app.task_model import Task
+
+TODAY = date(2025, 6, 10)
+
+
+def _task(title, due=None, priority="medium", status="pending", **fields):
+    return Task({"id": f"id-{title}", "title": title, "due_date": due, "priority": priority,
+                 "status": status, "subject": "Maths", "description": "",
+                 "created_at": "2025-06-01T10:00:00", "updated_at": "2025-06-01T10:00:00", **fields})
+
+
+def _rows(text):
+    return [line.split("|")[0] for line in text.splitlines()[2:] if "|" in line]
+
+
+class TestBuildContext:
+    def test_most_urgent_first(self):
+        tasks = [
+            _task("done", due="2025-06-01", status="completed"),
+            _task("someday"),
+            _task("next week low", due="2025-06-17", priority="low"),
+            _task("next week high", due="2025-06-17", priority="high"),
+            _task("overdue", due="2025-06-08"),
+            _task("tomorrow", due="2025-06-11"),
+        ]
+        text = task_context.build_context(tasks, budget=1000, today=TODAY)
+        assert _rows(text) == ["overdue", "tomorrow", "next week high", "next week low", "someday", "done"]
+        assert "overdue|Maths|2025-06-08|-2|medium|pending|" in text
+
+    def test_drops_unneeded_fields_and_escapes_cells(self):
+        task = _task("Lab | report", description="line one\nline two " + "x" * 200)
+        text = task_context.build_context([task], budget=1000, today=TODAY)
+        assert "id-" not in text and "created_at" not in text and "2025-06-01T10" not in text
+        row = text.splitlines()[2]
+        assert row.startswith("Lab / report|") and row.count("|") == 6
+        assert len(row.split("|")[-1]) == task_context.NOTES_CHARS
+
+    def test_stays_within_budget_and_summarises_the_rest(self):
+        tasks = [_task(f"Task {i}", due=f"2025-07-{i % 28 + 1:02d}") for i in range(500)]
+        text = task_context.build_context(tasks, budget=300, today=TODAY)
+        assert task_context.estimate_tokens(text) <= 300
+        assert text.splitlines()[-1].startswith("+")
+        assert "500 pending" not in text and "pending" in text.splitlines()[-1]
+        assert _rows(text)[0] == "Task 0"  # due 2025-07-01, the soonest
+
+    def test_report_compares_token_counts(self):
+        tasks = [_task(f"Task {i}") for i in range(100)]
+        report = task_context.context_report(tasks, budget=400)
+        assert report["tasks"] == 100 and 0 < report["listed"] < 100
+        assert report["tokens_after"] <= 400 < report["tokens_before"]
+        assert report["saved"] > 0.9
+
+
+class TestCachedContext:
+    def test_rebuilt_only_when_version_changes(self):
+        calls = []
+
+        def load():
+            calls.append(1)
+            return [_task("A")]
+
+        first = task_context.cached_context("v1", load)
+        assert task_context.cached_context("v1", load) == first
+        assert len(calls) == 1
+        task_context.cached_context("v2", load)
+        assert len(calls) == 2
+
+    @pytest.mark.parametrize("backend", sorted(storage.BACKENDS))
+    def test_task_manager_context_tracks_writes(self, backend, temp_data_file, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+        task_manager.create_task(title="First")
+        assert _rows(task_manager.get_chat_context()) == ["First"]
+        hits = task_context.stats["hits"]
+        task_manager.get_chat_context()
+        assert task_context.stats["hits"] == hits + 1
+        task_manager.create_task(title="Second", due_date="2025-01-01")
+        assert _rows(task_manager.get_chat_context()) == ["Second", "First"]
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from app.task_index import SummaryCounters, TaskIndex, counters_drift
+from app.task_model import Task
+
+STATUSES = ["pending", "in-progress", "completed"]
+PRIORITIES = ["low", "medium", "high"]
+SUBJECTS = ["Math", "Mathematics", "History", "Physics", "Art", "", "CS", "Physical Ed"]
+
+
+def _random_task(rng, task_id):
+    return Task({
+        "id": task_id,
+        "title": f"Task {task_id}",
+        "subject": rng.choice(SUBJECTS),
+        "status": rng.choice(STATUSES),
+        "priority": rng.choice(PRIORITIES),
+        "due_date": rng.choice([None, f"2025-06-{rng.randint(1, 28):02d}"]),
+    })
+
+
+def _naive_filter(tasks, status=None, priority=None, subject=None):
+    if status:
+        tasks = [t for t in tasks if t["status"] == status]
+    if priority:
+        tasks = [t for t in tasks if t["priority"] == priority]
+    if subject:
+        tasks = [t for t in tasks if subject.lower() in t["subject"].lower()]
+    return tasks
+
+
+@pytest.fixture
+def populated():
+    """A TaskIndex and the equivalent plain list after random puts and drops."""
+    rng = random.Random(42)
+    index, tasks = TaskIndex(), {}
+    for n in range(300):
+        op = rng.random()
+        if op < 0.6 or not tasks:
+            task = _random_task(rng, f"t{n}")
+        elif op < 0.85:
+            task = _random_task(rng, rng.choice(list(tasks)))
+        else:
+            task_id = rng.choice(list(tasks))
+            index.drop(task_id)
+            del tasks[task_id]
+            continue
+        index.put(task)
+        tasks[task["id"]] = task
+    return index, list(tasks.values())
+
+
+class TestTaskIndex:
+    @pytest.mark.parametrize("status", [None, *STATUSES])
+    @pytest.mark.parametrize("priority", [None, *PRIORITIES])
+    @pytest.mark.parametrize("subject", [None, "math", "PHYS", "s", "matics", "zzz"])
+    def test_filter_matches_linear_scan(self, populated, status, priority, subject):
+        index, tasks = populated
+        assert index.filter(status, priority, subject) == _naive_filter(tasks, status, priority, subject)
+
+    def test_due_between_matches_sorted_scan(self, populated):
+        index, tasks = populated
+        expected = sorted(
+            (t for t in tasks if t["due_date"] and "2025-06-05" <= t["due_date"] <= "2025-06-12"),
+            key=lambda t: t["due_date"],
+        )
+        assert index.due_between("2025-06-05", "2025-06-12") == expected
+        assert index.open_due_between("2025-06-05", "2025-06-12") == [
+            t for t in expected if t["status"] != "completed"]
+
+    def test_open_due_follows_status_changes(self):
+        task = {"id": "a", "title": "A", "status": "pending", "priority": "low", "subject": "", "due_date": "2025-06-01"}
+        index = TaskIndex([Task(task)])
+        index.put(Task(dict(task, status="completed")))
+        assert index.open_due_between("2025-01-01", "2025-12-31") == []
+        index.put(Task(dict(task, status="in-progress", due_date="2025-07-01")))
+        assert [t["due_date"] for t in index.open_due_between("2025-01-01", "2025-12-31")] == ["2025-07-01"]
+
+    def test_counters_match_recount(self, populated):
+        index, tasks = populated
+        assert index.counters.to_dict() == SummaryCounters.from_tasks(tasks).to_dict()
+        counts = index.counters.snapshot("2025-06-10", "2025-06-16")
+        assert counts["total"] == len(tasks)
+        for status in STATUSES:
+            assert counts["by_status"].get(status, 0) == sum(t["status"] == status for t in tasks)
+        open_due = [t["due_date"] for t in tasks if t["due_date"] and t["status"] != "completed"]
+        assert counts["overdue"] == sum(d < "2025-06-10" for d in open_due)
+        assert counts["due_this_week"] == sum("2025-06-10" <= d <= "2025-06-16" for d in open_due)
+
+    def test_dates_that_are_not_yyyy_mm_dd_count_as_undated(self):
+        index = TaskIndex([Task({"id": "a", "status": "pending", "due_date": "2025-6-1"})])
+        assert index.due_between("2025-01-01", "2025-12-31") == []
+        assert index.counters.snapshot("2025-06-10", "2025-06-16")["overdue"] == 0
+
+    def test_counters_round_trip_through_dict(self, populated):
+        index, _ = populated
+        data = index.counters.to_dict()
+        assert SummaryCounters.from_dict(data).to_dict() == data
+        assert counters_drift(data, data) == {}
+
+    def test_drop_returns_task(self):
+        index = TaskIndex([Task({"id": "a", "subject": "Math", "status": "pending", "priority": "low"})])
+        assert index.drop("a")["id"] == "a"
+        assert index.drop("a") is None
+        assert index.filter(subject="math") == []
+
+    def test_text_index_is_built_on_first_search_then_maintained(self):
+        index = TaskIndex([Task({"id": "a", "title": "Calculus homework"}), Task({"id": "b", "title": "History essay"})])
+        assert index._text is None
+        assert [t["id"] for t, _ in index.search("calc")] == ["a"]
+        index.put(Task({"id": "c", "title": "Calculus exam"}))
+        index.drop("a")
+        index.put(Task({"id": "b", "title": "Calculus of war"}))
+        assert sorted(t["id"] for t, _ in index.search("calculus")) == ["b", "c"]
+        assert index.search("history") == []
@@ -1,32 +1,14 @@
-import os
-import json
 import pytest
-from unittest.mock import patch, mock_open, MagicMock
 
-# We patch storage so tests don't touch the real filesystem
-MOCK_TASKS = []
+from app import storage
 
 
-def reset_mock():
-    global MOCK_TASKS
-    MOCK_TASKS = []
-
-
-def mock_load():
-    return list(MOCK_TASKS)
-
-
-def mock_save(tasks):
-    global MOCK_TASKS
-    MOCK_TASKS = list(tasks)
-
-
-@pytest.fixture(autouse=True)
-def patch_storage():
-    reset_mock()
-    with patch("app.task_manager.load_tasks", side_effect=mock_load), \
-         patch("app.task_manager.save_tasks", side_effect=mock_save):
-        yield
+# Point storage at a temp directory so tests don't touch data/tasks.json,
+# and run every test against each storage backend.
+@pytest.fixture(autouse=True, params=sorted(storage.BACKENDS))
+def patch_storage(request, temp_data_file, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", request.param)
+    yield
 
 
 from app.task_manager import (
@@ -38,6 +20,13 @@ from app.task_manager import (
     filter_tasks,
     get_summary,
     get_upcoming_tasks,
+    get_tasks_due,
+    get_overdue_tasks,
+    check_summary,
+    apply_batch,
+    import_tasks,
+    list_tasks_page,
+    decode_cursor,
 )
 
 
@@ -172,3 +161,157 @@ class TestSummary:
         assert s["by_status"]["pending"] == 2
         assert s["by_priority"]["high"] == 1
         assert s["by_priority"]["low"] == 1
+
+    def test_summary_counts_overdue_and_due_this_week(self):
+        from datetime import date, timedelta
+        in_days = lambda n: (date.today() + timedelta(days=n)).isoformat()
+        create_task(title="Late", due_date=in_days(-2))
+        create_task(title="Today", due_date=in_days(0))
+        create_task(title="Friday", due_date=in_days(6))
+        create_task(title="Next month", due_date=in_days(30))
+        done = create_task(title="Late but done", due_date=in_days(-1))
+        update_task(done["id"], status="completed")
+
+        s = get_summary()
+        assert s["overdue"] == 1
+        assert s["due_this_week"] == 2
+
+    def test_check_summary_reports_no_drift(self):
+        t = create_task(title="T1", due_date="2025-01-01")
+        update_task(t["id"], status="completed", priority="high")
+        create_task(title="T2")
+        delete_task(t["id"])
+        assert check_summary() == {"ok": True, "drift": {}}
+
+
+class TestBatch:
+    def test_applies_mixed_operations(self):
+        existing = create_task(title="Existing")
+        doomed = create_task(title="Doomed")
+        results = apply_batch([
+            {"op": "create", "task": {"title": "New", "priority": "high"}},
+            {"op": "update", "id": existing["id"], "fields": {"status": "completed"}},
+            {"op": "delete", "id": doomed["id"]},
+        ])
+        assert results[0]["title"] == "New"
+        assert results[1]["status"] == "completed"
+        assert results[2] == {"id": doomed["id"], "deleted": True}
+        assert sorted(t["title"] for t in get_all_tasks()) == ["Existing", "New"]
+
+    def test_later_operations_see_earlier_ones(self):
+        created = apply_batch([{"op": "create", "task": {"title": "A"}}])[0]
+        results = apply_batch([
+            {"op": "update", "id": created["id"], "fields": {"title": "B"}},
+            {"op": "update", "id": created["id"], "fields": {"priority": "low"}},
+        ])
+        assert results[1]["title"] == "B"
+        assert get_task_by_id(created["id"])["priority"] == "low"
+
+    def test_invalid_operation_writes_nothing(self):
+        task = create_task(title="Keep")
+        with pytest.raises(ValueError, match="Operation 1: Priority"):
+            apply_batch([
+                {"op": "update", "id": task["id"], "fields": {"title": "Changed"}},
+                {"op": "create", "task": {"title": "Bad", "priority": "urgent"}},
+            ])
+        assert [t["title"] for t in get_all_tasks()] == ["Keep"]
+
+    @pytest.mark.parametrize("operations, message", [
+        ("x", "operations must be a list"),
+        (["x"], "Operation 0: must be an object"),
+        ([{"op": "update", "id": ["x"]}], "Operation 0: id must be a string"),
+        ([{"op": "delete"}], "Operation 0: id must be a string"),
+        ([{"op": "create", "task": "x"}], "Operation 0: task must be an object"),
+        ([{"op": "create", "task": {"title": "A"}}, {"op": "update", "id": "a", "fields": [1]}],
+         "Operation 1: fields must be an object"),  # checked before the id is looked up
+    ])
+    def test_malformed_operations_raise_value_error(self, operations, message):
+        with pytest.raises(ValueError, match=message):
+            apply_batch(operations)
+        assert get_all_tasks() == []
+
+    def test_unknown_id_raises_key_error(self):
+        with pytest.raises(KeyError, match="Operation 0"):
+            apply_batch([{"op": "delete", "id": "ghost"}])
+
+    def test_import_tasks(self):
+        count = import_tasks([{"title": "A", "status": "completed"}, {"title": "B", "due_date": "2025-06-01"}])
+        assert count == 2
+        assert [t["status"] for t in get_all_tasks()] == ["completed", "pending"]
+
+    def test_import_is_all_or_nothing(self):
+        with pytest.raises(ValueError, match="Row 2"):
+            import_tasks([{"title": "A"}, {"title": "B", "due_date": "June 1st"}])
+        assert get_all_tasks() == []
+
+
+class TestPagination:
+    def test_pages_cover_every_task_once(self):
+        for i, due in enumerate(["2025-06-03", None, "2025-06-01", "2025-06-03", None]):
+            create_task(title=f"T{i}", due_date=due, subject="Maths" if i % 2 else "Art")
+        for descending in (False, True):
+            seen, cursor = [], None
+            while True:
+                page = list_tasks_page(sort="due_date", descending=descending, cursor=cursor, limit=2)
+                seen += page["tasks"]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            expected = sorted(get_all_tasks(), key=lambda t: (t["due_date"] is None, t["due_date"] or "", t["id"]),
+                              reverse=descending)
+            assert [t["id"] for t in seen] == [t["id"] for t in expected]
+
+    def test_filters_apply_to_pages(self):
+        for i in range(5):
+            create_task(title=f"T{i}", subject="Maths" if i % 2 else "Art")
+        page = list_tasks_page(subject="math", sort="title", limit=10)
+        assert [t["title"] for t in page["tasks"]] == ["T1", "T3"]
+        assert page["next_cursor"] is None
+
+    def test_rejects_bad_arguments(self):
+        with pytest.raises(ValueError, match="Sort"):
+            list_tasks_page(sort="priority")
+        with pytest.raises(ValueError, match="cursor"):
+            list_tasks_page(cursor="not-a-cursor")
+        with pytest.raises(ValueError, match="limit"):
+            list_tasks_page(limit=0)
+        with pytest.raises(ValueError, match="cursor"):
+            decode_cursor("MTIz")  # base64 of "123"
+
+
+class TestUpcomingTasks:
+    def _in_days(self, n):
+        from datetime import date, timedelta
+        return (date.today() + timedelta(days=n)).isoformat()
+
+    def test_returns_tasks_in_window_sorted_by_due_date(self):
+        create_task(title="Later", due_date=self._in_days(5))
+        create_task(title="Sooner", due_date=self._in_days(2))
+        create_task(title="Too far", due_date=self._in_days(30))
+        create_task(title="Past", due_date=self._in_days(-1))
+        create_task(title="No date")
+        assert [t["title"] for t in get_upcoming_tasks(days=7)] == ["Sooner", "Later"]
+
+    def test_excludes_completed_tasks(self):
+        task = create_task(title="Done", due_date=self._in_days(1))
+        update_task(task["id"], status="completed")
+        assert get_upcoming_tasks(days=7) == []
+
+    def test_overdue_most_overdue_first(self):
+        create_task(title="Yesterday", due_date=self._in_days(-1))
+        create_task(title="Last month", due_date=self._in_days(-30))
+        create_task(title="Today", due_date=self._in_days(0))
+        done = create_task(title="Done late", due_date=self._in_days(-3))
+        update_task(done["id"], status="completed")
+        assert [t["title"] for t in get_overdue_tasks()] == ["Last month", "Yesterday"]
+
+    def test_due_between_inclusive(self):
+        create_task(title="A", due_date="2025-06-01")
+        create_task(title="B", due_date="2025-06-03")
+        create_task(title="C", due_date="2025-06-04")
+        assert [t["title"] for t in get_tasks_due("2025-06-01", "2025-06-03")] == ["A", "B"]
+        assert [t["title"] for t in get_tasks_due("2025-06-04")] == ["C"]
+        with pytest.raises(ValueError, match="after"):
+            get_tasks_due("2025-06-04", "2025-06-01")
+        with pytest.raises(ValueError, match="YYYY-MM-DD"):
+            get_tasks_due("June 1st")
@@ -0,0 +1,72 @@
+import sys
+from datetime import date
+
+import pytest
+
+from app import codec, storage, task_manager
+from app.task_model import Priority, Status, Task, parse_due_date
+
+
+pytestmark = pytest.mark.usefixtures("temp_data_file")
+
+
+class TestValidation:
+    def test_create_parses_fields_once(self):
+        task = Task.create({"title": "  Essay ", "due_date": "2025-06-01", "priority": "high"})
+        assert task.title == "Essay"
+        assert task.due_date == date(2025, 6, 1)
+        assert task.priority is Priority.HIGH and task.status is Status.PENDING
+        assert task["due_date"] == "2025-06-01" and task["priority"] == "high"
+
+    @pytest.mark.parametrize("due", ["2025-13-01", "2025-1-5", "20250105", "2025-W01-1", 20250105])
+    def test_rejects_anything_but_yyyy_mm_dd(self, due):
+        with pytest.raises(ValueError, match="YYYY-MM-DD"):
+            parse_due_date(due)
+
+    @pytest.mark.parametrize("fields, message", [
+        ({"title": " "}, "title cannot be empty"),
+        ({"title": "T", "priority": "urgent"}, "Priority must be one of"),
+        ({"title": "T", "priority": ""}, "Priority must be one of"),
+        ({"title": "T", "status": None}, "Status must be one of"),
+        ({"title": "T", "status": ["done"]}, "Status must be one of"),
+        ({"title": "T", "subject": 3}, "subject must be a string"),
+    ])
+    def test_create_errors(self, fields, message):
+        with pytest.raises(ValueError, match=message):
+            Task.create(fields)
+
+    def test_updated_is_a_validated_copy(self):
+        task = Task.create({"title": "Essay"})
+        done = task.updated({"status": "completed", "title": " Final essay "})
+        assert task.status is Status.PENDING
+        assert done.status is Status.COMPLETED and done.title == "Final essay"
+        with pytest.raises(ValueError, match="Cannot update field: id"):
+            task.updated({"id": "other"})
+
+
+class TestStoredData:
+    def test_round_trips_partial_and_unknown_fields(self):
+        data = {"id": "a", "title": "Odd", "status": "archived", "due_date": "2025-6-1",
+                "subtasks": [{"text": "read", "done": False}]}
+        task = Task(data)
+        assert task.to_dict() == data
+        assert "description" not in task and task.get("description") is None
+        assert task.status == "archived" and task.due_date == "2025-6-1"
+        assert dict(task) == data
+
+    def test_equal_to_a_task_with_the_same_data(self):
+        data = Task.create({"title": "Essay"}).to_dict()
+        assert Task(data) == Task(dict(data))
+        assert Task(data) != Task(dict(data, title="Other"))
+
+    def test_smaller_than_the_dict(self):
+        data = Task.create({"title": "Essay", "due_date": "2025-06-01"}).to_dict()
+        assert sys.getsizeof(Task(data)) < sys.getsizeof(data) / 2
+
+    def test_store_hands_out_the_tasks_it_keeps(self, monkeypatch):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", "json")
+        created = task_manager.create_task(title="Essay", due_date="2025-06-01")
+        store = storage.get_store()
+        assert storage.get_task(created.id) is store.index.get(created.id) is created
+        assert storage.load_tasks() == [created]
+        assert codec.loads(codec.dumps(created)) == created.to_dict()
@@ -0,0 +1,81 @@
+import random
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+from app import task_manager
+from app.task_index import SummaryCounters
+from app.task_model import Task
+from app.task_table import TaskTable, load_table
+
+TODAY = date(2025, 6, 10)
+SUBJECTS = ["Maths", "Physics", "Physical Education", "English", "", None]
+
+
+@pytest.fixture
+def tasks():
+    rng = random.Random(7)
+    tasks = []
+    for i in range(500):
+        task = task_manager._new_task_from({
+            "title": f"Task {i}",
+            "subject": rng.choice(SUBJECTS) or "",
+            "due_date": rng.choice([None, (TODAY + timedelta(days=rng.randrange(-20, 20))).isoformat()]),
+            "priority": rng.choice(task_manager.VALID_PRIORITIES),
+            "status": rng.choice(task_manager.VALID_STATUSES),
+        }).to_dict()
+        tasks.append(task)
+    return tasks
+
+
+def _naive_filter(tasks, status=None, priority=None, subject=None):
+    return [t for t in tasks
+            if (not status or t["status"] == status) and (not priority or t["priority"] == priority)
+            and (not subject or subject.lower() in (t["subject"] or "").lower())]
+
+
+class TestTaskTable:
+    def test_rows_round_trip(self, tasks):
+        odd = [
+            {"id": "not-a-uuid", "title": "Odd", "status": "archived", "priority": "urgent",
+             "due_date": "2025-6-1", "created_at": "2025-06-01T10:00:00+02:00", "subtasks": [{"text": "a"}]},
+            {"id": tasks[0]["id"].upper(), "title": "Upper-case id"},
+        ]
+        table = TaskTable.from_tasks(tasks + odd)
+        assert len(table) == len(tasks) + 2
+        assert [row.to_dict() for row in table] == tasks + odd
+        assert table[-2]["subtasks"] == [{"text": "a"}] and table[-2].get("updated_at") is None
+        with pytest.raises(KeyError):
+            table[-1]["due_date"]
+        with pytest.raises(IndexError):
+            table[len(table)]
+
+    @pytest.mark.parametrize("status", [None, *task_manager.VALID_STATUSES, "archived"])
+    @pytest.mark.parametrize("priority", [None, "high", "urgent"])
+    @pytest.mark.parametrize("subject", [None, "phys", "MATHS", "zzz"])
+    def test_filter_matches_a_scan(self, tasks, status, priority, subject):
+        table = TaskTable.from_tasks(tasks)
+        expected = _naive_filter(tasks, status, priority, subject)
+        assert [row.to_dict() for row in table.filter(status, priority, subject)] == expected
+
+    def test_summary_matches_counters(self, tasks):
+        table = TaskTable.from_tasks(tasks)
+        week_end = (TODAY + timedelta(days=6)).isoformat()
+        expected = SummaryCounters.from_tasks(map(Task, tasks)).snapshot(TODAY.isoformat(), week_end)
+        summary = table.summary(TODAY)
+        for key in ("total", "overdue", "due_this_week", "by_status", "by_priority"):
+            assert summary[key] == expected[key]
+
+    def test_smaller_than_the_dicts(self, tasks):
+        table = TaskTable.from_tasks(tasks)
+        dicts = sys.getsizeof(tasks) + sum(sys.getsizeof(t) + sum(sys.getsizeof(v) for v in t.values())
+                                           for t in tasks)
+        assert table.memory_bytes() < dicts / 2
+
+    def test_load_table_reads_storage(self, temp_data_file):
+        task_manager.create_task(title="A", priority="high")
+        task_manager.create_task(title="B")
+        table = load_table()
+        assert [row["title"] for row in table.filter(priority="high")] == ["A"]
+        assert table.summary()["by_status"]["pending"] == 2
@@ -0,0 +1,59 @@
+import math
+
+from app.task_model import Task
+from app.text_index import TextIndex, parse_query, tokenize
+
+
+def _task(task_id, title, description="", subject=""):
+    return Task({"id": task_id, "title": title, "description": description, "subject": subject})
+
+
+def _ids(hits):
+    return [task_id for task_id, _ in hits]
+
+
+class TestTokenize:
+    def test_words_are_lower_cased(self):
+        assert tokenize("Read Ch. 3, take-notes!") == ["read", "ch", "3", "take", "notes"]
+        assert tokenize(None) == []
+
+    def test_trailing_space_ends_the_prefix(self):
+        assert parse_query("calc") == (["calc"], True)
+        assert parse_query("calc ") == (["calc"], False)
+        assert parse_query("  ") == ([], False)
+
+
+class TestTextIndex:
+    def test_every_word_must_match_and_last_is_a_prefix(self):
+        index = TextIndex()
+        index.add(_task("a", "Calculus homework", subject="Math"))
+        index.add(_task("b", "History essay", description="calculations of war"))
+        index.add(_task("c", "Calculus exam"))
+        assert sorted(_ids(index.search("calc"))) == ["a", "b", "c"]
+        assert _ids(index.search("calc ")) == []
+        assert _ids(index.search("calculus hom")) == ["a"]
+        assert _ids(index.search("math calculus")) == ["a"]
+        assert index.search("") == [] and index.search("physics") == []
+
+    def test_title_hits_and_rare_words_rank_first(self):
+        index = TextIndex()
+        index.add(_task("desc", "Reading", description="lab report for chemistry"))
+        index.add(_task("title", "Lab report", description="chemistry"))
+        for n in range(5):
+            index.add(_task(f"x{n}", "Lab", description="safety"))
+        hits = index.search("lab report ")
+        assert _ids(hits) == ["title", "desc"]
+        assert all(score > 0 and math.isfinite(score) for _, score in hits)
+        # Short titles score highest; equal scores keep the given order.
+        assert _ids(index.search("lab", limit=2, position=lambda i: -ord(i[-1]))) == ["x4", "x3"]
+
+    def test_remove_and_re_add_keep_postings_exact(self):
+        index = TextIndex()
+        old = _task("a", "Essay draft")
+        index.add(old)
+        index.remove(old)
+        index.add(_task("a", "Essay final"))
+        assert _ids(index.search("draft")) == []
+        assert _ids(index.search("fin")) == ["a"]
+        index.remove(_task("a", "Essay final"))
+        assert index.postings == {} and index._terms == [] and index._total_length == 0